@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from fastapi import HTTPException, status
+from .config import settings
+from .security import verify_token
+import time
+
+
+def extract_token(cookies) -> Optional[str]:
+    """
+    Read the access token from the cookies, without the 'Bearer ' prefix
+    """
+    token = cookies.get("access_token")
+    if token and token.startswith("Bearer "):
+        token = token.split("Bearer ")[1]
+    return token or None
+
+
+class AuthContext:
+    """
+    Verifies each JWT once and caches the decoded principal.
+    Entries live in a bounded LRU and expire at the token's `exp` claim, so a cached
+    token is never accepted past the moment `jwt.decode` would start rejecting it.
+    Only successfully verified tokens are cached.
+    """
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max(1, int(max_size))
+        self._cache = OrderedDict()  # token -> (payload, expires_at)
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+    def resolve(self, token: str, token_type: str = "access") -> Dict[str, Any]:
+        """
+        Verify a token (or take it from the cache) and return its payload
+        Args:
+            token: The token to verify, without the 'Bearer ' prefix
+            token_type: Expected token type ("access" or "refresh")
+        Returns:
+            dict: The decoded token payload
+        Raises:
+            HTTPException: If token is invalid, expired or of the wrong type
+        """
+        entry = self._cache.get(token)
+        if entry is not None:
+            payload, expires_at = entry
+            if expires_at is None or time.time() < expires_at:
+                self._cache.move_to_end(token)
+                self.stats['hits'] += 1
+                if payload.get("type") != token_type:
+                    raise HTTPException(
+                        status_code=status.HTTP_401_UNAUTHORIZED,
+                        detail=f"Invalid token type. Expected {token_type} token."
+                    )
+                return payload
+            del self._cache[token]
+            self.stats['expired'] += 1
+
+        self.stats['misses'] += 1
+        payload = verify_token(token, token_type)
+        self._cache[token] = (payload, payload.get("exp"))
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+            self.stats['evictions'] += 1
+        return payload
+
+    def user_id(self, token: str, token_type: str = "access") -> int:
+        """
+        Resolve a token to its user ID
+        Returns:
+            int: The user ID from the token
+        """
+        user_id = self.resolve(token, token_type).get("sub")
+        if not user_id:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token contains no user ID"
+            )
+        return int(user_id)
+
+    def invalidate(self, token: str):
+        self._cache.pop(token, None)
+
+    def get_stats(self):
+        """Cache size and hit/miss counters"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            'size': len(self._cache),
+            'capacity': self.max_size,
+            **self.stats,
+            'hit_ratio': self.stats['hits'] / lookups if lookups else 0.0
+        }
+
+
+auth_context = AuthContext(settings.AUTH_CACHE_SIZE)
@@ -2,6 +2,7 @@ from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Optional
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -11,6 +12,12 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_DAYS: int
+    AUTH_CACHE_SIZE: int = 1024  # verified tokens kept in the auth cache
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12  # cost factor for new hashes (existing hashes keep their own)
+    BCRYPT_WORKERS: int = 2  # threads hashing concurrently
+    BCRYPT_MAX_QUEUE: int = 32  # logins allowed to wait for a thread before returning 429
     
     # Database Settings
     DATABASE_HOST: str
@@ -18,6 +25,11 @@ class Settings(BaseSettings):
     DATABASE_USER: str
     DATABASE_PASSWORD: str
     DATABASE_NAME: str
+    DB_POOL_SIZE: int = 5  # connections kept open per worker
+    DB_MAX_OVERFLOW: int = 10  # extra connections allowed under load
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a pooled connection is replaced
+    DB_CREATE_SCHEMA: bool = False  # create missing tables at startup
     
     # SSH Tunnel Settings
     SSH_HOST: str
@@ -26,6 +38,7 @@ class Settings(BaseSettings):
     SSH_PORT: int = 22
     SSH_KEY_PATH: str
     SSH_KEY_PW: str
+    SSH_HEALTH_CHECK_INTERVAL: float = 30.0  # seconds between tunnel health checks
     
     # Application Settings
     STATIC_DIR: Path = BASE_DIR / "static"
@@ -34,6 +47,33 @@ class Settings(BaseSettings):
     # Kafka Settings
     KAFKA_SERVER:str
     KAFKA_PORT:int
+    KAFKA_VALUE_CODEC: str = 'json'  # json | struct
+    KAFKA_LINGER_MS: int = 0
+    KAFKA_MAX_BATCH_SIZE: int = 16384
+    KAFKA_COMPRESSION: Optional[str] = None  # gzip | snappy | lz4 | zstd
+    KAFKA_SEND_QUEUE_SIZE: int = 0  # 0 sends inline from the WebSocket loop
+    KAFKA_QUEUE_POLICY: str = 'block'  # block | drop
+
+    # Live metrics pushed on the monitoring WebSocket (0 = per-message acks instead)
+    LIVE_METRICS_INTERVAL: float = 1.0  # seconds between metrics messages
+    LIVE_METRICS_WINDOWS: str = '60,300'  # rolling windows in seconds
+    LIVE_EAR_THRESHOLD: float = 0.28
+    LIVE_MIN_BLINK_FRAMES: int = 4
+
+    # Per-frame debug logging is sampled: one frame in FRAME_LOG_SAMPLE
+    FRAME_LOG_SAMPLE: int = 1000
+
+    # Session history (/monitoring/sessions/{id}/series)
+    SERIES_DEFAULT_POINTS: int = 1000  # point budget when the client asks for none
+    SERIES_MAX_POINTS: int = 5000
+    SERIES_CACHE_SIZE: int = 256  # cached responses of completed sessions
+    SERIES_CACHE_SETTLE: float = 120.0  # seconds after completion before caching (late frames still land)
+
+    # Fatigue rollups (/monitoring/rollups)
+    ROLLUP_MAX_BUCKETS: int = 1000  # longest range one request may cover, in buckets
+
+    # Set False when the frame consumer detects blinks server-side (SERVER_BLINK_DETECTION=1)
+    TRUST_CLIENT_BLINKS: bool = True
     
     class Config:
         env_file = BASE_DIR / "core" / ".env"
@@ -1,16 +1,30 @@
 # app/core/database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+"""
+Database access for the app.
+Nothing connects at import time: the SSH tunnel and the async engine are created on
+first use (`get_db` / `init_db`), the schema is only created when `create_schema` is
+called explicitly (DB_CREATE_SCHEMA), and `monitor_tunnel` reopens a dropped tunnel.
+"""
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
 from sshtunnel import SSHTunnelForwarder
 from .config import settings
+import asyncio
+import logging
 import paramiko
 from paramiko import RSAKey
 
+logger = logging.getLogger(__name__)
+
 tunnel = None
+engine = None
+SessionLocal = None
+Base = declarative_base()
+_init_lock = asyncio.Lock()
+
 
-def get_db_url_with_tunnel():
-    """Create SSH tunnel and return database URL"""
+def open_tunnel(local_port=0):
+    """Start the SSH tunnel (blocking; run it off the event loop) and return its local port"""
     global tunnel
     if tunnel is None or not tunnel.is_active:
         ssh_pkey = paramiko.RSAKey.from_private_key_file(settings.SSH_KEY_PATH, settings.SSH_KEY_PW)
@@ -19,22 +33,96 @@ def get_db_url_with_tunnel():
             ssh_username=settings.SSH_USER,
             ssh_pkey=ssh_pkey,
             remote_bind_address=(settings.DATABASE_HOST, settings.DATABASE_PORT),
-            local_bind_address=('localhost', 0),  # 0 means random free port
+            local_bind_address=('localhost', local_port),  # 0 means random free port
         )
         tunnel.start()
-    
-    # Construct database URL using the tunnel's local port
-    return f"postgresql://postgres@localhost:{tunnel.local_bind_port}/operation"
+    return tunnel.local_bind_port
 
-# Create engine with SSH tunnel
-engine = create_engine(get_db_url_with_tunnel())
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+def get_db_url(local_port):
+    # Construct database URL using the tunnel's local port (asyncpg driver)
+    return f"postgresql+asyncpg://postgres@localhost:{local_port}/operation"
+
+
+def _create_engine(local_port):
+    global engine, SessionLocal
+    engine = create_async_engine(
+        get_db_url(local_port),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,  # recycle before the tunnel/server drops idle connections
+        pool_pre_ping=True
+    )
+    # expire_on_commit=False keeps loaded attributes usable after commit without a lazy (sync) reload
+    SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def init_db():
+    """Open the tunnel and create the engine once; later calls return immediately"""
+    if engine is not None:
+        return engine
+    async with _init_lock:
+        if engine is None:
+            local_port = await asyncio.to_thread(open_tunnel)
+            _create_engine(local_port)
+            logger.info(f"Database engine created through SSH tunnel on port {local_port}")
+    return engine
+
+
+async def create_schema():
+    """Create missing tables (explicit opt-in, see DB_CREATE_SCHEMA)"""
+    await init_db()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+def _tunnel_is_up():
+    if tunnel is None or not tunnel.is_active:
+        return False
+    tunnel.check_tunnels()
+    return all(tunnel.tunnel_is_up.values())
+
+
+async def monitor_tunnel(interval=30.0):
+    """
+    Background task: health-check the SSH tunnel and reopen it when it drops.
+    The tunnel is reopened on the same local port so the engine URL stays valid;
+    if that port is gone, the engine is rebuilt on the new one.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if tunnel is None:
+            continue  # not initialized yet (lazy)
+        try:
+            if await asyncio.to_thread(_tunnel_is_up):
+                continue
+            old_port = tunnel.local_bind_port
+            logger.warning("SSH tunnel is down, reopening")
+            await asyncio.to_thread(tunnel.stop)
+            try:
+                local_port = await asyncio.to_thread(open_tunnel, old_port)
+            except Exception:
+                local_port = await asyncio.to_thread(open_tunnel)
+            if local_port != old_port:
+                old_engine = engine
+                _create_engine(local_port)
+                await old_engine.dispose()
+            logger.info(f"SSH tunnel reopened on port {local_port}")
+        except Exception as e:
+            logger.error(f"Error checking SSH tunnel: {e}", exc_info=True)
+
+
+async def close_db():
+    global tunnel, engine, SessionLocal
+    if engine is not None:
+        await engine.dispose()
+    if tunnel is not None:
+        await asyncio.to_thread(tunnel.stop)
+    tunnel, engine, SessionLocal = None, None, None
+
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    await init_db()
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,12 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from .config import settings
+import asyncio
+import time
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 
 def get_password_hash(password: str) -> str:
@@ -19,6 +22,81 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
     except Exception:
         return False
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing/verification on a dedicated thread pool so a login burst
+    never blocks the event loop (and the WebSocket streams running on it).
+    At most `workers` hashes run at once and `max_queue` more may wait for a thread;
+    beyond that the request is rejected with 429 instead of piling up.
+    """
+    def __init__(self, workers: int = 2, max_queue: int = 32):
+        self.workers = max(1, int(workers))
+        self.capacity = self.workers + max(0, int(max_queue))
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        self.stats = {'completed': 0, 'rejected': 0, 'hash_time': 0.0, 'hash_time_max': 0.0,
+                      'wait_time': 0.0, 'wait_time_max': 0.0}
+
+    @staticmethod
+    def _timed(fn, submitted, *args):
+        # Runs on the bcrypt thread; returns (result, queue wait, hash time)
+        started = time.perf_counter()
+        result = fn(*args)
+        return result, started - submitted, time.perf_counter() - started
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.capacity:
+            self.stats['rejected'] += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts in progress, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited, elapsed = await loop.run_in_executor(
+                self._executor, self._timed, fn, time.perf_counter(), *args
+            )
+        finally:
+            self.pending -= 1
+
+        self.stats['completed'] += 1
+        self.stats['hash_time'] += elapsed
+        self.stats['hash_time_max'] = max(self.stats['hash_time_max'], elapsed)
+        self.stats['wait_time'] += waited
+        self.stats['wait_time_max'] = max(self.stats['wait_time_max'], waited)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def get_stats(self):
+        """Pool occupancy and bcrypt timings (use hash time x arrival rate to size BCRYPT_WORKERS)"""
+        completed = self.stats['completed']
+        return {
+            'workers': self.workers,
+            'capacity': self.capacity,
+            'pending': self.pending,
+            'completed': completed,
+            'rejected': self.stats['rejected'],
+            'rounds': settings.BCRYPT_ROUNDS,
+            'hash_time_avg_ms': self.stats['hash_time'] / completed * 1000 if completed else 0.0,
+            'hash_time_max_ms': self.stats['hash_time_max'] * 1000,
+            'wait_time_avg_ms': self.stats['wait_time'] / completed * 1000 if completed else 0.0,
+            'wait_time_max_ms': self.stats['wait_time_max'] * 1000
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher(settings.BCRYPT_WORKERS, settings.BCRYPT_MAX_QUEUE)
     
 
 def create_token(data: Dict[str, Any], token_type: str, expires_delta: Optional[timedelta] = None) -> str:
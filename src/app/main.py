@@ -1,23 +1,42 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from .core.config import settings, static, templates    
-from .core.database import Base, engine                 
+from .core.database import create_schema, monitor_tunnel, close_db
+from .core.security import password_hasher
 from .models.users import User
 from .routers import home, monitoring
 from contextlib import asynccontextmanager
 from .services.kafka_producer import KafkaService
+from .services.metrics import REGISTRY
+import asyncio
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    kafka_service = KafkaService() # Initialize Kafka service  
+    # The database (SSH tunnel + engine) is opened lazily on first use;
+    # creating the tables is an explicit opt-in
+    if settings.DB_CREATE_SCHEMA:
+        await create_schema()
+    tunnel_monitor = asyncio.create_task(monitor_tunnel(settings.SSH_HEALTH_CHECK_INTERVAL))
+
+    kafka_service = KafkaService( # Initialize Kafka service  
+        codec=settings.KAFKA_VALUE_CODEC,
+        linger_ms=settings.KAFKA_LINGER_MS,
+        max_batch_size=settings.KAFKA_MAX_BATCH_SIZE,
+        compression_type=settings.KAFKA_COMPRESSION,
+        queue_size=settings.KAFKA_SEND_QUEUE_SIZE,
+        queue_policy=settings.KAFKA_QUEUE_POLICY,
+        # Set by tools/run_local.py to share an in-memory broker with the consumers
+        transport=getattr(app.state, 'kafka_transport', None)
+    )
     await kafka_service.start(settings.KAFKA_SERVER, settings.KAFKA_PORT)
     app.state.kafka_service = kafka_service
     print(f"Kafka service Producer = {kafka_service.producer}")
     yield
     await kafka_service.stop()
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+    tunnel_monitor.cancel()
+    await close_db()
+    password_hasher.shutdown()
 
 # Include routers
 app = FastAPI(lifespan=lifespan)
@@ -35,5 +54,10 @@ app.add_middleware(
 app.include_router(home.router)
 app.include_router(monitoring.router)
 
+# Scrape endpoint (Prometheus text format)
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    return REGISTRY.render()
+
 # Mount static directory
 app.mount("/static", static)
\ No newline at end of file
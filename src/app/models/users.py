@@ -1,10 +1,10 @@
 # app/models/users.py
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import Column, Integer, String, DateTime, func, select
 from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
 from typing import Optional
 from ..core.database import Base
-from ..core.security import get_password_hash, verify_password
+from ..core.security import password_hasher
 
 class User(Base):
     __tablename__ = "users"
@@ -21,7 +21,7 @@ class User(Base):
         """
         Create a new user with hashed password
         """
-        hashed_password = get_password_hash(password)
+        hashed_password = await password_hasher.hash(password)
         user = cls(
             email=email,
             password=hashed_password,
@@ -35,7 +35,8 @@ class User(Base):
         """
         Get a user by email
         """
-        return await db_session.query(cls).filter(cls.email == email).first()
+        result = await db_session.execute(select(cls).where(cls.email == email).limit(1))
+        return result.scalars().first()
 
     @classmethod
     async def authenticate(cls, db_session, email: str, password: str) -> Optional["User"]:
@@ -45,7 +46,7 @@ class User(Base):
         user = await cls.get_by_email(db_session, email)
         if not user:
             return None
-        if not verify_password(password, user.password):
+        if not await password_hasher.verify(password, user.password):
             return None
         return user
 
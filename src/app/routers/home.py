@@ -4,7 +4,8 @@ from . import templates
 from ..dependencies import get_token_header
 from ..core.database import get_db
 from ..core.config import settings
-from ..core.security import verify_password, create_access_token, create_refresh_token
+from ..core.security import password_hasher, create_access_token, create_refresh_token
+from ..core.auth import auth_context, extract_token
 from ..models.users import User
 from datetime import datetime, timedelta
 
@@ -30,9 +31,10 @@ async def login(
     db=Depends(get_db)
 ):
     print(f"Login attempt with email:{username}, pw:{password}")
-    user = db.query(User).filter(User.email == username).first()
+    user = await User.get_by_email(db, username)
     
-    if not user or not verify_password(password, user.password):
+    # bcrypt runs on the bounded hashing pool (429 when saturated)
+    if not user or not await password_hasher.verify(password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password"
@@ -40,7 +42,7 @@ async def login(
 
     # If a successful login 
     user.last_login = datetime.now()
-    db.commit()
+    await db.commit()
 
     # Create access and refresh tokens
     access_token = create_access_token(
@@ -89,7 +91,12 @@ async def login(
     return login_response
 
 @router.post("/logout")
-async def logout(response: Response):
+async def logout(request: Request, response: Response):
+    # Drop the verified token from the auth cache
+    token = extract_token(request.cookies)
+    if token:
+        auth_context.invalidate(token)
+
     # Clear the cookies
     response.delete_cookie(key="access_token")
     response.delete_cookie(key="refresh_token")
@@ -1,22 +1,148 @@
-from fastapi import APIRouter, Request, WebSocket, Depends, status
+from fastapi import APIRouter, Request, WebSocket, Depends, HTTPException, Query, Response, status
 from fastapi.websockets import WebSocketDisconnect
 from fastapi.responses import HTMLResponse
+from typing import Optional
 from . import templates
 from ..dependencies import get_token_header
-from ..core.security import verify_token, get_user_id_from_token
+from ..core.auth import auth_context, extract_token
+from ..core.database import get_db
+from ..core.security import password_hasher
 from ..services.kafka_producer import KafkaService
-from jose import JWTError
+from ..services.codec import unpack_client_frames
+from ..services.live_metrics import LiveMetrics
+from ..services.session_series import SESSION_SQL, SeriesCache, build_series
+from ..services.rollups import GRANULARITIES, read_rollups
+from ..services.metrics import REGISTRY, LogSampler
+from ..core.config import settings
+import asyncio
+import json
 import logging
+import math
+import time
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/monitoring", tags=["monitoring"])
 
+ACTIVE_SOCKETS = REGISTRY.gauge('ws_active_sockets', 'Open monitoring WebSockets')
+FRAMES = REGISTRY.counter('ws_frames_total', 'Frames received on monitoring WebSockets')
+INVALID_FRAMES = REGISTRY.counter('ws_invalid_frames_total', 'Frames dropped because a field was missing or not a number')
+SOCKET_FPS = REGISTRY.gauge('ws_socket_frames_per_second', 'Frame rate per open WebSocket', labels=('session_id',))
+log_sample = LogSampler(settings.FRAME_LOG_SAMPLE)  # per-frame debug output
+invalid_log_sample = LogSampler(100)  # a misbehaving client can send nothing but bad frames
+series_cache = SeriesCache(settings.SERIES_CACHE_SIZE)
+
 
 async def get_kafka_service(websocket: WebSocket):
     return websocket.app.state.kafka_service
 
 
+def unpack_frames(data):
+    """
+    Normalize an incoming WebSocket message to a list of frames.
+    Accepts a single frame object (v1), a batch envelope {"v": 2, "frames": [...]},
+    or a bare list of frames.
+    """
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        if "frames" in data:
+            return data["frames"] or []
+        return [data]
+    return []
+
+
+def _number(value):
+    """float(value) for finite numbers and numeric strings, None for anything else"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None
+
+
+def normalize_frame(frame):
+    """
+    Validate one client frame and coerce its fields.
+    Returns the frame with a float `timestamp` and `ear_value` (None when no face was found),
+    or None when it is not usable.
+    """
+    if not isinstance(frame, dict):
+        return None
+    timestamp = _number(frame.get('timestamp'))
+    if timestamp is None:
+        return None
+    ear_value = frame.get('ear_value')
+    if isinstance(ear_value, float) and math.isnan(ear_value):
+        ear_value = None
+    if ear_value is not None:
+        ear_value = _number(ear_value)
+        if ear_value is None:
+            return None
+    return {**frame, 'timestamp': timestamp, 'ear_value': ear_value}
+
+
+async def receive_frames(websocket: WebSocket):
+    """
+    Receive one client message and return (frames, batched).
+    Text messages carry JSON (v1 frame or v2 envelope); binary messages carry
+    packed frames as laid out in services/codec.py.
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return unpack_client_frames(message["bytes"]), True
+    data = json.loads(message["text"])
+    return unpack_frames(data), not (isinstance(data, dict) and "frames" not in data)
+
+
+async def handle_frame(kafka_service: KafkaService, session_id, frame, last_event_onset):
+    """
+    Forward one frame (and a completed blink, if the frame closes one) to Kafka.
+    Returns the onset timestamp of the blink in progress, if any.
+    """
+    timestamp = frame.get('timestamp')
+    ear_value = frame.get('ear_value')
+    if logger.isEnabledFor(logging.DEBUG) and log_sample():
+        logger.debug(f"Received EAR value: {ear_value} at timestamp: {timestamp}") # debug
+
+    # Message handling for blink events (ignored when blinks are detected server-side)
+    if settings.TRUST_CLIENT_BLINKS:
+        if frame.get("event_onset"):
+            last_event_onset = timestamp
+            logger.debug(f"Blink onset detected at {timestamp}") # debug
+        elif frame.get("event_end") and last_event_onset is not None:
+            await kafka_service.send_blink_data(session_id, last_event_onset, timestamp)
+            blink_duration = timestamp - last_event_onset
+            logger.debug(f"Blink end detected at {timestamp}, duration: {blink_duration:.3f}s") # debug
+            last_event_onset = None
+
+    # Message handling for frame event
+    await kafka_service.send_frame_data(session_id, timestamp, ear_value)
+    return last_event_onset
+
+
+async def push_metrics(websocket: WebSocket, metrics: LiveMetrics, interval: float, session_id=None):
+    """
+    Send the connection's live metrics every `interval` seconds.
+    Each message also acknowledges the frames received since the previous one.
+    """
+    labels = (str(session_id),)
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            message = metrics.snapshot()
+            SOCKET_FPS.set(message["count"] / interval, labels=labels)
+            await websocket.send_json(message)
+    except Exception:
+        return  # connection closed, the receive loop handles the cleanup
+    finally:
+        SOCKET_FPS.remove(labels)
+
+
 @router.get("/", response_class=HTMLResponse)
 async def monitoring_page(request: Request, token: str = Depends(get_token_header)):
     return templates.TemplateResponse(
@@ -25,34 +151,122 @@ async def monitoring_page(request: Request, token: str = Depends(get_token_heade
     )
 
 
+@router.get("/producer_stats")
+async def producer_stats(request: Request, token: str = Depends(get_token_header)):
+    """Send-queue depth and delivery latency of the Kafka producer"""
+    return request.app.state.kafka_service.get_stats()
+
+
+@router.get("/auth_stats")
+async def auth_stats(token: str = Depends(get_token_header)):
+    """Verified-token cache counters and password hashing pool timings"""
+    return {
+        "token_cache": auth_context.get_stats(),
+        "password_hashing": password_hasher.get_stats()
+    }
+
+
+@router.get("/sessions/{session_id}/series")
+async def session_series(
+    session_id: int,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    points: Optional[int] = Query(None, ge=3),
+    method: str = Query('lttb', pattern='^(lttb|minmax)$'),
+    token: str = Depends(get_token_header),
+    db=Depends(get_db)
+):
+    """
+    EAR series of one of the caller's sessions between `start` and `end` (epoch seconds),
+    downsampled server-side to `points` samples (LTTB or per-bucket min/max) with the
+    blink events of the range overlaid. Responses for completed sessions are cached.
+    """
+    points = min(points or settings.SERIES_DEFAULT_POINTS, settings.SERIES_MAX_POINTS)
+    session = (await db.execute(SESSION_SQL, {"session_id": session_id})).first()
+    # Other users' sessions are reported as missing
+    if session is None or session.user_id != auth_context.user_id(token):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found")
+
+    # Frames can trail the completion event by a few seconds (batching, chunk sealing)
+    cacheable = (
+        session.end_time is not None
+        and time.time() - session.end_time.timestamp() >= settings.SERIES_CACHE_SETTLE
+    )
+    key = (session_id, start, end, points, method)
+    if cacheable:
+        body = series_cache.get(key)
+        if body is not None:
+            return Response(content=body, media_type="application/json")
+
+    series = await build_series(db, session_id, start, end, points, method)
+    series.update({
+        "status": session.status,
+        "start_time": session.start_time.timestamp() if session.start_time else None,
+        "end_time": session.end_time.timestamp() if session.end_time else None,
+    })
+    body = json.dumps(series, separators=(",", ":")).encode("utf-8")
+    if cacheable:
+        series_cache.put(key, body)
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/rollups")
+async def fatigue_rollups(
+    granularity: str = Query('daily', pattern='^(hourly|daily)$'),
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    token: str = Depends(get_token_header),
+    db=Depends(get_db)
+):
+    """
+    The caller's hourly or daily fatigue buckets between `start` and `end` (epoch seconds).
+    Defaults to the last 48 hours (hourly) or 30 days (daily). Reads only the rollup tables.
+    """
+    bucket_seconds = GRANULARITIES[granularity][2]
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - bucket_seconds * (48 if granularity == 'hourly' else 30)
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+    if (end - start) / bucket_seconds > settings.ROLLUP_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range too long: at most {settings.ROLLUP_MAX_BUCKETS} {granularity} buckets"
+        )
+    buckets = await read_rollups(db, auth_context.user_id(token), granularity, start, end)
+    return {"granularity": granularity, "start": start, "end": end, "buckets": buckets}
+
+
+@router.get("/series_stats")
+async def series_stats(token: str = Depends(get_token_header)):
+    """Session series response cache counters"""
+    return series_cache.get_stats()
+
+
 @router.websocket("/websocket_process")
 async def websocket_process(websocket:WebSocket,
                             kafka_service: KafkaService = Depends(get_kafka_service),
                             session_id=None,
                             user_id=None
                             ):
+    metrics_task = None
+    accepted = False
     try:
-        token = websocket.cookies.get("access_token")
-        if token and token.startswith("Bearer "):
-            token = token.split("Bearer ")[1]
+        token = extract_token(websocket.cookies)
         if not token:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
-        # Verify token
+        # Verify token (once per token, shared with get_token_header through the auth cache)
         try:
-            _ = verify_token(token, "access")
-            user_id = get_user_id_from_token(token, "access")
-            if not user_id:
-                logger.warning("No user_id in token payload")
-                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-                return
-        except JWTError as e:
-            logger.error(f"JWT verification failed: {e}")
+            user_id = auth_context.user_id(token, "access")
+        except HTTPException as e:
+            logger.error(f"JWT verification failed: {e.detail}")
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return
         
          # Accept the connection after verification
         await websocket.accept()
+        ACTIVE_SOCKETS.inc()
+        accepted = True
         logger.info(f"WebSocket accepted for user {user_id}")
 
         # Initialize session in Kafka
@@ -67,36 +281,49 @@ async def websocket_process(websocket:WebSocket,
             await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
             return
         
+        # Live metrics are pushed at a fixed cadence instead of acknowledging every message
+        metrics = LiveMetrics(
+            windows=[int(w) for w in settings.LIVE_METRICS_WINDOWS.split(',')],
+            ear_threshold=settings.LIVE_EAR_THRESHOLD,
+            min_frames=settings.LIVE_MIN_BLINK_FRAMES
+        )
+        if settings.LIVE_METRICS_INTERVAL > 0:
+            metrics_task = asyncio.create_task(push_metrics(websocket, metrics, settings.LIVE_METRICS_INTERVAL, session_id))
+
         # Main Websocket loop
         last_event_onset = None
         while True:
             try:
-                # Receive JSON data from client
-                data = await websocket.receive_json()
-            
-                # Send the received data to t Kafka session
-                timestamp = data.get('timestamp')
-                ear_value = data.get('ear_value')
-                logger.info(f"Received EAR value: {ear_value} at timestamp: {timestamp}") # debug
-
-                # Message handling for blink events
-                if data.get("event_onset"):
-                    last_event_onset = timestamp
-                    logger.debug(f"Blink onset detected at {timestamp}") # debug
-                elif data.get("event_end"):
-                    await kafka_service.send_blink_data(session_id, last_event_onset, timestamp)
-                    blink_duration = timestamp - last_event_onset
-                    logger.debug(f"Blink end detected at {timestamp}, duration: {blink_duration:.3f}s") # debug
-                    last_event_onset = None
-                
-                # Message handling for frame event
-                await kafka_service.send_frame_data(session_id, timestamp, ear_value)
+                # Receive a single frame (v1), a batch envelope (v2) or packed binary frames
+                frames, batched = await receive_frames(websocket)
+                if not frames:
+                    continue
+                FRAMES.inc(len(frames))
                 
-                # Send acknowledgment back to client
-                await websocket.send_json({
+                last_timestamp = None
+                for raw_frame in frames:
+                    # One malformed frame is dropped; it must not end the session
+                    frame = normalize_frame(raw_frame)
+                    if frame is None:
+                        INVALID_FRAMES.inc()
+                        if invalid_log_sample():
+                            logger.warning(f"Dropping invalid frame for session {session_id}: {raw_frame!r:.200}")
+                        continue
+                    last_event_onset = await handle_frame(kafka_service, session_id, frame, last_event_onset)
+                    metrics.add_frame(frame['timestamp'], frame['ear_value'])
+                    last_timestamp = frame['timestamp']
+
+                if metrics_task is not None:
+                    continue  # acknowledged by the next metrics message
+
+                # Legacy mode (LIVE_METRICS_INTERVAL=0): one cumulative acknowledgment per message
+                ack = {
                     "status": "received",
-                    "timestamp": timestamp
-                })
+                    "timestamp": last_timestamp
+                }
+                if batched:
+                    ack["count"] = len(frames)  # batched clients get the number of frames covered
+                await websocket.send_json(ack)
             except WebSocketDisconnect:
                 logger.info(f"Client disconnected normally for session {session_id}")
                 if session_id:
@@ -127,4 +354,9 @@ async def websocket_process(websocket:WebSocket,
             except Exception as kafka_error:
                 logger.error(f"Failed to update session status: {kafka_error}")
         
-        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
\ No newline at end of file
+        await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+    finally:
+        if metrics_task is not None:
+            metrics_task.cancel()
+        if accepted:
+            ACTIVE_SOCKETS.dec()
\ No newline at end of file
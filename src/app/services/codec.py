@@ -0,0 +1,121 @@
+import json
+import math
+import numbers
+import struct
+
+# Binary layout, version 1 (little-endian):
+#   Kafka record    : version u8 | kind u8 | session_id i64 | f64 | f64            (26 bytes)
+#       frame -> timestamp, ear_value (NaN when no face)
+#       blink -> start_timestamp, end_timestamp
+#   WebSocket batch : version u8 | kind u8 | count u16 | count x (timestamp f64 | ear f32 | flags u8)
+#       flags bit 0 = event_onset, bit 1 = event_end
+# JSON payloads always start with '{' (0x7b), so decoders tell the formats apart by the first byte.
+VERSION = 1
+KIND_FRAME = 1
+KIND_BLINK = 2
+KIND_CLIENT_FRAMES = 3
+
+_RECORD = struct.Struct('<BBqdd')
+_CLIENT_HEADER = struct.Struct('<BBH')
+_CLIENT_FRAME = struct.Struct('<dfB')
+_FLAG_ONSET = 1
+_FLAG_END = 2
+
+
+def _nan_if_none(value):
+    return math.nan if value is None else value
+
+
+def _none_if_nan(value):
+    return None if math.isnan(value) else value
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+
+class JsonCodec:
+    name = 'json'
+
+    def encode(self, value):
+        return json.dumps(value).encode('utf-8')
+
+    def decode(self, data):
+        return decode_value(data)
+
+
+class StructCodec:
+    """
+    Packs frame and blink records into fixed 26-byte structs.
+    Any other payload (e.g. session events), and records with a missing or non-numeric
+    field, are encoded as JSON, so one bad frame never fails the send.
+    """
+    name = 'struct'
+
+    def encode(self, value):
+        session_id = value.get('session_id')
+        if 'ear_value' in value and 'timestamp' in value:
+            ear = value['ear_value']
+            if _is_number(session_id) and _is_number(value['timestamp']) and (ear is None or _is_number(ear)):
+                return _RECORD.pack(VERSION, KIND_FRAME, int(session_id),
+                                    float(value['timestamp']), _nan_if_none(ear))
+        elif 'start_timestamp' in value and 'end_timestamp' in value:
+            if _is_number(session_id) and _is_number(value['start_timestamp']) and _is_number(value['end_timestamp']):
+                return _RECORD.pack(VERSION, KIND_BLINK, int(session_id),
+                                    float(value['start_timestamp']), float(value['end_timestamp']))
+        return json.dumps(value).encode('utf-8')
+
+    def decode(self, data):
+        return decode_value(data)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), StructCodec())}
+
+
+def get_codec(name):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown value codec: {name}. Expected one of {sorted(CODECS)}")
+
+
+def decode_value(data):
+    """Decode a Kafka value produced by any codec"""
+    if data[:1] == b'{':
+        return json.loads(data.decode('utf-8'))
+    version, kind, session_id, a, b = _RECORD.unpack(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported record version: {version}")
+    if kind == KIND_FRAME:
+        return {"session_id": session_id, "timestamp": a, "ear_value": _none_if_nan(b)}
+    if kind == KIND_BLINK:
+        return {"session_id": session_id, "start_timestamp": a, "end_timestamp": b}
+    raise ValueError(f"Unknown record kind: {kind}")
+
+
+def pack_client_frames(frames):
+    """Pack frame dicts into one binary WebSocket message (used by tools and benchmarks)"""
+    parts = [_CLIENT_HEADER.pack(VERSION, KIND_CLIENT_FRAMES, len(frames))]
+    for frame in frames:
+        flags = (_FLAG_ONSET if frame.get('event_onset') else 0) | (_FLAG_END if frame.get('event_end') else 0)
+        parts.append(_CLIENT_FRAME.pack(float(frame['timestamp']), _nan_if_none(frame.get('ear_value')), flags))
+    return b''.join(parts)
+
+
+def unpack_client_frames(data):
+    """Unpack a binary WebSocket message into the same frame dicts a JSON client sends"""
+    version, kind, count = _CLIENT_HEADER.unpack_from(data)
+    if version != VERSION or kind != KIND_CLIENT_FRAMES:
+        raise ValueError(f"Unsupported binary message: version={version}, kind={kind}")
+    expected = _CLIENT_HEADER.size + count * _CLIENT_FRAME.size
+    if len(data) != expected:
+        raise ValueError(f"Binary message has {len(data)} bytes, expected {expected}")
+    return [
+        {
+            "timestamp": timestamp,
+            "ear_value": _none_if_nan(ear),
+            "event_onset": bool(flags & _FLAG_ONSET),
+            "event_end": bool(flags & _FLAG_END)
+        }
+        for timestamp, ear, flags in _CLIENT_FRAME.iter_unpack(data[_CLIENT_HEADER.size:])
+    ]
@@ -0,0 +1,47 @@
+"""
+Decoding side of the chunked frame storage (operation.frame_chunks).
+Mirror of kafka_consumers/app/frame_chunks.py, which documents the payload layout and
+writes the chunks.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+VERSION = 1
+EAR_DTYPES = {1: np.dtype('<f2'), 2: np.dtype('<f4')}
+
+_HEADER = struct.Struct('<BBId')
+
+
+def decode_chunk(data):
+    """Unpack a payload into (timestamps float64 epoch seconds, ears float32)"""
+    data = bytes(data)
+    version, code, count, first = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported chunk version: {version}")
+    body = zlib.decompress(data[_HEADER.size:])
+    deltas = np.frombuffer(body, dtype='<u4', count=max(0, count - 1))
+    ears = np.frombuffer(body, dtype=EAR_DTYPES[code], count=count, offset=deltas.nbytes)
+    micros = np.concatenate(([0], np.cumsum(deltas, dtype=np.int64)))
+    return first + micros / 1e6, ears.astype(np.float32)
+
+
+def decode_chunks(payloads, start=None, end=None):
+    """
+    Merge chunk payloads into one time-ordered series, clipped to [start, end] (epoch seconds).
+    Frames present in several overlapping chunks are returned once.
+    """
+    parts = [decode_chunk(p) for p in payloads]
+    if not parts:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+    timestamps = np.concatenate([t for t, _ in parts])
+    ears = np.concatenate([e for _, e in parts])
+    timestamps, index = np.unique(timestamps, return_index=True)
+    ears = ears[index]
+    mask = np.ones(len(timestamps), dtype=bool)
+    if start is not None:
+        mask &= timestamps >= start
+    if end is not None:
+        mask &= timestamps <= end
+    return timestamps[mask], ears[mask]
@@ -1,28 +1,138 @@
 from aiokafka import AIOKafkaProducer
-import json
+import asyncio
+import logging
+import time
 import uuid
 from datetime import datetime
+from .codec import get_codec
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SEND_LATENCY = REGISTRY.histogram(
+    'kafka_send_latency_seconds', 'Time from producer.send (or enqueue) to broker ack', labels=('topic',)
+)
+SEND_ERRORS = REGISTRY.counter('kafka_send_errors_total', 'Records that failed to send', labels=('topic',))
+SEND_DROPPED = REGISTRY.counter('kafka_send_dropped_total', 'Records dropped because the send queue was full')
 
 
 class KafkaService:
-    def __init__(self):
+    """
+    Producer for session, frame and blink events.
+    With queue_size > 0, frame and blink sends are put on a bounded in-process queue
+    drained by a background task, so broker latency never blocks the WebSocket loop.
+    When the queue is full, queue_policy 'block' waits for room and 'drop' discards the record.
+    `transport` replaces Kafka with any object whose producer(**kwargs) returns an
+    AIOKafkaProducer-like client (e.g. the consumers' in-memory broker for one-process runs).
+    """
+    QUEUE_POLICIES = ('block', 'drop')
+
+    def __init__(self, codec='json', linger_ms=0, max_batch_size=16384, compression_type=None,
+                 queue_size=0, queue_policy='block', transport=None):
+        if queue_policy not in self.QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {queue_policy}")
         self.producer = None
+        self.transport = transport
+        self.codec = get_codec(codec)  # 'json' or 'struct' for packed frame/blink records
         self.session_topic = "session_events"
         self.frame_topic = "frame_data"
         self.blink_topic = "blink_event"
+
+        # Producer tuning
+        self.linger_ms = linger_ms
+        self.max_batch_size = max_batch_size
+        self.compression_type = compression_type or None
+
+        # Send queue
+        self.queue = asyncio.Queue(maxsize=queue_size) if queue_size > 0 else None
+        self.queue_policy = queue_policy
+        self._drain_task = None
+        self.stats = {'sent': 0, 'dropped': 0, 'errors': 0, 'latency_total': 0.0, 'latency_max': 0.0}
+        REGISTRY.gauge('kafka_send_queue_depth', 'Records waiting in the in-process send queue').function = (
+            lambda: {(): self.queue.qsize() if self.queue is not None else 0}
+        )
     
     async def start(self, server='localhost', port=9092):
-        self.producer = AIOKafkaProducer(
-            bootstrap_servers=f'{server}:{port}',
-            value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-            key_serializer=lambda v: str(v).encode('utf-8')
+        options = dict(
+            value_serializer=self.codec.encode,
+            key_serializer=lambda v: str(v).encode('utf-8'),
+            linger_ms=self.linger_ms,
+            max_batch_size=self.max_batch_size,
+            compression_type=self.compression_type
         )
+        if self.transport is not None:
+            self.producer = self.transport.producer(**options)
+        else:
+            self.producer = AIOKafkaProducer(bootstrap_servers=f'{server}:{port}', **options)
         await self.producer.start()
+        if self.queue is not None:
+            self._drain_task = asyncio.create_task(self._drain())
 
-    async def stop(self):
+    async def stop(self, drain_timeout=5.0):
+        if self._drain_task:
+            try:
+                await asyncio.wait_for(self.queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self.queue.qsize()} queued records on shutdown")
+            self._drain_task.cancel()
         if self.producer:
             await self.producer.stop()
 
+    async def _drain(self):
+        """Background task moving queued records into the producer's batches"""
+        while True:
+            topic, key, value, enqueued = await self.queue.get()
+            try:
+                future = await self.producer.send(topic=topic, key=key, value=value)
+                future.add_done_callback(lambda f, t=enqueued, tp=topic: self._record_delivery(f, t, tp))
+            except Exception as e:
+                self.stats['errors'] += 1
+                SEND_ERRORS.inc(labels=(topic,))
+                logger.error(f"Failed to send record to {topic}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _record_delivery(self, future, enqueued, topic):
+        if future.cancelled() or future.exception():
+            self.stats['errors'] += 1
+            SEND_ERRORS.inc(labels=(topic,))
+            return
+        latency = time.monotonic() - enqueued
+        SEND_LATENCY.observe(latency, labels=(topic,))
+        self.stats['sent'] += 1
+        self.stats['latency_total'] += latency
+        self.stats['latency_max'] = max(self.stats['latency_max'], latency)
+
+    async def _send(self, topic, key, value):
+        """Send directly, or through the queue when one is configured"""
+        if self.queue is None:
+            started = time.monotonic()
+            future = await self.producer.send(topic=topic, key=key, value=value)
+            future.add_done_callback(lambda f, t=started, tp=topic: self._record_delivery(f, t, tp))
+            return
+        item = (topic, key, value, time.monotonic())
+        if self.queue_policy == 'drop':
+            try:
+                self.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self.stats['dropped'] += 1
+                SEND_DROPPED.inc()
+        else:
+            await self.queue.put(item)
+
+    def get_stats(self):
+        """Queue depth and delivery statistics (latency measured from enqueue to broker ack)"""
+        sent = self.stats['sent']
+        return {
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'queue_capacity': self.queue.maxsize if self.queue is not None else 0,
+            'sent': sent,
+            'dropped': self.stats['dropped'],
+            'errors': self.stats['errors'],
+            'send_latency_avg_ms': self.stats['latency_total'] / sent * 1000 if sent else 0.0,
+            'send_latency_max_ms': self.stats['latency_max'] * 1000
+        }
+
     async def send_session_event(self, user_id: str, status: str, session_id: int = None):
         if not session_id:
             session_id = int(uuid.uuid4().int & (1<<31)-1)  # Generate 31-bit integer
@@ -49,7 +159,7 @@ class KafkaService:
             "ear_value": ear_value
         }
         
-        await self.producer.send(
+        await self._send(
             topic=self.frame_topic,
             key=str(session_id),  # Using session_id as key to keep frames ordered
             value=frame_data
@@ -61,7 +171,7 @@ class KafkaService:
             "start_timestamp":start_timestamp,
             "end_timestamp":end_timestamp
         }
-        await self.producer.send(
+        await self._send(
             topic=self.blink_topic,
             key=str(session_id),  # Using session_id as key to keep frames ordered
             value=blink_data
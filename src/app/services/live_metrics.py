@@ -0,0 +1,152 @@
+from collections import deque
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+# EAR is bounded (about 0.05-0.45 in practice); percentiles come from a fixed-bin histogram
+EAR_BIN_WIDTH = 0.0025
+EAR_BINS = 240  # covers 0-0.6, values above land in the last bin
+
+
+class _Window:
+    """Aggregates of one rolling window, updated as samples enter and leave it"""
+    __slots__ = ('seconds', 'ears', 'histogram', 'blinks', 'duration_sum')
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.ears = deque()    # (timestamp, bin) of the frames in the window
+        self.histogram = [0] * EAR_BINS
+        self.blinks = deque()  # (end timestamp, duration)
+        self.duration_sum = 0.0
+
+    def add_ear(self, timestamp, ear):
+        index = min(EAR_BINS - 1, max(0, int(ear / EAR_BIN_WIDTH)))
+        self.ears.append((timestamp, index))
+        self.histogram[index] += 1
+
+    def add_blink(self, timestamp, duration):
+        self.blinks.append((timestamp, duration))
+        self.duration_sum += duration
+
+    def evict(self, now):
+        horizon = now - self.seconds
+        while self.ears and self.ears[0][0] < horizon:
+            self.histogram[self.ears.popleft()[1]] -= 1
+        while self.blinks and self.blinks[0][0] < horizon:
+            self.duration_sum -= self.blinks.popleft()[1]
+
+    def percentiles(self, percentiles):
+        """EAR at each percentile (bin centre), one pass over the histogram"""
+        n = len(self.ears)
+        if not n:
+            return [None] * len(percentiles)
+        # Same rank as indexing the sorted sample at n * p // 100
+        ranks = [min(n - 1, n * p // 100) for p in percentiles]
+        result = [None] * len(ranks)
+        cumulative = 0
+        pending = 0
+        for index, count in enumerate(self.histogram):
+            cumulative += count
+            while pending < len(ranks) and ranks[pending] < cumulative:
+                result[pending] = round((index + 0.5) * EAR_BIN_WIDTH, 4)
+                pending += 1
+            if pending == len(ranks):
+                break
+        return result
+
+
+class LiveMetrics:
+    """
+    Rolling fatigue aggregates for one monitoring WebSocket.
+    Blinks are detected from the EAR stream itself (closure below `ear_threshold` for at
+    least `min_frames` frames, the same rule as the blink detectors), so the numbers do not
+    depend on the client's event flags. All windows are measured on the frame timestamps.
+    Each window keeps running sums and an EAR histogram, so a snapshot costs the same
+    however many frames the windows hold.
+    """
+    PERCENTILES = (10, 50, 90)
+
+    def __init__(self, windows=(60, 300), ear_threshold=0.28, min_frames=4):
+        self.windows = [_Window(s) for s in sorted(int(w) for w in windows)]
+        self.ear_threshold = ear_threshold
+        self.min_frames = min_frames
+
+        self.total_blinks = 0
+        self.total_frames = 0
+        self.invalid_frames = 0  # dropped: timestamp or ear not a number
+        self.pending_frames = 0  # frames received since the last snapshot
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+        # Closure in progress
+        self._closure_start = None
+        self._closure_frames = 0
+
+    def add_frame(self, timestamp, ear):
+        """Add one frame (ear None or NaN = no face); frames with non-numeric fields are dropped"""
+        if timestamp is None:
+            return
+        try:
+            value = None if ear is None else float(ear)
+            valid = math.isfinite(float(timestamp)) and (value is None or not math.isinf(value))
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            self.invalid_frames += 1
+            if self.invalid_frames == 1:
+                logger.warning(f"Dropping frames with non-numeric fields from live metrics (first: {timestamp!r}, {ear!r})")
+            return
+        timestamp, ear = float(timestamp), value
+        self.total_frames += 1
+        self.pending_frames += 1
+        self.last_timestamp = timestamp
+        if ear is None or math.isnan(ear):
+            return
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        for window in self.windows:
+            window.add_ear(timestamp, ear)
+            window.evict(timestamp)
+
+        if 0 < ear < self.ear_threshold:
+            if self._closure_start is None:
+                self._closure_start = timestamp
+            self._closure_frames += 1
+        elif ear > self.ear_threshold and self._closure_start is not None:
+            if self._closure_frames >= self.min_frames:
+                for window in self.windows:
+                    window.add_blink(timestamp, timestamp - self._closure_start)
+                self.total_blinks += 1
+            self._closure_start = None
+            self._closure_frames = 0
+
+    def _window(self, window):
+        blinks = len(window.blinks)
+        # Rate over the covered span, so a fresh connection doesn't report a diluted rate
+        span = min(window.seconds, self.last_timestamp - self.first_timestamp) if self.first_timestamp is not None else 0
+        row = {
+            "blinks": blinks,
+            "blinks_per_min": round(blinks / span * 60, 2) if span > 0 else None,
+            "mean_closure_ms": round(window.duration_sum / blinks * 1000, 1) if blinks else None,
+        }
+        for p, value in zip(self.PERCENTILES, window.percentiles(self.PERCENTILES)):
+            row[f"ear_p{p}"] = value
+        return row
+
+    def snapshot(self):
+        """Compact metrics message; also acknowledges the frames received since the last one"""
+        message = {
+            "type": "metrics",
+            "timestamp": self.last_timestamp,  # last frame received (cumulative ack)
+            "count": self.pending_frames,
+            "total_blinks": self.total_blinks,
+        }
+        if self.last_timestamp is not None:
+            windows = {}
+            for window in self.windows:
+                window.evict(self.last_timestamp)
+                windows[str(window.seconds)] = self._window(window)
+            message["windows"] = windows
+        self.pending_frames = 0
+        return message
@@ -0,0 +1,59 @@
+"""
+Reads the per-user hourly and daily fatigue rollups maintained by the session consumer
+(kafka_consumers/app/user_rollups.py). Buckets store sums; the statistics are derived here,
+so a query touches one row per bucket however long the user's history is.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+GRANULARITIES = {
+    # name -> (table, bucket column, bucket seconds)
+    'hourly': ('operation.user_fatigue_hourly', 'bucket_start', 3600),
+    'daily': ('operation.user_fatigue_daily', 'day', 86400),
+}
+
+_DERIVED = """
+    sessions,
+    session_minutes,
+    total_blinks,
+    sum_duration / NULLIF(total_blinks, 0) AS mean_duration,
+    CASE WHEN total_blinks > 1
+        THEN GREATEST(0, (sumsq_duration - sum_duration * sum_duration / total_blinks) / (total_blinks - 1))
+    END AS duration_variance,
+    sum_interval / NULLIF(interval_count, 0) AS mean_interval,
+    CASE WHEN interval_count > 1
+        THEN GREATEST(0, (sumsq_interval - sum_interval * sum_interval / interval_count) / (interval_count - 1))
+    END AS interval_variance,
+    total_blinks / NULLIF(session_minutes, 0) AS blink_rate,
+    fatigue_minutes / NULLIF(scored_minutes, 0) AS fatigue_score
+"""
+
+_QUERIES = {
+    name: text(f"""
+        SELECT {column} AS bucket, {_DERIVED}
+        FROM {table}
+        WHERE user_id = :user_id AND {column} >= :start AND {column} < :end
+        ORDER BY {column}
+    """)
+    for name, (table, column, _) in GRANULARITIES.items()
+}
+
+
+async def read_rollups(db, user_id, granularity, start, end):
+    """
+    Rollup buckets of one user overlapping [start, end) (epoch seconds)
+    Returns:
+        list of dicts; hourly buckets as epoch seconds, daily buckets as ISO dates
+    """
+    start, end = datetime.fromtimestamp(start), datetime.fromtimestamp(end)
+    if granularity == 'daily':
+        start, end = start.date(), (end - timedelta(microseconds=1)).date() + timedelta(days=1)
+    else:
+        start = start.replace(minute=0, second=0, microsecond=0)
+    result = await db.execute(_QUERIES[granularity], {"user_id": user_id, "start": start, "end": end})
+    buckets = []
+    for row in result.mappings():
+        bucket = dict(row)
+        bucket["bucket"] = bucket["bucket"].isoformat() if granularity == 'daily' else bucket["bucket"].timestamp()
+        buckets.append(bucket)
+    return buckets
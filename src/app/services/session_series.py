@@ -0,0 +1,209 @@
+"""
+EAR history of a past or running session, downsampled for charts.
+Frames are read from operation.frame_chunks when the frame consumer stores chunks and from
+operation.raw_frame_data otherwise (reduced to a few frames per bucket in SQL); blink events are
+overlaid from operation.blink_events.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import text
+import numpy as np
+from .frame_chunks import decode_chunks
+
+SESSION_SQL = text("""
+    SELECT user_id, start_time, end_time, status FROM operation.sessions
+    WHERE session_id = :session_id
+""")
+
+CHUNKS_SQL = text("""
+    SELECT data FROM operation.frame_chunks
+    WHERE session_id = :session_id
+    AND (CAST(:start AS timestamp) IS NULL OR last_ts >= CAST(:start AS timestamp))
+    AND (CAST(:end AS timestamp) IS NULL OR chunk_start <= CAST(:end AS timestamp))
+    ORDER BY chunk_start, first_ts
+""")
+
+# Raw rows are reduced in PostgreSQL: the range is split into :buckets equal-time buckets and
+# only the first, last, lowest and highest frame of each leaves the database (<= 4 per bucket).
+# Every returned row carries the number of frames in the range.
+ROWS_SQL = text("""
+    WITH frames AS (
+        SELECT timestamp, ear FROM operation.raw_frame_data
+        WHERE session_id = :session_id
+        AND (CAST(:start AS timestamp) IS NULL OR timestamp >= CAST(:start AS timestamp))
+        AND (CAST(:end AS timestamp) IS NULL OR timestamp <= CAST(:end AS timestamp))
+    ), bounds AS (
+        SELECT
+            EXTRACT(EPOCH FROM min(timestamp)) AS lo,
+            EXTRACT(EPOCH FROM max(timestamp)) AS hi,
+            count(*) AS frames
+        FROM frames
+    ), bucketed AS (
+        SELECT
+            f.timestamp, f.ear, b.frames,
+            CASE WHEN b.hi > b.lo
+                THEN LEAST(width_bucket(EXTRACT(EPOCH FROM f.timestamp), b.lo, b.hi, :buckets), :buckets)
+                ELSE 1 END AS bucket
+        FROM frames f CROSS JOIN bounds b
+        WHERE f.ear IS NOT NULL
+    ), ranked AS (
+        SELECT
+            timestamp, ear, frames,
+            row_number() OVER (PARTITION BY bucket ORDER BY timestamp) AS first_rank,
+            row_number() OVER (PARTITION BY bucket ORDER BY timestamp DESC) AS last_rank,
+            row_number() OVER (PARTITION BY bucket ORDER BY ear, timestamp) AS min_rank,
+            row_number() OVER (PARTITION BY bucket ORDER BY ear DESC, timestamp) AS max_rank
+        FROM bucketed
+    )
+    SELECT timestamp, ear, frames FROM ranked
+    WHERE first_rank = 1 OR last_rank = 1 OR min_rank = 1 OR max_rank = 1
+    ORDER BY timestamp
+""")
+
+BLINKS_SQL = text("""
+    SELECT start_time, end_time, duration FROM operation.blink_events
+    WHERE session_id = :session_id
+    AND (CAST(:start AS timestamp) IS NULL OR end_time >= CAST(:start AS timestamp))
+    AND (CAST(:end AS timestamp) IS NULL OR start_time <= CAST(:end AS timestamp))
+    ORDER BY start_time
+""")
+
+METHODS = ('lttb', 'minmax')
+
+_has_chunk_table = None  # checked once per process
+
+
+def lttb(x, y, points):
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last sample and, per bucket, the
+    sample forming the largest triangle with the previous pick and the next bucket's mean.
+    Returns the indices of the kept samples.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def minmax(x, y, points):
+    """Minimum and maximum of `points` / 2 equal-count buckets, in time order; returns indices"""
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, max(1, points // 2) + 1).astype(np.int64)
+    selected = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            segment = y[lo:hi]
+            selected.extend(sorted({lo + int(segment.argmin()), lo + int(segment.argmax())}))
+    return np.asarray(selected, dtype=np.int64)
+
+
+def downsample(timestamps, ears, points, method='lttb'):
+    """Drop frames without a face (NaN), then reduce to at most `points` samples"""
+    mask = ~np.isnan(ears)
+    x = timestamps[mask]
+    y = ears[mask].astype(np.float64)
+    index = lttb(x, y, points) if method == 'lttb' else minmax(x, y, points)
+    return x[index], y[index]
+
+
+async def _has_chunks(db):
+    global _has_chunk_table
+    if _has_chunk_table is None:
+        result = await db.execute(text("SELECT to_regclass('operation.frame_chunks') IS NOT NULL"))
+        _has_chunk_table = bool(result.scalar())
+    return _has_chunk_table
+
+
+async def load_frames(db, session_id, start=None, end=None, buckets=1000):
+    """
+    Frames of a session between `start` and `end` (epoch seconds, None = open-ended).
+    Chunked sessions return every frame; raw rows are pre-reduced in SQL to the first, last,
+    minimum and maximum frame of `buckets` time buckets.
+    Returns:
+        (timestamps, ears, frames): NumPy arrays and the number of frames in the range
+    """
+    params = _range_params(session_id, start, end)
+    if await _has_chunks(db):
+        payloads = (await db.execute(CHUNKS_SQL, params)).scalars().all()
+        if payloads:
+            timestamps, ears = decode_chunks(payloads, start, end)
+            return timestamps, ears, len(timestamps)
+    rows = (await db.execute(ROWS_SQL, {**params, "buckets": max(1, int(buckets))})).all()
+    timestamps = np.fromiter((row[0].timestamp() for row in rows), dtype=np.float64, count=len(rows))
+    ears = np.fromiter((row[1] for row in rows), dtype=np.float32, count=len(rows))
+    return timestamps, ears, rows[0][2] if rows else 0
+
+
+async def load_blinks(db, session_id, start=None, end=None):
+    rows = (await db.execute(BLINKS_SQL, _range_params(session_id, start, end))).all()
+    return [
+        {"start": round(row[0].timestamp(), 3), "end": round(row[1].timestamp(), 3), "duration": row[2]}
+        for row in rows
+    ]
+
+
+async def build_series(db, session_id, start=None, end=None, points=1000, method='lttb'):
+    """Downsampled EAR series with the blink events of the same range"""
+    timestamps, ears, frames = await load_frames(db, session_id, start, end, buckets=points)
+    x, y = downsample(timestamps, ears, points, method)
+    return {
+        "session_id": session_id,
+        "method": method,
+        "frames": frames,
+        "points": len(x),
+        "timestamps": np.round(x, 3).tolist(),
+        "ear": np.round(y, 4).tolist(),
+        "blinks": await load_blinks(db, session_id, start, end),
+    }
+
+
+def _range_params(session_id, start, end):
+    return {
+        "session_id": session_id,
+        "start": datetime.fromtimestamp(start) if start is not None else None,
+        "end": datetime.fromtimestamp(end) if end is not None else None,
+    }
+
+
+class SeriesCache:
+    """
+    Bounded LRU of encoded series responses, keyed by (session, range, budget, method).
+    Only completed sessions are cached: their frames no longer change.
+    """
+    def __init__(self, max_size: int = 256):
+        self.max_size = max(1, int(max_size))
+        self._cache = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        body = self._cache.get(key)
+        if body is None:
+            self.stats['misses'] += 1
+            return None
+        self._cache.move_to_end(key)
+        self.stats['hits'] += 1
+        return body
+
+    def put(self, key, body):
+        self._cache[key] = body
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get_stats(self):
+        return {'size': len(self._cache), 'capacity': self.max_size, **self.stats}
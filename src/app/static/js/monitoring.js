@@ -170,6 +170,10 @@ class WebcamMonitor {
         this.detector = new BlinkDetector(true);
         this.graph = EARGraph.getInstance();
         this.websocket = null;
+        this.frameBuffer = [];
+        this.flushTimer = null;
+        this.FLUSH_INTERVAL_MS = 250; // Frames are sent as one batch envelope per interval
+        this.BINARY_FRAMES = false;   // Send packed binary batches instead of JSON (see services/codec.py)
         
         // Initialize display canvas
         document.querySelector('.container').appendChild(this.displayCanvas);
@@ -184,11 +188,16 @@ class WebcamMonitor {
         
         this.websocket.onopen = () => {
             console.log('WebSocket connection established');
+            this.flushTimer = setInterval(() => this.flushFrames(), this.FLUSH_INTERVAL_MS);
         };
         
         this.websocket.onmessage = (event) => {
             const response = JSON.parse(event.data);
-            console.log('Server response:', response);
+            if (response.type === 'metrics') {
+                this.renderMetrics(response); // Server-authoritative aggregates, pushed ~1 Hz
+            } else {
+                console.log('Server response:', response);
+            }
         };
         
         this.websocket.onerror = (error) => {
@@ -197,9 +206,59 @@ class WebcamMonitor {
         
         this.websocket.onclose = () => {
             console.log('WebSocket connection closed');
+            clearInterval(this.flushTimer);
+            this.flushTimer = null;
         };
     }
 
+    renderMetrics(metrics) {
+        const panel = document.getElementById('liveMetrics');
+        if (!panel || !metrics.windows) return;
+        const fmt = (value, digits = 2) => value == null ? '-' : Number(value).toFixed(digits);
+        const rows = Object.entries(metrics.windows).map(([seconds, w]) => `
+            <tr>
+                <td>${seconds / 60} min</td>
+                <td>${w.blinks}</td>
+                <td>${fmt(w.blinks_per_min, 1)}</td>
+                <td>${fmt(w.mean_closure_ms, 0)}</td>
+                <td>${fmt(w.ear_p10)} / ${fmt(w.ear_p50)} / ${fmt(w.ear_p90)}</td>
+            </tr>`).join('');
+        panel.innerHTML = `
+            <p>Total blinks: ${metrics.total_blinks}</p>
+            <table>
+                <tr><th>Window</th><th>Blinks</th><th>Blinks/min</th><th>Mean closure (ms)</th><th>EAR p10 / p50 / p90</th></tr>
+                ${rows}
+            </table>`;
+    }
+
+    flushFrames() {
+        if (this.frameBuffer.length === 0) return;
+        if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
+            if (this.BINARY_FRAMES) {
+                this.websocket.send(this.packFrames(this.frameBuffer));
+            } else {
+                this.websocket.send(JSON.stringify({ v: 2, frames: this.frameBuffer }));
+            }
+        }
+        this.frameBuffer = [];
+    }
+
+    packFrames(frames) {
+        // version u8 | kind u8 | count u16 | count x (timestamp f64 | ear f32 | flags u8), little-endian
+        const buffer = new ArrayBuffer(4 + frames.length * 13);
+        const view = new DataView(buffer);
+        view.setUint8(0, 1);
+        view.setUint8(1, 3);
+        view.setUint16(2, frames.length, true);
+        frames.forEach((frame, i) => {
+            const offset = 4 + i * 13;
+            view.setFloat64(offset, frame.timestamp, true);
+            view.setFloat32(offset + 8, frame.ear_value == null ? NaN : frame.ear_value, true);
+            view.setUint8(offset + 12, (frame.event_onset ? 1 : 0) | (frame.event_end ? 2 : 0));
+        });
+        return buffer;
+    }
+
     async startRecording() {
         try {
             this.initializeWebSocket(); // Initialize WebSocket connection
@@ -252,15 +311,14 @@ class WebcamMonitor {
                     // Process frame directly with BlinkDetector
                     const result = await this.detector.processFrame(this.displayCanvas);
 
-                    // Send data through WebSocket if connection is open
+                    // Queue data for the next batch sent through the WebSocket
                     if (this.websocket && this.websocket.readyState === WebSocket.OPEN) {
-                        const data = {
+                        this.frameBuffer.push({
                             timestamp: result.timestamp,
                             ear_value: result.ear_value,
                             event_onset: result.event_onset,
                             event_end: result.event_end
-                        };
-                        this.websocket.send(JSON.stringify(data));
+                        });
                     }
                     
                     // Update graph with processed data
@@ -282,8 +340,9 @@ class WebcamMonitor {
         this.graph.stop();
         document.getElementById('recordBtn').textContent = 'Start Recording';
 
-        // Close WebSocket connection
+        // Close WebSocket connection after sending the remaining frames
         if (this.websocket) {
+            this.flushFrames();
             this.websocket.close();
             this.websocket = null;
         }
@@ -9,8 +9,16 @@ class BlinkDetector:
     """
     BlinkDetector object used for processing the webcam frames.
     Returns: mean EAR at frame f, and annotated frame (if annotation is set True during init)
+
+    Lean mode (lean=True) is meant for callers that only need the EAR:
+        - the JPEG encode is skipped unless `encode=True` (at init or per call)
+        - once a face is locked, inference runs on a crop around the face,
+          downscaled to at most `roi_max_side` pixels, instead of the whole frame
+        - while the eyes are steadily open (EAR above threshold + `skip_margin`),
+          up to `max_skip` frames are skipped between inferences and report the last EAR
     """
-    def __init__(self, annotate=False):
+    def __init__(self, annotate=False, lean=False, encode=None, roi_margin=0.3, roi_max_side=256,
+                 max_skip=1, skip_margin=0.06):
         # Initialize MediaPipe Face Mesh
         self.mp_face_mesh = mp.solutions.face_mesh
         self.face_mesh = self.mp_face_mesh.FaceMesh(
@@ -21,6 +29,22 @@ class BlinkDetector:
         # MediaPipe indices for the eye landmarks
         self.LEFT_EYE = [362, 385, 387, 263, 373, 380]
         self.RIGHT_EYE = [33, 160, 158, 133, 153, 144]
+        self.EYE_INDICES = self.LEFT_EYE + self.RIGHT_EYE
+
+        # Preallocated buffers for the vectorized EAR path (no allocation per frame)
+        self._EYE_IDX = np.array(self.EYE_INDICES)
+        self._landmarks = np.empty((468, 2))            # all face mesh landmarks (x, y), normalized
+        self._eye_points = np.empty((12, 2))            # left eye rows 0-5, right eye rows 6-11
+        self._eyes = self._eye_points.reshape(2, 6, 2)   # view: (eye, landmark, xy)
+        self._pair_a = np.empty((2, 3, 2))
+        self._pair_b = np.empty((2, 3, 2))
+        self._norms = np.empty((2, 3))
+        # Landmark pairs per eye: vertical p2-p6, vertical p3-p5, horizontal p1-p4
+        self._A_IDX = np.array([1, 2, 0])
+        self._B_IDX = np.array([5, 4, 3])
+        # Face oval extremes (top, chin, left, right) used to track the face ROI
+        self.FACE_BOX = [10, 152, 234, 454]
+        self._buffers = {}  # name -> image buffer reused while the shape stays the same
 
         # State tracking variable for intelligent blink detection
         self.counter = 0
@@ -32,6 +56,20 @@ class BlinkDetector:
 
         # configs for the instance
         self.annotate = annotate
+        self.lean = lean
+        self.encode = (not lean) if encode is None else encode
+        self.ROI_MARGIN = roi_margin # Fraction of the face box added on every side of the crop
+        self.ROI_MAX_SIDE = roi_max_side
+        self.MAX_SKIP = max_skip if lean else 0
+        self.SKIP_MARGIN = skip_margin
+        self.STEADY_FRAMES = 3 # Open frames in a row before skipping starts
+
+        # Lean mode state
+        self._roi = None # (x0, y0, x1, y1) in frame pixels, None until a face is locked
+        self._last_ear = None
+        self._open_streak = 0
+        self._skipped = 0
+        self._skip_time = None # time of the previous frame if it was skipped, else None
 
 
     def calculate_ear(self, eye_landmarks):
@@ -48,37 +86,168 @@ class BlinkDetector:
         # Calculate EAR
         ear = (A + B) / (2.0 * C)
         return ear
+
+
+    def _gather_eye_points(self, face_landmarks, frame_width, frame_height):
+        """
+        Fill the preallocated (N, 2) landmark array from the face mesh, then take the 12 eye
+        landmarks with one fancy index, scaled to pixels into the (12, 2) eye buffer
+        """
+        landmark = face_landmarks.landmark
+        if len(self._landmarks) != len(landmark):
+            self._landmarks = np.empty((len(landmark), 2))  # e.g. 478 with refined landmarks
+        self._landmarks[:] = [(point.x, point.y) for point in landmark]
+        return np.multiply(self._landmarks[self._EYE_IDX], (frame_width, frame_height), out=self._eye_points)
+
+
+    def _mean_ear(self):
+        """
+        EAR of both eyes from the gathered eye points in one pass; returns the mean EAR
+        """
+        np.take(self._eyes, self._A_IDX, axis=1, out=self._pair_a)
+        np.take(self._eyes, self._B_IDX, axis=1, out=self._pair_b)
+        np.subtract(self._pair_a, self._pair_b, out=self._pair_a)
+        np.multiply(self._pair_a, self._pair_a, out=self._pair_a)
+        np.sum(self._pair_a, axis=2, out=self._norms)
+        np.sqrt(self._norms, out=self._norms)
+        n = self._norms
+        left_ear = (n[0, 0] + n[0, 1]) / (2.0 * n[0, 2])
+        right_ear = (n[1, 0] + n[1, 1]) / (2.0 * n[1, 2])
+        return float((left_ear + right_ear) / 2.0)
+
+
+    def _buffer(self, name, shape, dtype=np.uint8):
+        """
+        Reusable image buffer; only reallocated when the requested shape changes
+        """
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = self._buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+
+
+    def _infer(self, image, downscale=False):
+        """
+        Run the face mesh on a BGR image; returns the first face's landmarks or None.
+        Landmarks are normalized to `image` (a downscale keeps the aspect ratio).
+        """
+        if downscale and max(image.shape[:2]) > self.ROI_MAX_SIDE:
+            scale = self.ROI_MAX_SIDE / max(image.shape[:2])
+            size = (max(1, int(image.shape[1] * scale)), max(1, int(image.shape[0] * scale)))
+            small = self._buffer('small', (size[1], size[0], 3))
+            image = cv2.resize(image, size, dst=small, interpolation=cv2.INTER_AREA)
+        rgb_frame = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self._buffer('rgb', image.shape))
+        results = self.face_mesh.process(rgb_frame)
+        if results.multi_face_landmarks:
+            return results.multi_face_landmarks[0] # Choose the first one
+        return None
+
+
+    def _track_roi(self, face_landmarks, offset_x, offset_y, width, height, frame_width, frame_height):
+        """
+        Keep the crop around the face. The ROI only moves when the face gets close to
+        its border or shrinks well inside it, so the crop size (and its buffers) stay stable.
+        """
+        landmark = face_landmarks.landmark
+        xs = [offset_x + landmark[i].x * width for i in self.FACE_BOX]
+        ys = [offset_y + landmark[i].y * height for i in self.FACE_BOX]
+        box_x0, box_x1, box_y0, box_y1 = min(xs), max(xs), min(ys), max(ys)
+        margin_x = (box_x1 - box_x0) * self.ROI_MARGIN
+        margin_y = (box_y1 - box_y0) * self.ROI_MARGIN
+
+        if self._roi is not None:
+            x0, y0, x1, y1 = self._roi
+            inside = (box_x0 - margin_x / 2 >= x0 and box_x1 + margin_x / 2 <= x1 and
+                      box_y0 - margin_y / 2 >= y0 and box_y1 + margin_y / 2 <= y1)
+            loose = (box_x1 - box_x0) * (box_y1 - box_y0) < 0.25 * (x1 - x0) * (y1 - y0)
+            if inside and not loose:
+                return
+
+        self._roi = (
+            max(0, int(box_x0 - margin_x)),
+            max(0, int(box_y0 - margin_y)),
+            min(frame_width, int(box_x1 + margin_x) + 1),
+            min(frame_height, int(box_y1 + margin_y) + 1)
+        )
+
+
+    def _detect_ear(self, frame):
+        """
+        Mean EAR of a frame (None without a face). In lean mode the tracked ROI is tried
+        first and the whole frame is searched again when the face is lost.
+        """
+        frame_height, frame_width = frame.shape[:2]
+        if self.lean and self._roi is not None:
+            x0, y0, x1, y1 = self._roi
+            face_landmarks = self._infer(frame[y0:y1, x0:x1], downscale=True)
+            if face_landmarks is not None:
+                self._gather_eye_points(face_landmarks, x1 - x0, y1 - y0)
+                self._eye_points += (x0, y0) # back to full-frame pixels
+                self._track_roi(face_landmarks, x0, y0, x1 - x0, y1 - y0, frame_width, frame_height)
+                return self._mean_ear()
+            self._roi = None # Lost the face, fall back to the full frame
+
+        face_landmarks = self._infer(frame)
+        if face_landmarks is None:
+            return None
+        self._gather_eye_points(face_landmarks, frame_width, frame_height)
+        if self.lean:
+            self._track_roi(face_landmarks, 0, 0, frame_width, frame_height, frame_width, frame_height)
+        return self._mean_ear()
+
+
+    def process_batch(self, frames):
+        """
+        Compute the mean EAR for many BGR frames at once.
+        Returns a float array with one EAR per frame, NaN where no face was found.
+        Blink state and annotation are not touched.
+        """
+        ears = np.full(len(frames), np.nan)
+        for idx, frame in enumerate(frames):
+            face_landmarks = self._infer(frame)
+            if face_landmarks is not None:
+                frame_height, frame_width = frame.shape[:2]
+                self._gather_eye_points(face_landmarks, frame_width, frame_height)
+                ears[idx] = self._mean_ear()
+        return ears
     
     
-    def process_frame(self, frame, **kwargs):
+    def process_frame(self, frame, encode=None, **kwargs):
         """
         Process a single frame and detect blinks
+        Args:
+            frame: BGR frame
+            encode: Return the (annotated) frame as JPEG bytes; defaults to the instance setting
         """
-        # Convert the BGR image to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(rgb_frame)
-        frame_height, frame_width = frame.shape[:2]
-        ear = None # EAR = None indicates no face presnece or no valid face landmarks
-        if results.multi_face_landmarks:
-            face_landmarks = results.multi_face_landmarks[0] # Choose the first one
-            left_eye = np.array([[face_landmarks.landmark[i].x * frame_width,
-                                face_landmarks.landmark[i].y * frame_height] 
-                                for i in self.LEFT_EYE])
-            right_eye = np.array([[face_landmarks.landmark[i].x * frame_width,
-                                 face_landmarks.landmark[i].y * frame_height] 
-                                 for i in self.RIGHT_EYE])  
-            left_ear = self.calculate_ear(left_eye)
-            right_ear = self.calculate_ear(right_eye)
-
-            # Average EAR
-            ear = (left_ear + right_ear) / 2.0
-            
+        if encode is None:
+            encode = self.encode
+
+        # Eyes steadily open: reuse the last EAR for up to MAX_SKIP frames
+        skip_budget = self.MAX_SKIP if self._open_streak >= self.STEADY_FRAMES else 0
+        skipped = self._skipped < skip_budget
+        now = time.time()
+        if skipped:
+            self._skipped += 1
+            ear = self._last_ear
+        else:
+            self._skipped = 0
+            ear = self._detect_ear(frame) # EAR = None indicates no face presnece or no valid face landmarks
+            self._last_ear = ear
+            if ear is not None and ear > self.EAR_THRESHOLD + self.SKIP_MARGIN:
+                self._open_streak += 1
+            else:
+                self._open_streak = 0 # Eyes closing (or no face): process every frame
+
+        if ear is not None and not skipped:
             # Spontaneous blink detection
             if 0 < ear < self.EAR_THRESHOLD:
                 if self.closure is None:  # Start of new closure
-                    self.closure = time.time()
+                    self.closure = now
+                    if self._skip_time is not None:
+                        # The eye may have closed on the skipped frame before: count it and backdate
+                        self.closure = self._skip_time
+                        self.counter += 1
                 self.counter += 1  # Increment counter for every frame while eye is closed
-                print(f"self.counter:{self.counter}", ear, self.total_blinks)
             
             elif ear > self.EAR_THRESHOLD:  # Eye is open
                 if self.closure is not None: # Eye was closed
@@ -88,16 +257,20 @@ class BlinkDetector:
                     self.closure = None
                     self.counter = 0
 
-            if self.annotate: # Visualization
-                for eye in [left_eye, right_eye]:
-                    for point in eye:
-                        cv2.circle(frame, tuple(point.astype(int)), 2, (0, 255, 0), -1)
-                cv2.putText(frame, f"EAR: {ear:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                cv2.putText(frame, f"Blinks: {self.total_blinks}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        self._skip_time = now if skipped else None
+
+        if self.annotate and ear is not None and not skipped: # Visualization (landmarks are stale on skipped frames)
+            left_eye, right_eye = self._eyes
+            for eye in [left_eye, right_eye]:
+                for point in eye:
+                    cv2.circle(frame, tuple(point.astype(int)), 2, (0, 255, 0), -1)
+            cv2.putText(frame, f"EAR: {ear:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.putText(frame, f"Blinks: {self.total_blinks}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         
         # Transform the annotated frame to bytes
         return {
-            'frame_bytes': cv2.imencode('.jpg', frame)[1].tobytes(),
+            'frame_bytes': cv2.imencode('.jpg', frame)[1].tobytes() if encode else None,
             'ear_value': ear,
-            'timestamp': time.time()
-        }
\ No newline at end of file
+            'skipped': skipped,
+            'timestamp': now
+        }
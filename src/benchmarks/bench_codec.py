@@ -0,0 +1,83 @@
+"""
+Compare the JSON and struct value codecs used on the Kafka frame/blink topics
+and the JSON vs packed binary WebSocket batches.
+
+Usage (from src/):
+    python -m benchmarks.bench_codec [--frames 100000] [--json]
+"""
+import argparse
+import json
+import random
+import time
+from app.services.codec import CODECS, decode_value, pack_client_frames, unpack_client_frames
+
+
+def _frames(n):
+    start = time.time()
+    return [
+        {"session_id": random.randint(1, 2**31 - 1), "timestamp": start + i / 30.0, "ear_value": random.uniform(0.15, 0.4)}
+        for i in range(n)
+    ]
+
+
+def _time(fn, items):
+    started = time.perf_counter()
+    out = [fn(item) for item in items]
+    return (time.perf_counter() - started) / len(items), out
+
+
+def bench_kafka(frames):
+    results = {}
+    for name, codec in CODECS.items():
+        encode_s, encoded = _time(codec.encode, frames)
+        decode_s, _ = _time(decode_value, encoded)
+        results[name] = {
+            "bytes_per_frame": sum(len(b) for b in encoded) / len(encoded),
+            "encode_us": encode_s * 1e6,
+            "decode_us": decode_s * 1e6,
+        }
+    return results
+
+
+def bench_websocket(frames, batch_size=8):
+    # 8 frames is roughly one 250 ms batch at 30 fps
+    client_frames = [
+        {"timestamp": f["timestamp"], "ear_value": f["ear_value"], "event_onset": False, "event_end": False}
+        for f in frames
+    ]
+    batches = [client_frames[i:i + batch_size] for i in range(0, len(client_frames), batch_size)]
+    json_encode = lambda b: json.dumps({"v": 2, "frames": b}).encode('utf-8')
+    json_decode = lambda m: json.loads(m)["frames"]
+    results = {}
+    for name, encode, decode in (("json", json_encode, json_decode),
+                                 ("binary", pack_client_frames, unpack_client_frames)):
+        encode_s, encoded = _time(encode, batches)
+        decode_s, _ = _time(decode, encoded)
+        results[name] = {
+            "bytes_per_frame": sum(len(m) for m in encoded) / len(client_frames),
+            "encode_us_per_frame": encode_s * 1e6 / batch_size,
+            "decode_us_per_frame": decode_s * 1e6 / batch_size,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=100_000)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    frames = _frames(args.frames)
+    results = {"frames": args.frames, "kafka": bench_kafka(frames), "websocket": bench_websocket(frames)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for path in ("kafka", "websocket"):
+        print(f"[{path}]")
+        for name, row in results[path].items():
+            print(f"  {name:<7} " + "  ".join(f"{k}={v:.2f}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Storage size and encode/decode speed of the chunked frame layout (kafka_consumers/app/frame_chunks.py)
+compared with one operation.raw_frame_data row per frame.
+
+Row-layout sizes are the usual PostgreSQL estimates: a 24-byte tuple header, a 4-byte line
+pointer and 24 bytes of data per heap row, and about 32 bytes per (session_id, timestamp)
+B-tree entry. Chunk rows are counted the same way plus their payload.
+
+Usage (from src/):
+    python -m benchmarks.bench_frame_chunks [--hours 8] [--fps 30] [--chunk-seconds 60] [--json]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "kafka_consumers" / "app"))
+
+from frame_chunks import ChunkAssembler, decode_chunks  # noqa: E402
+
+ROW_BYTES = 24 + 4 + 24
+INDEX_ENTRY_BYTES = 32
+CHUNK_ROW_BYTES = 24 + 4 + 8 + 8 * 3 + 4 + 4  # header, pointer, columns, bytea length
+
+
+def synthetic_stream(hours, fps, seed=0):
+    """Open-eye EAR with noise, jittered frame times and a blink every few seconds"""
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600 * fps)
+    timestamps = time.time() + np.cumsum(rng.normal(1 / fps, 0.002 / fps, n).clip(0.5 / fps))
+    ears = rng.normal(0.31, 0.015, n)
+    blink_starts = np.cumsum(rng.uniform(2, 6, int(hours * 3600 / 2)) * fps).astype(int)
+    for start in blink_starts[blink_starts < n - 8]:
+        ears[start:start + rng.integers(3, 8)] = rng.uniform(0.12, 0.22)
+    ears[rng.random(n) < 0.002] = np.nan
+    return timestamps, ears
+
+
+def bench(timestamps, ears, chunk_seconds, ear_dtype):
+    assembler = ChunkAssembler(chunk_seconds=chunk_seconds, ear_dtype=ear_dtype)
+    started = time.perf_counter()
+    rows = []
+    for ts, ear in zip(timestamps.tolist(), ears.tolist()):
+        rows.extend(assembler.add(1, ts, ear))
+    rows.extend(assembler.seal_all())
+    encode_s = time.perf_counter() - started
+
+    payloads = [row[5] for row in rows]
+    started = time.perf_counter()
+    decoded_ts, decoded_ears = decode_chunks(payloads)
+    decode_s = time.perf_counter() - started
+
+    # One 5-minute range from the middle: the chunks a range read fetches
+    middle = timestamps[len(timestamps) // 2]
+    range_payloads = [r[5] for r in rows if r[3].timestamp() >= middle and r[1].timestamp() <= middle + 300]
+    started = time.perf_counter()
+    decode_chunks(range_payloads, middle, middle + 300)
+    range_s = time.perf_counter() - started
+
+    n = len(timestamps)
+    payload_bytes = sum(len(p) for p in payloads)
+    return {
+        "chunks": len(rows),
+        "payload_bytes_per_frame": payload_bytes / n,
+        "table_bytes_per_frame": (payload_bytes + len(rows) * (CHUNK_ROW_BYTES + INDEX_ENTRY_BYTES)) / n,
+        "encode_us_per_frame": encode_s * 1e6 / n,
+        "decode_us_per_frame": decode_s * 1e6 / n,
+        "range_5min_ms": range_s * 1000,
+        "max_timestamp_error_us": float(np.abs(decoded_ts - timestamps).max() * 1e6),
+        "max_ear_error": float(np.nanmax(np.abs(decoded_ears - ears))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=8.0)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--chunk-seconds", type=float, default=60.0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    timestamps, ears = synthetic_stream(args.hours, args.fps)
+    results = {
+        "frames": len(timestamps),
+        "rows": {"table_bytes_per_frame": ROW_BYTES + INDEX_ENTRY_BYTES},
+        "float16": bench(timestamps, ears, args.chunk_seconds, 'float16'),
+        "float32": bench(timestamps, ears, args.chunk_seconds, 'float32'),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{results['frames']} frames ({args.hours:g} h at {args.fps:g} fps), {args.chunk_seconds:g}s chunks")
+    print(f"rows     {results['rows']['table_bytes_per_frame']:.1f} B/frame (heap + index)")
+    for name in ("float16", "float32"):
+        r = results[name]
+        print(f"{name}  {r['table_bytes_per_frame']:.2f} B/frame ({r['payload_bytes_per_frame']:.2f} payload), "
+              f"{r['chunks']} chunks, encode {r['encode_us_per_frame']:.2f}us/frame, "
+              f"decode {r['decode_us_per_frame']:.3f}us/frame, 5-min range {r['range_5min_ms']:.2f}ms, "
+              f"max error ts={r['max_timestamp_error_us']:.2f}us ear={r['max_ear_error']:.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Measure how long the app takes to import and to start.
+
+Every run happens in a fresh interpreter so module caches don't hide the cost:
+    import    - `import app.main` (should not touch the network)
+    startup   - entering the FastAPI lifespan (Kafka producer, opt-in schema creation)
+    first_db  - first `init_db()` (SSH tunnel + engine), paid by the first request using the DB
+The startup and first_db phases need the services in core/.env to be reachable.
+
+Usage (from src/):
+    python -m benchmarks.bench_startup [--runs 5] [--lifespan] [--db] [--json]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+
+def child(lifespan, db):
+    """Runs in the fresh interpreter; prints the phase timings as JSON"""
+    result = {}
+    started = time.perf_counter()
+    from app.main import app
+    result["import"] = time.perf_counter() - started
+
+    async def phases():
+        if lifespan:
+            started = time.perf_counter()
+            async with app.router.lifespan_context(app):
+                result["startup"] = time.perf_counter() - started
+                if db:
+                    from app.core.database import init_db
+                    started = time.perf_counter()
+                    await init_db()
+                    result["first_db"] = time.perf_counter() - started
+        elif db:
+            from app.core.database import init_db, close_db
+            started = time.perf_counter()
+            await init_db()
+            result["first_db"] = time.perf_counter() - started
+            await close_db()
+
+    asyncio.run(phases())
+    print(json.dumps(result))
+
+
+def run_once(args):
+    cmd = [sys.executable, "-m", "benchmarks.bench_startup", "--child"]
+    if args.lifespan:
+        cmd.append("--lifespan")
+    if args.db:
+        cmd.append("--db")
+    started = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark child failed:\n{proc.stderr}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["process"] = elapsed  # interpreter start to exit
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--lifespan", action="store_true", help="also time the FastAPI lifespan startup")
+    parser.add_argument("--db", action="store_true", help="also time the first database initialization")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.lifespan, args.db)
+        return
+
+    runs = [run_once(args) for _ in range(args.runs)]
+    results = {
+        phase: {
+            "median_ms": statistics.median(r[phase] for r in runs) * 1000,
+            "min_ms": min(r[phase] for r in runs) * 1000,
+            "max_ms": max(r[phase] for r in runs) * 1000,
+        }
+        for phase in runs[0]
+    }
+
+    if args.json:
+        print(json.dumps({"runs": args.runs, "phases": results}, indent=2))
+        return
+    for phase, row in results.items():
+        print(f"  {phase:<9} " + "  ".join(f"{k}={v:.1f}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Load test for /monitoring/websocket_process.
+
+Starts the monitoring router in a separate uvicorn process with a local stand-in for
+KafkaService (records are counted, nothing leaves the process), mints access tokens with
+create_access_token and opens N synthetic clients. Each client replays an EAR stream with
+blinks (onset/end flags as the browser sends them) at the given fps, in batches like
+monitoring.js. Reports sustained frames/sec, ack latency percentiles and server memory
+per connection.
+
+By default the server runs with per-message acks (LIVE_METRICS_INTERVAL=0) so every batch
+has a latency sample; --live-metrics N measures the pushed-metrics mode instead.
+Memory is read from /proc (Linux only).
+
+Usage (from src/):
+    python -m benchmarks.bench_websocket --clients 200 --fps 30 --duration 30 [--binary] [--json] [--output result.json]
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import random
+import socket
+import statistics
+import time
+from contextlib import asynccontextmanager
+
+
+class LocalKafkaService:
+    """Stand-in for KafkaService: same coroutine interface, records are only counted"""
+    def __init__(self, send_delay=0.0):
+        self.send_delay = send_delay
+        self.stats = {'sessions': 0, 'frames': 0, 'blinks': 0}
+        self._next_session = 0
+
+    async def _send(self):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+
+    async def send_session_event(self, user_id, status, session_id=None):
+        await self._send()
+        if not session_id:
+            self._next_session += 1
+            session_id = self._next_session
+        self.stats['sessions'] += 1
+        return session_id
+
+    async def send_frame_data(self, session_id, timestamp, ear_value):
+        await self._send()
+        self.stats['frames'] += 1
+
+    async def send_blink_data(self, session_id, start_timestamp, end_timestamp):
+        await self._send()
+        self.stats['blinks'] += 1
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+def _serve(port, live_metrics_interval, send_delay):
+    """Server process: monitoring router + LocalKafkaService under uvicorn"""
+    import uvicorn
+    from fastapi import FastAPI
+    from app.core.config import settings
+    from app.routers import monitoring
+
+    settings.LIVE_METRICS_INTERVAL = live_metrics_interval
+
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.kafka_service = LocalKafkaService(send_delay)
+        yield
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(monitoring.router)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+async def _wait_ready(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Benchmark server did not start")
+
+
+def ear_stream(fps, seed):
+    """
+    Endless (ear_value, event_onset, event_end) frames: open eyes around 0.31 with noise,
+    a blink every 2-6 s lasting 3-8 frames, and an occasional frame without a face.
+    """
+    rng = random.Random(seed)
+    next_blink = rng.uniform(2, 6) * fps
+    frame = 0
+    while True:
+        frame += 1
+        if frame >= next_blink:
+            closed = rng.randint(3, 8)
+            for i in range(closed):
+                yield rng.uniform(0.12, 0.22), i == 0, False
+            yield rng.uniform(0.28, 0.34), False, True
+            frame += closed + 1
+            next_blink = frame + rng.uniform(2, 6) * fps
+        elif rng.random() < 0.002:
+            yield None, False, False
+        else:
+            yield rng.gauss(0.31, 0.015), False, False
+
+
+async def run_client(index, url, token, args, results, stop_at):
+    import websockets
+    from app.services.codec import pack_client_frames
+
+    stream = ear_stream(args.fps, seed=index)
+    frames_per_batch = max(1, round(args.fps * args.batch_ms / 1000))
+    pending = {}  # last frame timestamp of a batch -> send time
+    sent = acked = 0
+    latencies = []
+
+    try:
+        async with websockets.connect(url, additional_headers={"Cookie": f"access_token=Bearer {token}"},
+                                      max_queue=None) as ws:
+            results['connected'] += 1
+
+            async def receive():
+                nonlocal acked
+                async for message in ws:
+                    ack = json.loads(message)
+                    acked += ack.get("count", 1)
+                    send_time = pending.pop(ack.get("timestamp"), None)
+                    if send_time is not None:
+                        latencies.append(time.perf_counter() - send_time)
+
+            receiver = asyncio.create_task(receive())
+            # Spread the clients over one batch interval so sends don't arrive in lockstep
+            await asyncio.sleep(random.uniform(0, args.batch_ms / 1000))
+            next_send = time.perf_counter()
+            while time.monotonic() < stop_at:
+                now = time.time()
+                batch = []
+                for i in range(frames_per_batch):
+                    ear, onset, end = next(stream)
+                    batch.append({
+                        "timestamp": now + i / args.fps,
+                        "ear_value": ear,
+                        "event_onset": onset,
+                        "event_end": end
+                    })
+                pending[batch[-1]["timestamp"]] = time.perf_counter()
+                if args.binary:
+                    await ws.send(pack_client_frames(batch))
+                else:
+                    await ws.send(json.dumps({"v": 2, "frames": batch}))
+                sent += len(batch)
+
+                next_send += args.batch_ms / 1000
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+            await asyncio.sleep(min(2.0, args.live_metrics + 0.5) if args.live_metrics else 0.5)  # trailing acks
+            receiver.cancel()
+    except Exception as e:
+        results['errors'] += 1
+        if results['errors'] <= 5:
+            print(f"client {index}: {e!r}")
+    results['sent'] += sent
+    results['acked'] += acked
+    results['latencies'].extend(latencies)
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(len(values) * p / 100) - 1))]
+
+
+async def run(args):
+    from app.core.security import create_access_token
+
+    port = _free_port()
+    server = multiprocessing.get_context("spawn").Process(
+        target=_serve, args=(port, args.live_metrics, args.send_delay), daemon=True
+    )
+    server.start()
+    try:
+        await _wait_ready(port)
+        await asyncio.sleep(0.5)
+        rss_idle = _rss_kb(server.pid)
+
+        url = f"ws://127.0.0.1:{port}/monitoring/websocket_process"
+        tokens = [create_access_token({"sub": str(i + 1)}) for i in range(args.clients)]
+        results = {'connected': 0, 'errors': 0, 'sent': 0, 'acked': 0, 'latencies': []}
+
+        started = time.monotonic()
+        stop_at = started + args.ramp_up + args.duration
+        clients = []
+        for i, token in enumerate(tokens):
+            clients.append(asyncio.create_task(run_client(i, url, token, args, results, stop_at)))
+            await asyncio.sleep(args.ramp_up / max(1, args.clients))
+
+        # Memory with every client connected and streaming
+        await asyncio.sleep(min(5.0, args.duration / 2))
+        rss_loaded = _rss_kb(server.pid)
+        await asyncio.gather(*clients)
+        elapsed = time.monotonic() - started
+    finally:
+        server.terminate()
+        server.join(5)
+
+    latencies_ms = [l * 1000 for l in results['latencies']]
+    per_connection = None
+    if rss_idle is not None and rss_loaded is not None and results['connected']:
+        per_connection = (rss_loaded - rss_idle) / results['connected']
+    return {
+        "config": {
+            "clients": args.clients, "fps": args.fps, "batch_ms": args.batch_ms, "duration_s": args.duration,
+            "ramp_up_s": args.ramp_up, "binary": args.binary, "live_metrics_interval": args.live_metrics,
+            "send_delay_ms": args.send_delay * 1000
+        },
+        "timestamp": time.time(),
+        "connected": results['connected'],
+        "errors": results['errors'],
+        "target_frames_per_sec": args.clients * args.fps,
+        "sent_frames_per_sec": results['sent'] / elapsed,
+        "acked_frames_per_sec": results['acked'] / elapsed,
+        "ack_latency_ms": {
+            "samples": len(latencies_ms),
+            "p50": _percentile(latencies_ms, 50),
+            "p90": _percentile(latencies_ms, 90),
+            "p99": _percentile(latencies_ms, 99),
+            "max": max(latencies_ms) if latencies_ms else None,
+            "mean": statistics.fmean(latencies_ms) if latencies_ms else None,
+        },
+        "server_rss_kb": {"idle": rss_idle, "loaded": rss_loaded, "per_connection": per_connection},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--batch-ms", type=float, default=250.0, help="client send interval (monitoring.js FLUSH_INTERVAL_MS)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of steady load after ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which clients connect")
+    parser.add_argument("--binary", action="store_true", help="send packed binary batches instead of JSON")
+    parser.add_argument("--live-metrics", type=float, default=0.0,
+                        help="server LIVE_METRICS_INTERVAL (0 = per-message acks)")
+    parser.add_argument("--send-delay", type=float, default=0.0, help="simulated Kafka send latency in seconds")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(result, out, indent=2)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    fmt = lambda v, digits=1: "-" if v is None else f"{v:.{digits}f}"
+    latency = result["ack_latency_ms"]
+    memory = result["server_rss_kb"]
+    print(f"clients      {result['connected']}/{args.clients} connected, {result['errors']} errors")
+    print(f"frames/sec   target={result['target_frames_per_sec']:.0f}  sent={result['sent_frames_per_sec']:.0f}  "
+          f"acked={result['acked_frames_per_sec']:.0f}")
+    print(f"ack latency  p50={fmt(latency['p50'])}ms  p90={fmt(latency['p90'])}ms  p99={fmt(latency['p99'])}ms  "
+          f"max={fmt(latency['max'])}ms  ({latency['samples']} samples)")
+    print(f"server rss   idle={fmt(memory['idle'], 0)}kB  loaded={fmt(memory['loaded'], 0)}kB  "
+          f"per connection={fmt(memory['per_connection'])}kB")
+
+
+if __name__ == "__main__":
+    main()
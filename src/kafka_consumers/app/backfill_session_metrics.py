@@ -0,0 +1,55 @@
+"""
+Rebuild operation.session_metrics from operation.blink_events.
+A full rebuild also recomputes the per-user hourly/daily rollups (user_rollups.py) from scratch;
+selected sessions keep their existing rollup contributions.
+
+Usage (same environment variables as main.py):
+    python backfill_session_metrics.py              # every session
+    python backfill_session_metrics.py 123 456      # selected sessions
+"""
+import asyncio
+import logging
+import sys
+from base_consumer import BaseKafkaConsumer
+from main import load_config
+import session_metrics
+import user_rollups
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill(session_ids=None):
+    config = load_config()
+    # Only the database side of the consumer is used here
+    consumer = BaseKafkaConsumer(None, None, None, None, config['db_config'], config['ssh_config'])
+    consumer._connect_db()
+    rebuild_rollups = session_ids is None
+    try:
+        rows = await consumer.db.execute(session_metrics.BACKFILL_SQL, {'session_ids': session_ids})
+        logger.info(f"Rebuilt running sums for {rows} sessions")
+
+        if session_ids is None:
+            finished = await consumer.db.fetchall(
+                "SELECT session_id FROM operation.sessions WHERE end_time IS NOT NULL"
+            )
+            session_ids = [row[0] for row in finished]
+        await consumer.db.execute(session_metrics.FINALIZE_SQL, {'session_ids': session_ids})
+        logger.info(f"Finalized metrics for {len(session_ids)} sessions")
+
+        if rebuild_rollups:
+            await consumer.db.execute(user_rollups.RESET_SQL)
+            pending = (await consumer.db.fetchall(
+                "SELECT COUNT(*) FROM operation.session_metrics WHERE finalized_at IS NOT NULL"
+            ))[0][0]
+            for _ in range(0, pending, 1000):
+                await consumer.db.execute(user_rollups.ROLLUP_SQL, {'settle_seconds': 0, 'limit': 1000})
+            logger.info(f"Rebuilt user rollups from {pending} sessions")
+    finally:
+        consumer.db.close()
+        if consumer.ssh_tunnel:
+            consumer.ssh_tunnel.close()
+
+
+if __name__ == "__main__":
+    ids = [int(arg) for arg in sys.argv[1:]] or None
+    asyncio.run(backfill(ids))
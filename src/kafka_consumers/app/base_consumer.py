@@ -1,55 +1,100 @@
 import asyncio
-import json
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
-from aiokafka import AIOKafkaConsumer
-import psycopg2
-import psycopg2.extras
-from psycopg2.extensions import connection as pg_connection
+from aiokafka import TopicPartition
+from aiokafka.errors import CommitFailedError
 from sshtunnel import SSHTunnelForwarder
+from batch_writer import BatchWriter
+from database import AsyncDatabase
+from codec import decode_value
+from metrics import REGISTRY, start_metrics_server
+from transport import KafkaTransport
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MESSAGES = REGISTRY.counter('consumer_messages_total', 'Records processed', labels=('topic',))
+LAG = REGISTRY.gauge('consumer_lag', 'Records between the processed position and the high watermark', labels=('topic', 'partition'))
+FETCH_RECORDS = REGISTRY.histogram(
+    'consumer_fetch_records', 'Records returned per getmany() call (FETCH_MODE=batch)',
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+)
+
 class BaseKafkaConsumer:
     def __init__(self, kafka_server, kafka_port, topic, 
-                 group_id, db_config, ssh_config=None):
+                 group_id, db_config, ssh_config=None, batch_config=None, metrics_port=None, transport=None):
         self.kafka_server = kafka_server
         self.kafka_port = kafka_port
         self.topic = topic
         self.group_id = group_id
         self.db_config = db_config
         self.ssh_config = ssh_config
+        self.batch_config = batch_config or {}
+        # 'batch' fetches with getmany(); both modes commit offsets manually, and only
+        # once the batch writer has made the corresponding rows durable
+        self.fetch_mode = self.batch_config.get('fetch_mode', 'message')
+        self.fetch_max_records = self.batch_config.get('fetch_max_records', 500)
+        self.fetch_timeout_ms = self.batch_config.get('fetch_timeout_ms', 500)
+        self._uncommitted = {}
+        # Message mode: seconds between durable commits (batch mode commits after every fetch)
+        self.commit_interval = self.batch_config.get('commit_interval', self.batch_config.get('flush_interval', 1.0))
+        self._next_commit = 0.0
         self.consumer = None
-        self.db_conn = None
+        self.db = None
         self.ssh_tunnel = None
+        self._tunnel_lock = threading.Lock()
+        self.writer = None
+        self._writer_task = None
+        self.metrics_port = metrics_port  # serve /metrics on this port when set
+        # Kafka by default; a memory_broker.MemoryBroker runs the pipeline in one process
+        self.transport = transport or KafkaTransport(f'{kafka_server}:{kafka_port}')
+        self._metrics_server = None
         
     async def start(self):
         # Connect to Kafka
-        self.consumer = AIOKafkaConsumer(
+        self.consumer = self.transport.consumer(
             self.topic,
-            bootstrap_servers=f'{self.kafka_server}:{self.kafka_port}',
             group_id=self.group_id,
             auto_offset_reset='earliest',
-            value_deserializer=lambda m: json.loads(m.decode('utf-8')),
+            enable_auto_commit=False,  # auto-commit could run ahead of rows still buffered in the writer
+            value_deserializer=decode_value,
             key_deserializer=lambda m: m.decode('utf-8') if m else None
         )
         
         await self.consumer.start()
         logger.info(f"Started consuming from topic: {self.topic}")
+        if self.metrics_port:
+            self._metrics_server = await start_metrics_server(self.metrics_port)
         
         # Connect to database
         try:
-            self._connect_db()
+            await asyncio.get_running_loop().run_in_executor(None, self._connect_db)
             logger.info(f"Successfully conntected to Database.")
         except Exception as e:
             logger.info(f"Error connecting to Database: {self.topic}, {e}")
         
+        # Buffered writer shared by all subclasses
+        self.writer = BatchWriter(
+            self.db,
+            mode=self.batch_config.get('mode', 'copy'),
+            max_rows=self.batch_config.get('max_rows', 500),
+            flush_interval=self.batch_config.get('flush_interval', 1.0),
+            stats_interval=self.batch_config.get('stats_interval', 30.0),
+            max_inflight=self.db_config.get('pool_size', 4)
+        )
+        self.register_tables(self.writer)
+        self._writer_task = asyncio.create_task(self.writer.run())
+        
         # Start processing loop
-        await self._process_messages()
+        if self.fetch_mode == 'batch':
+            await self._process_batches()
+        else:
+            await self._process_messages()
     
     def _connect_db(self):
-        """Connect to PostgreSQL database, optionally through SSH tunnel"""
+        """Open the database pool, optionally through SSH tunnel"""
         try:
             if self.ssh_config:
                 # Create SSH tunnel
@@ -59,54 +104,169 @@ class BaseKafkaConsumer:
                     ssh_pkey=self.ssh_config['key_path'],
                     ssh_password=self.ssh_config['key_pw'],
                     remote_bind_address=('localhost', int(self.db_config['port'])),  # PostgreSQL on remote server
-                    local_bind_address=('127.0.0.1', 6543)  # Local forwarded port
+                    local_bind_address=('127.0.0.1', int(self.ssh_config.get('local_port', 0)))  # 0 picks a free local port
                 )
                 self.ssh_tunnel.start()
-                
-                # Connect through tunnel
-                self.db_conn = psycopg2.connect(
-                    host='127.0.0.1',  # Connect to the local end of the tunnel
-                    port=6543,         # The local forwarded port
-                    user=self.db_config['user'],
-                    password=self.db_config['password'],
-                    dbname=self.db_config['dbname']
-                )
+                host, port = '127.0.0.1', self.ssh_tunnel.local_bind_port  # Connect to the local end of the tunnel
             else:
                 # Direct connection
-                self.db_conn = psycopg2.connect(
-                    host=self.db_config['host'],
-                    port=self.db_config['port'],
-                    user=self.db_config['user'],
-                    password=self.db_config['password'],
-                    dbname=self.db_config['dbname']
-                )
+                host, port = self.db_config['host'], self.db_config['port']
             
-            # Set autocommit for timescale
-            self.db_conn.autocommit = True
+            self.db = AsyncDatabase(
+                host=host,
+                port=port,
+                user=self.db_config['user'],
+                password=self.db_config['password'],
+                dbname=self.db_config['dbname'],
+                pool_size=self.db_config.get('pool_size', 4),
+                before_retry=self._ensure_tunnel
+            )
+            self.db.connect()
             logger.info("Connected to database")
         except Exception as e:
             logger.error(f"Database connection error: {e}")
             logger.info(f"Error connecting to Database: {e}")
     
+    def _ensure_tunnel(self):
+        """Restart the SSH tunnel if it dropped (called from the database threads before a retry)"""
+        with self._tunnel_lock:
+            if self.ssh_tunnel and not self.ssh_tunnel.is_active:
+                logger.warning("SSH tunnel is down, restarting")
+                self.ssh_tunnel.restart()
+                # With local_port 0 the restarted tunnel may listen on another port
+                port = self.ssh_tunnel.local_bind_port
+                if self.db and self.db.dsn['port'] != port:
+                    logger.warning(f"SSH tunnel moved to local port {port}, reopening the database pool")
+                    self.db.reconnect(port=port)
+    
     async def _process_messages(self):
-        """Main processing loop - to be implemented by subclasses"""
+        """
+        Per-message processing loop.
+        Offsets are committed every `commit_interval` seconds, also while the topic is idle,
+        so rows flushed by the writer's timer don't stay uncommitted until the next message.
+        """
         try:
-            async for message in self.consumer:
-                await self.process_message(message)
+            self._next_commit = time.monotonic() + self.commit_interval
+            while True:
+                try:
+                    message = await asyncio.wait_for(
+                        self.consumer.getone(), timeout=max(0.01, self._next_commit - time.monotonic())
+                    )
+                except asyncio.TimeoutError:
+                    message = None
+                if message is not None:
+                    await self.process_message(message)
+                    MESSAGES.inc(labels=(self.topic,))
+                    self._uncommitted[TopicPartition(message.topic, message.partition)] = message.offset + 1
+                    self._update_lag(message.partition, message.offset + 1)
+                if time.monotonic() >= self._next_commit:
+                    self._next_commit = time.monotonic() + self.commit_interval
+                    if self._uncommitted:
+                        await self._try_commit()
+        finally:
+            await self.stop()
+    
+    async def _process_batches(self):
+        """
+        Batch processing loop.
+        Pulls up to `fetch_max_records` records per assigned partition with getmany(),
+        processes partitions concurrently (in order within each partition), and commits
+        the offsets only once the batch writer has flushed the resulting rows.
+        """
+        try:
+            while True:
+                partitions = max(1, len(self.consumer.assignment()))
+                records = await self.consumer.getmany(
+                    timeout_ms=self.fetch_timeout_ms,
+                    max_records=self.fetch_max_records * partitions
+                )
+                if not records:
+                    # Idle: commit what the writer has flushed since (or held back at) the last fetch
+                    if self._uncommitted:
+                        await self._try_commit()
+                    continue
+                
+                await asyncio.gather(*(self.process_batch(messages) for messages in records.values()))
+                count = 0
+                for tp, messages in records.items():
+                    self._uncommitted[tp] = messages[-1].offset + 1
+                    self._update_lag(tp.partition, messages[-1].offset + 1)
+                    count += len(messages)
+                MESSAGES.inc(count, labels=(self.topic,))
+                FETCH_RECORDS.observe(count)
+                
+                await self._try_commit()
         finally:
             await self.stop()
     
+    def _update_lag(self, partition, position):
+        """Lag of one partition from the high watermark of the last fetch"""
+        highwater = self.consumer.highwater(TopicPartition(self.topic, partition))
+        if highwater is not None:
+            LAG.set(max(0, highwater - position), labels=(self.topic, partition))
+    
+    async def _commit_durable(self):
+        """Flush the batch writer, then commit the offsets of everything processed so far"""
+        await self.writer.flush()
+        if not self._uncommitted:
+            return
+        held = self.pending_offsets()
+        offsets = {tp: min(offset, held.get(tp.partition, offset)) for tp, offset in self._uncommitted.items()}
+        # Partitions held back by buffered records are committed further once those are written
+        self._uncommitted = {tp: offset for tp, offset in self._uncommitted.items() if offsets[tp] < offset}
+        try:
+            await self.consumer.commit(offsets)
+        except CommitFailedError as e:
+            # Partitions were revoked by a rebalance; their new owner replays from the last commit
+            logger.warning(f"Offset commit failed after rebalance: {e}")
+    
+    async def _try_commit(self):
+        try:
+            await self._commit_durable()
+        except Exception as e:
+            # Rows stay buffered in the writer; offsets are committed after the next successful flush
+            logger.error(f"Error flushing batch, offsets not committed: {e}")
+    
+    async def process_batch(self, records):
+        """Process the records of a single partition in order - subclasses may override to handle them in bulk"""
+        for message in records:
+            await self.process_message(message)
+    
     async def process_message(self, message):
         """Process a single message - to be implemented by subclasses"""
         raise NotImplementedError
     
+    def pending_offsets(self):
+        """
+        Lowest offset per partition of records held outside the batch writer, which must not
+        be committed yet - subclasses that buffer records themselves override this
+        """
+        return {}
+    
+    def register_tables(self, writer):
+        """Register the tables this consumer writes through the batch writer - to be implemented by subclasses"""
+        pass
+    
     async def stop(self):
         """Stop consumer and close connections"""
+        if self._writer_task:
+            self._writer_task.cancel()
+        
+        if self.writer:
+            try:
+                await self._commit_durable()
+                self.writer.report()
+            except Exception as e:
+                logger.error(f"Error flushing pending rows on stop: {e}")
+        
         if self.consumer:
             await self.consumer.stop()
         
-        if self.db_conn:
-            self.db_conn.close()
+        if self._metrics_server:
+            self._metrics_server.close()
+        
+        if self.db:
+            self.db.close()
         
         if self.ssh_tunnel:
             self.ssh_tunnel.close()
\ No newline at end of file
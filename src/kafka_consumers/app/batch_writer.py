@@ -0,0 +1,279 @@
+import asyncio
+import csv
+import io
+import logging
+import time
+import psycopg2.extras
+from database import AsyncDatabase
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+WRITE_LATENCY = REGISTRY.histogram('db_write_seconds', 'Time to write one batch (single transaction)')
+WRITE_ROWS = REGISTRY.histogram(
+    'db_write_rows', 'Rows per written batch',
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+)
+REJECTED_ROWS = REGISTRY.counter('db_rejected_rows_total', 'Rows dropped because the database rejected them', labels=('table',))
+
+
+class BatchWriter:
+    """
+    Buffers rows per table and writes them in bulk.
+    A flush happens when `max_rows` rows are buffered or when the oldest buffered
+    row is older than `flush_interval` seconds (driven by `run()`).
+    Size-triggered flushes run in the background on the AsyncDatabase pool, so up to
+    `max_inflight` batches can be written while the consumer keeps fetching.
+    Modes:
+        copy   - COPY ... FROM STDIN; tables with an ON CONFLICT clause are COPYed into a
+                 temporary staging table and moved with INSERT ... SELECT ... ON CONFLICT
+        values - multi-row INSERT via execute_values (supports ON CONFLICT clauses)
+    Tables registered with a custom `insert` statement always go through the staging table.
+    A batch failing on a lost connection is put back and retried with the next flush; any other
+    failure is treated as bad data: the batch is written again in halves until the rejected
+    rows are isolated, and only those are logged and dropped.
+    """
+    MODES = ('copy', 'values')
+
+    def __init__(self, db, mode='copy', max_rows=500, flush_interval=1.0, stats_interval=30.0, max_inflight=1):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown batch mode: {mode}")
+        self.db = db
+        self.mode = mode
+        self.max_rows = max(1, int(max_rows))
+        self.flush_interval = float(flush_interval)
+        self.stats_interval = float(stats_interval)
+
+        self.tables = {}    # table -> {'columns', 'conflict', 'unique', 'merge'}
+        self.buffers = {}   # table -> list of rows, or dict keyed on unique columns
+        self.pending = 0
+        self.oldest = None  # monotonic time of the oldest buffered row
+        self._slots = asyncio.Semaphore(max(1, int(max_inflight)))
+        self._inflight = set()
+
+        # Flush statistics, reset on every report
+        self.stats = {'rows': 0, 'flushes': 0, 'flush_time': 0.0, 'max_flush_time': 0.0, 'rejected': 0}
+        self._stats_since = time.monotonic()
+
+    def register(self, table, columns, conflict=None, unique=None, merge=None, insert=None):
+        """
+        Register a target table.
+        Args:
+            table: Fully qualified table name
+            columns: Column names, in the order rows are passed to `add`
+            conflict: Optional ON CONFLICT clause appended to the INSERT
+            unique: Optional column names identifying a row; buffered rows sharing
+                    a key collapse to the latest one (required for ON CONFLICT DO UPDATE)
+            merge: Optional merge(old_row, new_row) used instead of "latest wins" when
+                   rows sharing a unique key are combined, e.g. to sum aggregate deltas
+            insert: Optional statement moving the staged rows into the table, with
+                    {source} (the staging table) and {columns} placeholders; lets one
+                    transaction act on exactly the rows that were inserted (RETURNING)
+        """
+        unique_idx = tuple(columns.index(c) for c in unique) if unique else None
+        self.tables[table] = {
+            'columns': tuple(columns), 'conflict': conflict, 'unique': unique_idx, 'merge': merge, 'insert': insert
+        }
+        self.buffers[table] = {} if unique_idx else []
+
+    async def add(self, table, row):
+        """Buffer a row for `table`, starting a background flush if the size threshold is reached"""
+        spec = self.tables[table]
+        if spec['unique']:
+            key = tuple(row[i] for i in spec['unique'])
+            buffer = self.buffers[table]
+            if spec['merge'] and key in buffer:
+                row = spec['merge'](buffer[key], row)
+            buffer[key] = row
+        else:
+            self.buffers[table].append(row)
+        self.pending += 1
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+        if self.pending >= self.max_rows:
+            await self._start_flush()
+
+    def _take(self):
+        """Detach the current buffers as one batch"""
+        batch = {}
+        for table, spec in self.tables.items():
+            buffer = self.buffers[table]
+            if buffer:
+                # Keyed rows are written in key order so concurrent upserts lock rows in the same order
+                batch[table] = [buffer[k] for k in sorted(buffer)] if spec['unique'] else buffer
+                self.buffers[table] = {} if spec['unique'] else []
+        self.pending = 0
+        self.oldest = None
+        return batch
+
+    def _restore(self, batch):
+        """Put the rows of a failed batch back in front of the buffers"""
+        for table, rows in batch.items():
+            spec = self.tables[table]
+            if spec['unique']:
+                restored = {tuple(row[i] for i in spec['unique']): row for row in rows}
+                for key, row in self.buffers[table].items():
+                    if spec['merge'] and key in restored:
+                        row = spec['merge'](restored[key], row)
+                    restored[key] = row
+                self.buffers[table] = restored
+            else:
+                self.buffers[table] = rows + self.buffers[table]
+            self.pending += len(rows)
+        if self.pending and self.oldest is None:
+            self.oldest = time.monotonic()
+
+    async def _start_flush(self):
+        # Waiting for a slot is the backpressure when every in-flight batch is still writing
+        await self._slots.acquire()
+        batch = self._take()
+        if not batch:
+            self._slots.release()
+            return
+        task = asyncio.create_task(self._write_batch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task):
+        self._inflight.discard(task)
+        self._slots.release()
+        if not task.cancelled() and task.exception():
+            logger.error(f"Error writing batch: {task.exception()}")
+
+    async def _write_batch(self, batch):
+        started = time.monotonic()
+        try:
+            await self.db.run(self._write, batch)
+        except AsyncDatabase.RECONNECT_ERRORS:
+            self._restore(batch)
+            raise
+        except Exception as e:
+            # Retrying as is would fail on the same rows forever and hold back every later write
+            logger.warning(f"Batch of {sum(len(rows) for rows in batch.values())} rows rejected ({e}), isolating the failing rows")
+            batch = await self._write_isolating(batch)
+
+        elapsed = time.monotonic() - started
+        rows_written = sum(len(rows) for rows in batch.values())
+        self.stats['rows'] += rows_written
+        self.stats['flushes'] += 1
+        self.stats['flush_time'] += elapsed
+        self.stats['max_flush_time'] = max(self.stats['max_flush_time'], elapsed)
+        WRITE_LATENCY.observe(elapsed)
+        WRITE_ROWS.observe(rows_written)
+        logger.debug(f"Flushed {rows_written} rows in {elapsed * 1000:.1f}ms")
+
+    async def _write_isolating(self, batch):
+        """
+        Write a rejected batch table by table, halving the rows that still fail until the
+        rejected rows are found; those are dropped.
+        Returns:
+            The rows written, per table
+        """
+        written = {}
+        pending = list(batch.items())  # stack of (table, rows), earlier rows on top
+        while pending:
+            table, rows = pending.pop()
+            try:
+                await self.db.run(self._write, {table: rows})
+            except AsyncDatabase.RECONNECT_ERRORS:
+                remaining = {}
+                for t, r in reversed(pending + [(table, rows)]):
+                    remaining.setdefault(t, []).extend(r)
+                self._restore(remaining)
+                raise
+            except Exception as e:
+                if len(rows) == 1:
+                    self._reject(table, rows[0], e)
+                else:
+                    middle = len(rows) // 2
+                    pending.append((table, rows[middle:]))
+                    pending.append((table, rows[:middle]))
+                continue
+            written.setdefault(table, []).extend(rows)
+        return written
+
+    def _reject(self, table, row, error):
+        REJECTED_ROWS.inc(labels=(table,))
+        self.stats['rejected'] += 1
+        logger.error(f"Dropping row rejected by {table}: {row!r} ({error})")
+
+    async def flush(self):
+        """Write every buffered row and wait until all in-flight batches are durable"""
+        if self.pending:
+            await self._start_flush()
+        if self._inflight:
+            results = await asyncio.gather(*list(self._inflight), return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+
+    def _write(self, conn, batch):
+        """Write one batch in a single transaction (runs on the database thread pool)"""
+        with conn.cursor() as cursor:
+            for table, rows in batch.items():
+                spec = self.tables[table]
+                columns = ', '.join(spec['columns'])
+                if spec['insert'] or (self.mode == 'copy' and spec['conflict']):
+                    self._write_staged(cursor, table, spec, columns, rows)
+                elif self.mode == 'copy':
+                    cursor.copy_expert(
+                        f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                        self._to_csv(rows)
+                    )
+                else:
+                    psycopg2.extras.execute_values(
+                        cursor,
+                        f"INSERT INTO {table} ({columns}) VALUES %s {spec['conflict'] or ''}",
+                        rows,
+                        page_size=len(rows)
+                    )
+
+    def _write_staged(self, cursor, table, spec, columns, rows):
+        """COPY into a per-connection temp table, then INSERT ... SELECT with the conflict handling"""
+        stage = f"_stage_{table.replace('.', '_')}"
+        # Same column types as the target, no constraints; emptied at the end of every transaction
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {stage} ON COMMIT DELETE ROWS "
+            f"AS SELECT {columns} FROM {table} WITH NO DATA"
+        )
+        cursor.copy_expert(f"COPY {stage} ({columns}) FROM STDIN WITH (FORMAT csv)", self._to_csv(rows))
+        insert = spec['insert'] or f"INSERT INTO {table} ({{columns}}) SELECT {{columns}} FROM {{source}} {spec['conflict'] or ''}"
+        cursor.execute(insert.format(source=stage, columns=columns))
+
+    @staticmethod
+    def _to_csv(rows):
+        # Unquoted empty fields are read as NULL by COPY in csv format; bytea uses the hex format
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['' if v is None else '\\x' + v.hex() if isinstance(v, bytes) else v for v in row])
+        buffer.seek(0)
+        return buffer
+
+    async def run(self):
+        """Background task: flush on the time threshold and report throughput"""
+        tick = min(self.flush_interval, 0.1) if self.flush_interval > 0 else 0.1
+        while True:
+            await asyncio.sleep(tick)
+            try:
+                if self.oldest is not None and time.monotonic() - self.oldest >= self.flush_interval:
+                    await self._start_flush()
+            except Exception as e:
+                logger.error(f"Error flushing batch: {e}", exc_info=True)
+            if time.monotonic() - self._stats_since >= self.stats_interval:
+                self.report()
+
+    def report(self):
+        """Log rows/sec and flush latency since the last report, then reset the counters"""
+        now = time.monotonic()
+        window = now - self._stats_since
+        flushes = self.stats['flushes']
+        if flushes:
+            logger.info(
+                f"BatchWriter: {self.stats['rows'] / window:.1f} rows/sec, "
+                f"{flushes} flushes, avg flush {self.stats['flush_time'] / flushes * 1000:.1f}ms, "
+                f"max flush {self.stats['max_flush_time'] * 1000:.1f}ms, "
+                f"{len(self._inflight)} in flight, {self.stats['rejected']} rows rejected"
+            )
+        self.stats = {'rows': 0, 'flushes': 0, 'flush_time': 0.0, 'max_flush_time': 0.0, 'rejected': 0}
+        self._stats_since = now
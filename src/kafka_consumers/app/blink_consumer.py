@@ -1,14 +1,83 @@
 from base_consumer import BaseKafkaConsumer
+from fatigue_analytics import FatigueAnalytics
+from metrics import LogSampler
+import session_metrics
+import asyncio
 import logging
 import statistics
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
+log_sample = LogSampler(100)  # per-blink debug output: one blink in 100
+
+# Start and completion of the sessions the analytics track
+TRACKED_SESSIONS_SQL = """
+    SELECT session_id, start_time, end_time, status FROM operation.sessions
+    WHERE session_id = ANY(%s::bigint[])
+    """
 
 class BlinkEventConsumer(BaseKafkaConsumer):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, analytics_config=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.last_blink_timestamps = {}
+        # Rolling fatigue metrics per session, emitted while the session is running
+        analytics_config = analytics_config or {}
+        self.analytics = FatigueAnalytics(
+            windows=analytics_config.get('windows', (60, 300, 900)),
+            emit_interval=analytics_config.get('emit_interval', 10.0)
+        )
+        self._analytics_task = None
+
+    async def start(self):
+        self._analytics_task = asyncio.create_task(self._emit_window_metrics())
+        await super().start()
+
+    async def stop(self):
+        if self._analytics_task:
+            self._analytics_task.cancel()
+            self._analytics_task = None
+        await super().stop()
+
+    async def _emit_window_metrics(self):
+        """
+        Background task: emit the window metrics of sessions without new blinks on the
+        stream clock, and close the sessions the session consumer has completed
+        """
+        while True:
+            await asyncio.sleep(self.analytics.emit_interval)
+            if self.writer is None:
+                continue
+            try:
+                await self._end_completed_sessions()
+                for row in self.analytics.tick():
+                    await self.writer.add('operation.blink_window_metrics', row)
+            except Exception as e:
+                logger.error(f"Error emitting blink window metrics: {e}")
+
+    async def _end_completed_sessions(self):
+        session_ids = list(self.analytics.sessions)
+        if not session_ids or self.db is None:
+            return
+        for session_id, start_time, end_time, status in await self.db.fetchall(TRACKED_SESSIONS_SQL, (session_ids,)):
+            self.analytics.set_start(session_id, start_time)
+            if status in ('complete', 'interrupted') and end_time is not None:
+                for row in self.analytics.end_session(session_id, end_time):
+                    await self.writer.add('operation.blink_window_metrics', row)
+                self.last_blink_timestamps.pop(session_id, None)
+
+    def register_tables(self, writer):
+        # Blinks already stored (replayed messages) are skipped, and only the newly
+        # inserted ones are added to the running per-session sums
+        writer.register(
+            'operation.blink_events',
+            ('session_id', 'start_time', 'end_time', 'duration', 'interval'),
+            insert=session_metrics.INSERT_BLINKS_SQL
+        )
+        writer.register(
+            'operation.blink_window_metrics',
+            FatigueAnalytics.COLUMNS,
+            conflict="ON CONFLICT (session_id, window_seconds, window_end) DO NOTHING"
+        )
 
     async def process_message(self, message):
         try:
@@ -38,16 +107,13 @@ class BlinkEventConsumer(BaseKafkaConsumer):
                 # Calculate time from last blink's end to this blink's start
                 interval = (start_timestamp - self.last_blink_timestamps[session_id]).total_seconds()
             self.last_blink_timestamps[session_id] = end_timestamp # Update last blink timestamp
-            logger.info(f"Blink: session_id={session_id}, start={start_timestamp}, end={end_timestamp}, duration={duration}, interval={interval}")
-            with self.db_conn.cursor() as cursor:
-                cursor.execute(
-                    """  
-                    INSERT INTO operation.blink_events
-                    (session_id, start_time, end_time, duration, interval)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """,
-                    (session_id, start_timestamp, end_timestamp, duration, interval)
-                )
-            logger.debug(f"Processed blink event for session {session_id}")
+            if logger.isEnabledFor(logging.DEBUG) and log_sample():
+                logger.debug(f"Blink: session_id={session_id}, start={start_timestamp}, end={end_timestamp}, duration={duration}, interval={interval}")
+            await self.writer.add(
+                'operation.blink_events',
+                (session_id, start_timestamp, end_timestamp, duration, interval)
+            )
+            for row in self.analytics.add_blink(session_id, end_timestamp, duration, interval):
+                await self.writer.add('operation.blink_window_metrics', row)
         except Exception as e:
             logger.error(f"Error at BlinkEventConsumer's self.process_message: {e}")
\ No newline at end of file
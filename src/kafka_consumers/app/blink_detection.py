@@ -0,0 +1,77 @@
+import numpy as np
+
+# Defaults mirror BlinkDetector (static/python/client/blink_detector.py)
+EAR_THRESHOLD = 0.28
+MIN_CONSECUTIVE_FRAMES = 4
+
+
+class DetectorState:
+    """Closure in progress at the end of a batch, carried into the next one"""
+    __slots__ = ('start_time', 'counter')
+
+    def __init__(self, start_time=None, counter=0):
+        self.start_time = start_time  # timestamp of the first closed frame, None when the eye is open
+        self.counter = counter        # closed frames seen so far in this closure
+
+    @property
+    def in_closure(self):
+        return self.start_time is not None
+
+
+def detect_blinks(timestamps, ear, threshold=EAR_THRESHOLD, open_threshold=None,
+                  min_frames=MIN_CONSECUTIVE_FRAMES, max_frames=None, state=None):
+    """
+    Detect blinks in a batch of (timestamp, EAR) samples.
+    A frame is closed when 0 < EAR < threshold and open when EAR > open_threshold
+    (defaults to threshold, which reproduces the client state machine exactly).
+    Frames in between, non-positive or NaN EARs leave the state unchanged. A blink is a
+    run of at least `min_frames` (and at most `max_frames`, if given) closed frames
+    ended by an open frame; it starts at the first closed frame and ends at that open frame.
+    Args:
+        timestamps: 1-D array of frame timestamps (seconds)
+        ear: 1-D array of EAR values, NaN when no face was found
+        state: DetectorState from the previous batch of the same stream
+    Returns:
+        (events, state): events is an (N, 3) float array of (start, end, duration)
+        and state is the DetectorState to pass with the next batch
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    ear = np.asarray(ear, dtype=np.float64)
+    state = state or DetectorState()
+    open_threshold = threshold if open_threshold is None else open_threshold
+
+    with np.errstate(invalid='ignore'):
+        closed = (ear > 0) & (ear < threshold)
+        opened = ear > open_threshold
+    # Frames that are neither closed nor open do not affect the state machine
+    keep = closed | opened
+    t = timestamps[keep]
+    closed = closed[keep]
+
+    edges = np.diff(np.concatenate(([state.in_closure], closed)).astype(np.int8))
+    run_starts = np.flatnonzero(edges == 1)   # first closed frame of a run
+    run_ends = np.flatnonzero(edges == -1)    # first open frame after a run
+
+    if state.in_closure:
+        # The first run began in an earlier batch; index it virtually before frame 0
+        begin_idx = np.concatenate(([-state.counter], run_starts))
+        begin_ts = np.concatenate(([state.start_time], t[run_starts]))
+    else:
+        begin_idx = run_starts
+        begin_ts = t[run_starts]
+
+    n_complete = len(run_ends)
+    lengths = run_ends - begin_idx[:n_complete]
+    valid = lengths >= min_frames
+    if max_frames is not None:
+        valid &= lengths <= max_frames
+
+    starts = begin_ts[:n_complete][valid]
+    ends = t[run_ends][valid]
+    events = np.column_stack((starts, ends, ends - starts))
+
+    if len(begin_idx) > n_complete:
+        new_state = DetectorState(begin_ts[-1], int(len(t) - begin_idx[-1]))
+    else:
+        new_state = DetectorState()
+    return events, new_state
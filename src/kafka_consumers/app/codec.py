@@ -0,0 +1,28 @@
+import json
+import math
+import struct
+
+# Mirror of the producer's value layout (app/services/codec.py), version 1, little-endian:
+#   version u8 | kind u8 | session_id i64 | f64 | f64
+#       kind 1 (frame) -> timestamp, ear_value (NaN when no face)
+#       kind 2 (blink) -> start_timestamp, end_timestamp
+# JSON payloads start with '{' and are decoded as before.
+VERSION = 1
+KIND_FRAME = 1
+KIND_BLINK = 2
+
+_RECORD = struct.Struct('<BBqdd')
+
+
+def decode_value(data):
+    """Kafka value_deserializer accepting both JSON and packed records"""
+    if data[:1] == b'{':
+        return json.loads(data.decode('utf-8'))
+    version, kind, session_id, a, b = _RECORD.unpack(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported record version: {version}")
+    if kind == KIND_FRAME:
+        return {"session_id": session_id, "timestamp": a, "ear_value": None if math.isnan(b) else b}
+    if kind == KIND_BLINK:
+        return {"session_id": session_id, "start_timestamp": a, "end_timestamp": b}
+    raise ValueError(f"Unknown record kind: {kind}")
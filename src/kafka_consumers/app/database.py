@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """
+    Non-blocking access to PostgreSQL for the consumers.
+    psycopg2 calls run on a dedicated thread pool sized to the connection pool, so
+    queries never block the event loop and up to `pool_size` statements can be in
+    flight at once. Every `run` is one transaction; a dropped connection is discarded
+    and the call retried on a fresh one.
+    """
+    # PoolError: the pool was closed by reconnect() between picking it and getconn
+    RECONNECT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError, PoolError)
+
+    def __init__(self, host, port, user, password, dbname, pool_size=4, max_retries=3, retry_delay=0.5, before_retry=None):
+        self.dsn = dict(host=host, port=port, user=user, password=password, dbname=dbname)
+        self.pool_size = max(1, int(pool_size))
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.before_retry = before_retry  # e.g. re-open an SSH tunnel before reconnecting
+        self.pool = None
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='db')
+
+    def connect(self):
+        """Open the connection pool (blocking, call once at startup)"""
+        self.pool = ThreadedConnectionPool(1, self.pool_size, **self.dsn)
+        logger.info(f"Opened database pool with up to {self.pool_size} connections")
+
+    def reconnect(self, **dsn):
+        """
+        Replace the pool with one using the updated connection parameters, e.g. the new
+        port of a restarted SSH tunnel. Calls still holding a connection of the old pool
+        fail on it and are retried on the new one.
+        """
+        self.dsn.update(dsn)
+        old, self.pool = self.pool, ThreadedConnectionPool(1, self.pool_size, **self.dsn)
+        if old:
+            old.closeall()
+
+    @staticmethod
+    def _release(pool, conn, close=False):
+        try:
+            pool.putconn(conn, close=close)
+        except PoolError:
+            conn.close()  # the pool was replaced by reconnect() meanwhile
+
+    def _run_sync(self, fn, args):
+        attempt = 0
+        while True:
+            conn = None
+            pool = self.pool
+            try:
+                conn = pool.getconn()
+                result = fn(conn, *args)
+                conn.commit()
+                self._release(pool, conn)
+                return result
+            except self.RECONNECT_ERRORS as e:
+                # Drop the broken connection; the pool opens a fresh one on the next getconn
+                if conn is not None:
+                    self._release(pool, conn, close=True)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"Database connection lost ({e}), reconnecting (attempt {attempt})")
+                time.sleep(self.retry_delay * attempt)
+                if self.before_retry:
+                    self.before_retry()
+            except Exception:
+                if conn is not None:
+                    conn.rollback()
+                    self._release(pool, conn)
+                raise
+
+    async def run(self, fn, *args):
+        """Run fn(conn, *args) in a transaction on the database thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._run_sync, fn, args)
+
+    async def execute(self, query, params=None):
+        """Execute a single statement and return the affected row count"""
+        def _execute(conn):
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.rowcount
+        return await self.run(_execute)
+
+    async def fetchall(self, query, params=None):
+        """Execute a query and return all rows"""
+        def _fetchall(conn):
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+        return await self.run(_fetchall)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.pool:
+            self.pool.closeall()
+            self.pool = None
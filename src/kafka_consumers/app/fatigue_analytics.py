@@ -0,0 +1,173 @@
+import time
+from collections import deque
+from datetime import datetime
+
+
+class RollingStats:
+    """
+    Count, mean and variance of a sliding sample, updated in O(1).
+    Welford's update is applied on `add` and reversed on `remove`.
+    """
+    __slots__ = ('n', 'mean', 'm2')
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def remove(self, x):
+        if self.n <= 1:
+            self.n, self.mean, self.m2 = 0, 0.0, 0.0
+            return
+        self.n -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.n
+        self.m2 = max(0.0, self.m2 - delta * (x - self.mean))  # guard against rounding drift
+
+    @property
+    def variance(self):
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+
+class BlinkWindow:
+    """Blink statistics over the last `seconds` seconds of stream time"""
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.blinks = deque()  # (end time as epoch seconds, duration, interval)
+        self.durations = RollingStats()
+        self.intervals = RollingStats()
+
+    def add(self, end_time, duration, interval):
+        self.blinks.append((end_time, duration, interval))
+        self.durations.add(duration)
+        if interval is not None:
+            self.intervals.add(interval)
+        self.evict(end_time)
+
+    def evict(self, now):
+        cutoff = now - self.seconds
+        while self.blinks and self.blinks[0][0] <= cutoff:
+            _, duration, interval = self.blinks.popleft()
+            self.durations.remove(duration)
+            if interval is not None:
+                self.intervals.remove(interval)
+
+    def snapshot(self, elapsed=None):
+        """`elapsed`: seconds the session has been observed, so a young session's rate isn't diluted"""
+        count = self.durations.n
+        span = self.seconds if elapsed is None else min(self.seconds, max(elapsed, 1.0))
+        return {
+            'blink_count': count,
+            'blink_rate': count / (span / 60.0),  # blinks per minute
+            'mean_duration': self.durations.mean if count else None,
+            'var_duration': self.durations.variance if count else None,
+            'mean_interval': self.intervals.mean if self.intervals.n else None,
+            'var_interval': self.intervals.variance if self.intervals.n else None
+        }
+
+
+class FatigueAnalytics:
+    """
+    Per-session rolling blink statistics over several windows (e.g. 1, 5 and 15 minutes).
+    Metric rows are emitted every `emit_interval` seconds of stream time: by `add_blink` and,
+    for sessions without new blinks, by `tick`, which the consumer calls on a timer.
+    Each session has its own stream clock: its latest blink end time (client clock), advanced
+    by the monotonic time since that blink was seen, so skewed clients don't move each other.
+    """
+    COLUMNS = ('session_id', 'window_seconds', 'window_end', 'blink_count', 'blink_rate',
+               'mean_duration', 'var_duration', 'mean_interval', 'var_interval')
+
+    def __init__(self, windows=(60, 300, 900), emit_interval=10.0, idle_timeout=None):
+        self.windows = tuple(sorted(int(w) for w in windows))
+        self.emit_interval = float(emit_interval)
+        # Sessions without a blink for this long (wall clock) are dropped from memory
+        self.idle_timeout = idle_timeout if idle_timeout is not None else max(self.windows) * 2
+        # session_id -> {'windows', 'started', 'last_emit', 'clock', 'clock_seen', 'last_seen'}
+        self.sessions = {}
+        self._last_prune = time.monotonic()
+
+    def add_blink(self, session_id, end_time, duration, interval):
+        """
+        Add a blink that ended at `end_time` (datetime).
+        Returns a list of row tuples matching COLUMNS, empty when nothing is due.
+        """
+        now = end_time.timestamp()
+        seen = time.monotonic()
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = self.sessions[session_id] = {
+                'windows': [BlinkWindow(w) for w in self.windows],
+                'started': now - duration,  # until set_start() supplies the session start
+                'last_emit': now,
+                'clock': now,  # latest blink end time (epoch seconds)
+                'clock_seen': seen,  # monotonic time it was seen
+                'last_seen': None
+            }
+        if now > state['clock']:
+            state['clock'], state['clock_seen'] = now, seen
+        state['last_seen'] = seen
+        for window in state['windows']:
+            window.add(now, duration, interval)
+        self._prune()
+
+        if now - state['last_emit'] < self.emit_interval:
+            return []
+        return self._emit(session_id, state, now)
+
+    def set_start(self, session_id, start_time):
+        """Use the session's recorded start (datetime) for the elapsed time of its rates"""
+        state = self.sessions.get(session_id)
+        if state is not None and start_time is not None:
+            state['started'] = min(state['started'], start_time.timestamp())
+
+    def stream_time(self, session_id):
+        """Current time on the session's own clock, None for an unknown session"""
+        state = self.sessions.get(session_id)
+        if state is None:
+            return None
+        return state['clock'] + (time.monotonic() - state['clock_seen'])
+
+    def tick(self):
+        """Rows of every session whose next emission is due on its own stream clock"""
+        rows = []
+        for session_id, state in self.sessions.items():
+            now = self.stream_time(session_id)
+            if now - state['last_emit'] >= self.emit_interval:
+                rows.extend(self._emit(session_id, state, now))
+        self._prune()
+        return rows
+
+    def end_session(self, session_id, end_time=None):
+        """
+        Forget a completed session.
+        Returns its final rows at `end_time` (datetime), empty when nothing is newer than the last emission.
+        """
+        state = self.sessions.pop(session_id, None)
+        if state is None or end_time is None or end_time.timestamp() <= state['last_emit']:
+            return []
+        return self._emit(session_id, state, end_time.timestamp())
+
+    def _emit(self, session_id, state, now):
+        state['last_emit'] = now
+        window_end = datetime.fromtimestamp(now)
+        rows = []
+        for window in state['windows']:
+            window.evict(now)
+            metrics = window.snapshot(now - state['started'])
+            rows.append((session_id, window.seconds, window_end) + tuple(metrics[c] for c in self.COLUMNS[3:]))
+        return rows
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        idle = [sid for sid, state in self.sessions.items() if now - state['last_seen'] > self.idle_timeout]
+        for session_id in idle:
+            del self.sessions[session_id]
@@ -0,0 +1,198 @@
+"""
+Chunked, compressed frame storage (operation.frame_chunks).
+
+Instead of one raw_frame_data row per frame, the frame consumer groups the frames of a
+session into grid-aligned chunks of CHUNK_SECONDS (chunk_start = floor(ts / CHUNK_SECONDS))
+and stores each chunk as one row. The payload layout, version 1, little-endian:
+    version u8 | ear dtype u8 | count u32 | first timestamp f64 (epoch seconds)
+    zlib( timestamp deltas u32 microseconds [count - 1] | EAR values float16/float32 [count] )
+EAR is NaN for frames without a face. Timestamps keep microsecond precision, like the
+TIMESTAMP column they replace.
+"""
+import struct
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+VERSION = 1
+CHUNK_SECONDS = 60
+EAR_DTYPES = {1: np.dtype('<f2'), 2: np.dtype('<f4')}
+EAR_CODES = {'float16': 1, 'float32': 2}
+
+TABLE = 'operation.frame_chunks'
+COLUMNS = ('session_id', 'chunk_start', 'first_ts', 'last_ts', 'frame_count', 'data')
+# The same key is produced again when a replay rebuilds a chunk; the fuller payload wins
+CONFLICT = """
+    ON CONFLICT (session_id, chunk_start, first_ts)
+    DO UPDATE SET
+        last_ts = EXCLUDED.last_ts,
+        frame_count = EXCLUDED.frame_count,
+        data = EXCLUDED.data
+    WHERE EXCLUDED.frame_count > frame_chunks.frame_count
+    """
+
+READ_SQL = """
+    SELECT data FROM operation.frame_chunks
+    WHERE session_id = %(session_id)s
+    AND (%(start)s::timestamp IS NULL OR last_ts >= %(start)s::timestamp)
+    AND (%(end)s::timestamp IS NULL OR chunk_start <= %(end)s::timestamp)
+    ORDER BY chunk_start, first_ts
+    """
+
+_HEADER = struct.Struct('<BBId')
+
+
+def encode_chunk(timestamps, ears, ear_dtype='float16'):
+    """
+    Pack one chunk of frames.
+    Args:
+        timestamps: frame timestamps in epoch seconds (any order; duplicates keep the last frame)
+        ears: EAR values, NaN when no face was found
+        ear_dtype: 'float16' (about 3 significant digits, plenty for EAR) or 'float32'
+    Returns:
+        payload bytes
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    ears = np.asarray(ears, dtype=np.float64)
+    first = float(timestamps.min())
+    micros = np.rint((timestamps - first) * 1e6).astype(np.int64)
+    # np.unique sorts; take the last occurrence of each timestamp
+    _, last = np.unique(micros[::-1], return_index=True)
+    order = len(micros) - 1 - last
+    micros, ears = micros[order], ears[order]
+
+    code = EAR_CODES[ear_dtype]
+    body = np.diff(micros).astype('<u4').tobytes() + ears.astype(EAR_DTYPES[code]).tobytes()
+    return _HEADER.pack(VERSION, code, len(micros), first) + zlib.compress(body)
+
+
+def decode_chunk(data):
+    """Unpack a payload into (timestamps float64 epoch seconds, ears float32)"""
+    data = bytes(data)
+    version, code, count, first = _HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"Unsupported chunk version: {version}")
+    body = zlib.decompress(data[_HEADER.size:])
+    deltas = np.frombuffer(body, dtype='<u4', count=max(0, count - 1))
+    ears = np.frombuffer(body, dtype=EAR_DTYPES[code], count=count, offset=deltas.nbytes)
+    micros = np.concatenate(([0], np.cumsum(deltas, dtype=np.int64)))
+    return first + micros / 1e6, ears.astype(np.float32)
+
+
+def decode_chunks(payloads, start=None, end=None):
+    """
+    Merge chunk payloads into one time-ordered series, clipped to [start, end] (epoch seconds).
+    Frames present in several overlapping chunks (see CONFLICT) are returned once.
+    """
+    parts = [decode_chunk(p) for p in payloads]
+    if not parts:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+    timestamps = np.concatenate([t for t, _ in parts])
+    ears = np.concatenate([e for _, e in parts])
+    timestamps, index = np.unique(timestamps, return_index=True)
+    ears = ears[index]
+    mask = np.ones(len(timestamps), dtype=bool)
+    if start is not None:
+        mask &= timestamps >= start
+    if end is not None:
+        mask &= timestamps <= end
+    return timestamps[mask], ears[mask]
+
+
+async def read_frames(db, session_id, start=None, end=None):
+    """
+    Frames of a session between `start` and `end` (epoch seconds, None = open-ended),
+    read from operation.frame_chunks through an AsyncDatabase.
+    Returns:
+        (timestamps, ears) NumPy arrays
+    """
+    rows = await db.fetchall(READ_SQL, {
+        'session_id': session_id,
+        'start': datetime.fromtimestamp(start) if start is not None else None,
+        'end': datetime.fromtimestamp(end) if end is not None else None,
+    })
+    return decode_chunks([row[0] for row in rows], start, end)
+
+
+class _OpenChunk:
+    __slots__ = ('timestamps', 'ears', 'offsets', 'last_seen')
+
+    def __init__(self):
+        self.timestamps = []
+        self.ears = []
+        self.offsets = {}  # partition -> lowest Kafka offset among the chunk's frames
+        self.last_seen = time.monotonic()
+
+
+class ChunkAssembler:
+    """
+    Groups frames into per-session chunks and seals them into frame_chunks rows.
+    A chunk is sealed once the session's stream time is `grace_seconds` past the chunk end
+    (late frames still land in it), after `idle_timeout` seconds without new frames, or on
+    shutdown. Frames that arrive after their chunk was sealed form another, smaller chunk
+    in the same grid cell.
+    """
+    def __init__(self, chunk_seconds=CHUNK_SECONDS, grace_seconds=5.0, idle_timeout=30.0, ear_dtype='float16'):
+        self.chunk_seconds = chunk_seconds
+        self.grace_seconds = grace_seconds
+        self.idle_timeout = idle_timeout
+        self.ear_dtype = ear_dtype
+        self.open = {}    # session_id -> {chunk start (epoch seconds): _OpenChunk}
+        self.latest = {}  # session_id -> latest frame timestamp seen
+
+    def add(self, session_id, timestamp, ear, partition=None, offset=None):
+        """Add one frame (timestamp in epoch seconds); returns the rows of chunks sealed by it"""
+        chunks = self.open.setdefault(session_id, {})
+        start = timestamp // self.chunk_seconds * self.chunk_seconds
+        chunk = chunks.get(start)
+        if chunk is None:
+            chunk = chunks[start] = _OpenChunk()
+        chunk.timestamps.append(timestamp)
+        chunk.ears.append(ear)
+        chunk.last_seen = time.monotonic()
+        if partition is not None and offset is not None and offset < chunk.offsets.get(partition, offset + 1):
+            chunk.offsets[partition] = offset
+
+        latest = self.latest[session_id] = max(timestamp, self.latest.get(session_id, timestamp))
+        horizon = latest - self.chunk_seconds - self.grace_seconds
+        return [self._seal(session_id, s) for s in [s for s in chunks if s <= horizon]]
+
+    def seal_idle(self):
+        """Rows of the chunks that received no frame for `idle_timeout` seconds"""
+        cutoff = time.monotonic() - self.idle_timeout
+        return [
+            self._seal(session_id, start)
+            for session_id, chunks in list(self.open.items())
+            for start in [s for s, c in chunks.items() if c.last_seen <= cutoff]
+        ]
+
+    def seal_all(self):
+        return [self._seal(session_id, start) for session_id, chunks in list(self.open.items()) for start in list(chunks)]
+
+    def pending_offsets(self):
+        """Lowest offset per partition still held in an open chunk (not safe to commit past)"""
+        pending = {}
+        for chunks in self.open.values():
+            for chunk in chunks.values():
+                for partition, offset in chunk.offsets.items():
+                    if offset < pending.get(partition, offset + 1):
+                        pending[partition] = offset
+        return pending
+
+    def _seal(self, session_id, start):
+        chunks = self.open[session_id]
+        chunk = chunks.pop(start)
+        if not chunks:
+            del self.open[session_id]
+            self.latest.pop(session_id, None)
+        payload = encode_chunk(chunk.timestamps, chunk.ears, self.ear_dtype)
+        return (
+            session_id,
+            datetime.fromtimestamp(start),
+            datetime.fromtimestamp(min(chunk.timestamps)),
+            datetime.fromtimestamp(max(chunk.timestamps)),
+            _HEADER.unpack_from(payload)[2],  # frames after de-duplication
+            payload
+        )
@@ -1,65 +1,187 @@
 from base_consumer import BaseKafkaConsumer
+from blink_detection import detect_blinks
+from frame_chunks import ChunkAssembler
+import frame_chunks
+from metrics import LogSampler
 from datetime import datetime
+import asyncio
+import json
 import logging
+import time
+import numpy as np
 
 logger = logging.getLogger(__name__)
+log_sample = LogSampler(1000)  # per-frame debug output: one frame in 1000
 
 class FrameEventConsumer(BaseKafkaConsumer):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, blink_detection=None, frame_storage=None, **kwargs):
         super().__init__(*args, **kwargs)
         # Cache of active sessions
         self.active_sessions = {}
 
-    async def process_message(self, message):
+        # 'rows' writes operation.raw_frame_data, 'chunks' compressed operation.frame_chunks, 'both' both
+        frame_storage = frame_storage or {}
+        self.storage_layout = frame_storage.get('layout', 'rows')
+        self.chunks = None
+        self._seal_task = None
+        if self.storage_layout in ('chunks', 'both'):
+            self.chunks = ChunkAssembler(
+                chunk_seconds=frame_storage.get('chunk_seconds', frame_chunks.CHUNK_SECONDS),
+                grace_seconds=frame_storage.get('grace_seconds', 5.0),
+                idle_timeout=frame_storage.get('idle_timeout', 30.0),
+                ear_dtype=frame_storage.get('ear_dtype', 'float16')
+            )
+
+        # Server-side blink detection: detected blinks are published to the blink topic
+        self.blink_detection = blink_detection
+        self.blink_producer = None
+        self.detector_states = {}  # session_id -> (DetectorState, last seen monotonic time)
+
+    def register_tables(self, writer):
+        writer.register(
+            'operation.raw_frame_data',
+            ('session_id', 'timestamp', 'ear'),
+            conflict="ON CONFLICT (session_id, timestamp) DO NOTHING"  # replayed frames are skipped
+        )
+        writer.register(
+            frame_chunks.TABLE,
+            frame_chunks.COLUMNS,
+            conflict=frame_chunks.CONFLICT,
+            unique=('session_id', 'chunk_start', 'first_ts'),
+            merge=lambda old, new: new if new[4] >= old[4] else old  # keep the fuller rebuild of a chunk
+        )
+
+    async def start(self):
+        if self.blink_detection:
+            self.blink_producer = self.transport.producer(
+                value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                key_serializer=lambda v: str(v).encode('utf-8')
+            )
+            await self.blink_producer.start()
+            logger.info(f"Server-side blink detection enabled, publishing to {self.blink_detection['topic']}")
+        if self.chunks:
+            self._seal_task = asyncio.create_task(self._seal_idle_chunks())
+            logger.info(f"Storing frames in {self.chunks.chunk_seconds:g}s chunks ({self.storage_layout})")
+        await super().start()
+
+    async def stop(self):
+        if self._seal_task:
+            self._seal_task.cancel()
+            self._seal_task = None
+        if self.chunks and self.writer:
+            # Open chunks are written as they are; frames arriving later form separate chunks
+            for row in self.chunks.seal_all():
+                await self.writer.add(frame_chunks.TABLE, row)
+        await super().stop()
+        if self.blink_producer:
+            await self.blink_producer.stop()
+
+    def _parse_frame(self, frame_data):
+        """Validate a frame message; returns (session_id, timestamp, ear_value) or None"""
+        # Extract and validate session_id
         try:
-            frame_data = message.value
-            
-            # Extract and validate session_id
+            session_id = int(frame_data.get('session_id'))
+        except (TypeError, ValueError):
+            logger.error(f"Invalid session_id: {frame_data.get('session_id')}")
+            return None
+
+        # Extract and handle timestamp (the producer sends 'timestamp')
+        timestamp = frame_data.get('timestamp', frame_data.get('timeframe'))
+        if timestamp is None:
+            logger.error(f"Missing timestamp in frame data for session {session_id}")
+            return None
+
+        # Convert timestamp based on its type
+        if isinstance(timestamp, str):
             try:
-                session_id = int(frame_data.get('session_id'))
-            except (TypeError, ValueError):
-                logger.error(f"Invalid session_id: {frame_data.get('session_id')}")
-                return
-            
-            # Extract and handle timestamp
-            timestamp = frame_data.get('timeframe')
-            if timestamp is None:
-                logger.error(f"Missing timestamp in frame data for session {session_id}")
-                return
-                
-            # Convert timestamp based on its type
-            if isinstance(timestamp, str):
-                try:
-                    timestamp = datetime.fromisoformat(timestamp)
-                except ValueError:
-                    # Try parsing as timestamp if isoformat fails
-                    timestamp = datetime.fromtimestamp(float(timestamp))
-            elif isinstance(timestamp, (int, float)):
-                timestamp = datetime.fromtimestamp(timestamp)
-            
-            # Extract and validate ear_value
+                timestamp = datetime.fromisoformat(timestamp)
+            except ValueError:
+                # Try parsing as timestamp if isoformat fails
+                timestamp = datetime.fromtimestamp(float(timestamp))
+        elif isinstance(timestamp, (int, float)):
+            timestamp = datetime.fromtimestamp(timestamp)
+
+        # Extract and validate ear_value
+        try:
+            ear_value = float(frame_data.get("ear_value"))
+        except (TypeError, ValueError):
+            logger.error(f"Invalid ear_value: {frame_data.get('ear_value')}")
+            return None
+        return session_id, timestamp, ear_value
+
+    def pending_offsets(self):
+        # Frames in chunks that are not sealed yet are only in memory
+        return self.chunks.pending_offsets() if self.chunks else {}
+
+    async def _seal_idle_chunks(self):
+        """Background task: write chunks of sessions that stopped sending frames"""
+        interval = max(1.0, min(self.chunks.idle_timeout, self.chunks.chunk_seconds) / 2)
+        while True:
+            await asyncio.sleep(interval)
+            if not self.writer:
+                continue
             try:
-                ear_value = float(frame_data.get("ear_value"))
-                if ear_value is None:
-                    logger.warning(f"Missing ear_value in frame data for session {session_id}")
-                    return
-            except (TypeError, ValueError):
-                logger.error(f"Invalid ear_value: {frame_data.get('ear_value')}")
-                return
-            
-            # Insert into database using parameterized query
-            if self.db_config['write'] == 1:
-                with self.db_conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        INSERT INTO operation.raw_frame_data
-                        (session_id, timestamp, ear)
-                        VALUES (%s, %s, %s)
-                        """,
-                        (session_id, timestamp, ear_value)
-                    )
-                    
-            logger.debug(f"Stored frame data for session {session_id}: timestamp={timestamp}, ear={ear_value}")
-            
+                for row in self.chunks.seal_idle():
+                    await self.writer.add(frame_chunks.TABLE, row)
+            except Exception as e:
+                logger.error(f"Error sealing idle frame chunks: {e}")
+
+    async def process_message(self, message):
+        await self.process_batch([message])
+
+    async def process_batch(self, records):
+        try:
+            frames = []
+            for message in records:
+                parsed = self._parse_frame(message.value)
+                if parsed is None:
+                    continue
+                frames.append(parsed)
+
+                # Buffer the row; the batch writer flushes it with the next COPY/multi-row insert
+                if str(self.db_config['write']) == '1':
+                    if self.storage_layout != 'chunks':
+                        await self.writer.add('operation.raw_frame_data', parsed)
+                    if self.chunks:
+                        session_id, timestamp, ear_value = parsed
+                        for row in self.chunks.add(session_id, timestamp.timestamp(), ear_value,
+                                                   message.partition, message.offset):
+                            await self.writer.add(frame_chunks.TABLE, row)
+                if logger.isEnabledFor(logging.DEBUG) and log_sample():
+                    logger.debug(f"Stored frame data for session {parsed[0]}: timestamp={parsed[1]}, ear={parsed[2]}")
+
+            if self.blink_producer and frames:
+                await self._detect_blinks(frames)
         except Exception as e:
-            logger.error(f"Error at FrameEventConsumer on self.process_message: {e}", exc_info=True)
\ No newline at end of file
+            logger.error(f"Error at FrameEventConsumer on self.process_batch: {e}", exc_info=True)
+
+    async def _detect_blinks(self, frames):
+        """Run the vectorized detector per session and publish the completed blinks"""
+        by_session = {}
+        for session_id, timestamp, ear_value in frames:
+            by_session.setdefault(session_id, []).append((timestamp.timestamp(), ear_value))
+
+        now = time.monotonic()
+        for session_id, samples in by_session.items():
+            samples = np.array(samples, dtype=np.float64)
+            state = self.detector_states.get(session_id, (None, None))[0]
+            events, state = detect_blinks(
+                samples[:, 0], samples[:, 1],
+                threshold=self.blink_detection['threshold'],
+                open_threshold=self.blink_detection.get('open_threshold'),
+                min_frames=self.blink_detection['min_frames'],
+                max_frames=self.blink_detection.get('max_frames'),
+                state=state
+            )
+            self.detector_states[session_id] = (state, now)
+            for start, end, _ in events:
+                await self.blink_producer.send(
+                    self.blink_detection['topic'],
+                    key=str(session_id),
+                    value={"session_id": session_id, "start_timestamp": start, "end_timestamp": end}
+                )
+
+        # Forget sessions that stopped sending frames
+        idle_timeout = self.blink_detection.get('idle_timeout', 600)
+        for session_id in [sid for sid, (_, seen) in self.detector_states.items() if now - seen > idle_timeout]:
+            del self.detector_states[session_id]
@@ -11,21 +11,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# consumer type -> (consumer class, topic, consumer group)
+CONSUMER_TYPES = {
+    'frame': (FrameEventConsumer, 'frame_data', 'frame-consumer-group'),
+    'blink': (BlinkEventConsumer, 'blink_event', 'blink-consumer-group'),
+    'session': (SessionEventConsumer, 'session_events', 'session-consumer-group'),
+}
 
-async def main():
-    # Get configuration from environment variables
-    kafka_server = os.environ.get('KAFKA_SERVER', 'localhost') 
+
+def load_config():
+    """Read the consumer configuration from environment variables"""
+    kafka_server = os.environ.get('KAFKA_SERVER', 'localhost')
     kafka_port = os.environ.get('KAFKA_PORT', '9092')
-    
+
     db_config = {
         'host': os.environ.get('DATABASE_HOST'),
         'port': os.environ.get('DATABASE_PORT', '5432'),
         'user': os.environ.get('DATABASE_USER'),
         'password': os.environ.get('DATABASE_PASSWORD', ''),
         'dbname': os.environ.get('DATABASE_NAME'),
-        'write':os.environ.get('WRITE')
+        'write':os.environ.get('WRITE'),
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', '4'))
     }
-    
+
+    # Batched writes: a flush happens at BATCH_SIZE rows or after BATCH_FLUSH_INTERVAL seconds
+    batch_config = {
+        'mode': os.environ.get('BATCH_MODE', 'copy'),  # copy | values
+        'max_rows': int(os.environ.get('BATCH_SIZE', '500')),
+        'flush_interval': float(os.environ.get('BATCH_FLUSH_INTERVAL', '1.0')),
+        'stats_interval': float(os.environ.get('BATCH_STATS_INTERVAL', '30')),
+        # FETCH_MODE=batch: getmany() up to FETCH_MAX_RECORDS per partition, commit after flush
+        'fetch_mode': os.environ.get('FETCH_MODE', 'message'),  # message | batch
+        'fetch_max_records': int(os.environ.get('FETCH_MAX_RECORDS', '500')),
+        'fetch_timeout_ms': int(os.environ.get('FETCH_TIMEOUT_MS', '500')),
+        # FETCH_MODE=message: flush and commit offsets at most every COMMIT_INTERVAL seconds
+        'commit_interval': float(os.environ.get('COMMIT_INTERVAL', os.environ.get('BATCH_FLUSH_INTERVAL', '1.0')))
+    }
+
     ssh_config = None
     if os.environ.get('SSH_HOST'):
         ssh_config = {
@@ -33,33 +55,105 @@ async def main():
             'port': os.environ.get('SSH_PORT', '22'),
             'user': os.environ.get('SSH_USER'),
             'key_path': os.environ.get('SSH_KEY_PATH'),
-            'key_pw': os.environ.get('SSH_KEY_PW', '')
+            'key_pw': os.environ.get('SSH_KEY_PW', ''),
+            # 0 lets the OS pick a free port so several workers can share a host
+            'local_port': int(os.environ.get('SSH_LOCAL_PORT', '0'))
+        }
+
+    # Server-side blink detection on the frame stream (SERVER_BLINK_DETECTION=1)
+    blink_detection = None
+    if os.environ.get('SERVER_BLINK_DETECTION') == '1':
+        blink_detection = {
+            'topic': 'blink_event',
+            'threshold': float(os.environ.get('BLINK_EAR_THRESHOLD', '0.28')),
+            'open_threshold': float(os.environ['BLINK_OPEN_THRESHOLD']) if os.environ.get('BLINK_OPEN_THRESHOLD') else None,
+            'min_frames': int(os.environ.get('BLINK_MIN_FRAMES', '4')),
+            'max_frames': int(os.environ['BLINK_MAX_FRAMES']) if os.environ.get('BLINK_MAX_FRAMES') else None
         }
-    
+
+    # Frame storage layout (FRAME_STORAGE): rows | chunks | both, see frame_chunks.py
+    frame_storage = {
+        'layout': os.environ.get('FRAME_STORAGE', 'rows'),
+        'chunk_seconds': float(os.environ.get('FRAME_CHUNK_SECONDS', '60')),
+        'grace_seconds': float(os.environ.get('FRAME_CHUNK_GRACE', '5')),
+        'idle_timeout': float(os.environ.get('FRAME_CHUNK_IDLE_TIMEOUT', '30')),
+        'ear_dtype': os.environ.get('FRAME_CHUNK_EAR_DTYPE', 'float16')  # float16 | float32
+    }
+
+    # Per-type constructor options
+    options = {
+        'frame': {
+            'blink_detection': blink_detection,
+            'frame_storage': frame_storage
+        },
+        'session': {
+            'rollup_config': {
+                # Finalized sessions are added to the hourly/daily user rollups every ROLLUP_INTERVAL
+                # seconds (0 = off) once ROLLUP_SETTLE_SECONDS have passed, ROLLUP_BATCH_SIZE at a time
+                'interval': float(os.environ.get('ROLLUP_INTERVAL', '60')),
+                'settle_seconds': float(os.environ.get('ROLLUP_SETTLE_SECONDS', '120')),
+                'batch_size': int(os.environ.get('ROLLUP_BATCH_SIZE', '100'))
+            }
+        },
+        'blink': {
+            'analytics_config': {
+                # Rolling fatigue metric windows in seconds, emitted every FATIGUE_EMIT_INTERVAL seconds of stream time
+                'windows': [int(w) for w in os.environ.get('FATIGUE_WINDOWS', '60,300,900').split(',') if w.strip()],
+                'emit_interval': float(os.environ.get('FATIGUE_EMIT_INTERVAL', '10'))
+            }
+        }
+    }
+
+    return {
+        # Prometheus-style /metrics listener (0 = disabled); supervised workers use consecutive ports
+        'metrics_port': int(os.environ.get('METRICS_PORT', '0')),
+        'kafka_server': kafka_server,
+        'kafka_port': kafka_port,
+        'db_config': db_config,
+        'batch_config': batch_config,
+        'ssh_config': ssh_config,
+        'options': options
+    }
+
+
+def build_consumer(consumer_type, config, transport=None):
+    """
+    Create the consumer for `consumer_type` from a config returned by load_config().
+    `transport` replaces Kafka, e.g. with a shared memory_broker.MemoryBroker.
+    """
+    consumer_class, topic, group_id = CONSUMER_TYPES[consumer_type]
+    return consumer_class(
+        config['kafka_server'], config['kafka_port'], topic,
+        group_id, config['db_config'], config['ssh_config'], config['batch_config'],
+        metrics_port=config['metrics_port'] or None,
+        transport=transport,
+        **config['options'].get(consumer_type, {})
+    )
+
+
+async def run_consumer(consumer_type, metrics_port=None):
+    config = load_config()
+    if metrics_port is not None:
+        config['metrics_port'] = metrics_port
+    consumer = build_consumer(consumer_type, config)
+    logger.info(f"Starting {consumer_type} consumer at {config['kafka_server']} on port {config['kafka_port']}")
+    await consumer.start()
+
+
+async def main():
     # Determine which consumer to run based on environment variable
     consumer_type = os.environ.get('CONSUMER_TYPE', 'frame')
-    
-    if consumer_type == 'frame':
-        consumer = FrameEventConsumer(
-            kafka_server, kafka_port, 'frame_data', 
-            'frame-consumer-group', db_config, ssh_config
-        )
-    elif consumer_type == 'blink':
-        consumer = BlinkEventConsumer(
-            kafka_server, kafka_port, 'blink_event', 
-            'blink-consumer-group', db_config, ssh_config
-        )
-    elif consumer_type == 'session':
-        consumer = SessionEventConsumer(
-            kafka_server, kafka_port, 'session_events', 
-            'session-consumer-group', db_config, ssh_config
-        )
-    else:
+
+    if consumer_type not in CONSUMER_TYPES:
         logger.error(f"Unknown consumer type: {consumer_type}")
         return
-    
-    logger.info(f"Starting {consumer_type} consumer at {kafka_server} on port {kafka_port}")
-    await consumer.start()
+
+    await run_consumer(consumer_type)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if os.environ.get('CONSUMER_TYPE') == 'all':
+        # Supervisor mode: run every consumer type with the replicas given in CONSUMER_REPLICAS
+        from supervisor import run_supervisor
+        run_supervisor()
+    else:
+        asyncio.run(main())
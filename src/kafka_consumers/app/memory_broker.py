@@ -0,0 +1,264 @@
+"""
+Asyncio in-memory broker with the subset of the aiokafka API this project uses.
+
+MemoryBroker is a transport (see transport.py): `producer(...)` and `consumer(...)`
+return clients that behave like AIOKafkaProducer / AIOKafkaConsumer for send(),
+iteration, getmany(), commit(), assignment() and highwater(). Topics are created on
+first use with `partitions` partitions; keyed records go to crc32(key) % partitions,
+unkeyed ones round-robin. Consumers in the same group share the partitions of their
+topic and the group's committed offsets, so the app and all consumers can run in one
+process without Kafka. Records are serialized to bytes exactly as with Kafka.
+"""
+import asyncio
+import itertools
+import logging
+import time
+import zlib
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# Field-compatible with aiokafka's TopicPartition (equal and hash-equal as tuples)
+TopicPartition = namedtuple('TopicPartition', ['topic', 'partition'])
+RecordMetadata = namedtuple('RecordMetadata', ['topic', 'partition', 'offset', 'timestamp'])
+ConsumerRecord = namedtuple('ConsumerRecord', ['topic', 'partition', 'offset', 'timestamp', 'key', 'value'])
+
+
+class _Partition:
+    """Append-only log; the oldest records are dropped beyond `retention`"""
+    def __init__(self, retention):
+        self.records = []  # (timestamp ms, key bytes, value bytes)
+        self.base = 0      # offset of records[0]
+        self.retention = retention
+
+    @property
+    def end(self):
+        return self.base + len(self.records)
+
+    def append(self, key, value):
+        offset = self.end
+        self.records.append((int(time.time() * 1000), key, value))
+        if self.retention and len(self.records) > self.retention * 2:
+            # Trim in large steps so appends stay amortized O(1)
+            drop = len(self.records) - self.retention
+            del self.records[:drop]
+            self.base += drop
+        return offset
+
+    def read(self, offset, limit):
+        start = max(offset, self.base) - self.base
+        return self.base + start, self.records[start:start + limit]
+
+
+class MemoryBroker:
+    def __init__(self, partitions=3, retention=1_000_000):
+        self.default_partitions = partitions
+        self.retention = retention
+        self.topics = {}   # topic -> [_Partition]
+        self.groups = {}   # group id -> {'members': [consumer], 'committed': {tp: offset}}
+        self._round_robin = itertools.count()
+        self._data = asyncio.Condition()
+
+    def create_topic(self, topic, partitions=None):
+        if topic not in self.topics:
+            self.topics[topic] = [_Partition(self.retention) for _ in range(partitions or self.default_partitions)]
+        return self.topics[topic]
+
+    def partitions_for_topic(self, topic):
+        return set(range(len(self.create_topic(topic))))
+
+    # Transport interface
+    def producer(self, **kwargs):
+        return MemoryProducer(self, **kwargs)
+
+    def consumer(self, *topics, **kwargs):
+        return MemoryConsumer(self, *topics, **kwargs)
+
+    async def append(self, topic, key, value, partition=None):
+        partitions = self.create_topic(topic)
+        if partition is None:
+            if key is None:
+                partition = next(self._round_robin) % len(partitions)
+            else:
+                partition = zlib.crc32(key) % len(partitions)
+        offset = partitions[partition].append(key, value)
+        async with self._data:
+            self._data.notify_all()
+        return RecordMetadata(topic, partition, offset, partitions[partition].records[-1][0])
+
+    async def wait_for_data(self, timeout):
+        """Sleep until any record is appended or `timeout` seconds pass"""
+        async with self._data:
+            try:
+                await asyncio.wait_for(self._data.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def join(self, group_id, consumer):
+        group = self.groups.setdefault(group_id, {'members': [], 'committed': {}})
+        group['members'].append(consumer)
+        self._rebalance(group)
+        return group
+
+    def leave(self, group_id, consumer):
+        group = self.groups.get(group_id)
+        if group and consumer in group['members']:
+            group['members'].remove(consumer)
+            self._rebalance(group)
+
+    def _rebalance(self, group):
+        """Spread every subscribed partition round-robin over the group's members"""
+        by_topic = {}
+        for member in group['members']:
+            for topic in member.topics:
+                by_topic.setdefault(topic, []).append(member)
+        assigned = {id(m): set() for m in group['members']}
+        for topic, members in by_topic.items():
+            for partition in range(len(self.create_topic(topic))):
+                assigned[id(members[partition % len(members)])].add(TopicPartition(topic, partition))
+        for member in group['members']:
+            member._assign(assigned[id(member)])
+
+
+class MemoryProducer:
+    def __init__(self, broker, value_serializer=None, key_serializer=None, **kwargs):
+        # Tuning options meant for aiokafka (linger_ms, compression_type, ...) are accepted and ignored
+        self.broker = broker
+        self.value_serializer = value_serializer or (lambda v: v)
+        self.key_serializer = key_serializer or (lambda k: k)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def send(self, topic, value=None, key=None, partition=None, **kwargs):
+        """Append the record; like aiokafka, returns a future resolving to its metadata"""
+        key_bytes = self.key_serializer(key) if key is not None else None
+        metadata = await self.broker.append(topic, key_bytes, self.value_serializer(value), partition)
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(metadata)
+        return future
+
+    async def send_and_wait(self, topic, value=None, key=None, partition=None, **kwargs):
+        return await (await self.send(topic, value, key, partition))
+
+
+class MemoryConsumer:
+    def __init__(self, broker, *topics, group_id=None, auto_offset_reset='latest', enable_auto_commit=True,
+                 value_deserializer=None, key_deserializer=None, **kwargs):
+        self.broker = broker
+        self.topics = list(topics)
+        self.group_id = group_id
+        self.auto_offset_reset = auto_offset_reset
+        self.enable_auto_commit = enable_auto_commit
+        self.value_deserializer = value_deserializer or (lambda v: v)
+        self.key_deserializer = key_deserializer or (lambda k: k)
+        self.group = None
+        self._assignment = set()
+        self._positions = {}  # tp -> next offset to return
+        self._buffer = deque()  # records fetched for iteration but not returned yet
+
+    async def start(self):
+        for topic in self.topics:
+            self.broker.create_topic(topic)
+        if self.group_id is not None:
+            self.group = self.broker.join(self.group_id, self)
+        else:
+            self._assign({TopicPartition(t, p) for t in self.topics for p in self.broker.partitions_for_topic(t)})
+
+    async def stop(self):
+        if self.enable_auto_commit:
+            await self.commit()
+        if self.group is not None:
+            self.broker.leave(self.group_id, self)
+
+    def _assign(self, partitions):
+        self._assignment = set(partitions)
+        self._positions = {tp: p for tp, p in self._positions.items() if tp in self._assignment}
+        self._buffer = deque(r for r in self._buffer if TopicPartition(r.topic, r.partition) in self._assignment)
+
+    def _position(self, tp):
+        if tp not in self._positions:
+            committed = self.group['committed'].get(tp) if self.group else None
+            if committed is not None:
+                self._positions[tp] = committed
+            else:
+                partition = self.broker.topics[tp.topic][tp.partition]
+                self._positions[tp] = partition.base if self.auto_offset_reset == 'earliest' else partition.end
+        return self._positions[tp]
+
+    def assignment(self):
+        return set(self._assignment)
+
+    def highwater(self, tp):
+        partitions = self.broker.topics.get(tp[0])
+        return partitions[tp[1]].end if partitions and tp[1] < len(partitions) else None
+
+    def partitions_for_topic(self, topic):
+        return self.broker.partitions_for_topic(topic)
+
+    async def topics(self):
+        return set(self.broker.topics)
+
+    async def position(self, tp):
+        return self._position(TopicPartition(*tp))
+
+    async def committed(self, tp):
+        return self.group['committed'].get(TopicPartition(*tp)) if self.group else None
+
+    async def commit(self, offsets=None):
+        """Commit `offsets` ({tp: next offset}) or the current positions"""
+        if self.group is None:
+            return
+        if offsets is None:
+            offsets = dict(self._positions)
+        for tp, offset in offsets.items():
+            tp = TopicPartition(*tp)
+            if tp in self._assignment:  # revoked partitions belong to another member now
+                self.group['committed'][tp] = offset
+
+    def _fetch(self, max_records):
+        result = {}
+        remaining = max_records
+        for tp in sorted(self._assignment):
+            if remaining <= 0:
+                break
+            start, raw = self.broker.topics[tp.topic][tp.partition].read(self._position(tp), remaining)
+            if not raw:
+                continue
+            result[tp] = [
+                ConsumerRecord(
+                    tp.topic, tp.partition, start + i, timestamp,
+                    self.key_deserializer(key) if key is not None else None,
+                    self.value_deserializer(value)
+                )
+                for i, (timestamp, key, value) in enumerate(raw)
+            ]
+            self._positions[tp] = start + len(raw)
+            remaining -= len(raw)
+        return result
+
+    async def getmany(self, *partitions, timeout_ms=0, max_records=None):
+        """Records per partition, waiting up to `timeout_ms` when nothing is available"""
+        if self.enable_auto_commit:
+            await self.commit()
+        max_records = max_records or 500
+        records = self._fetch(max_records)
+        if not records and timeout_ms:
+            await self.broker.wait_for_data(timeout_ms / 1000)
+            records = self._fetch(max_records)
+        return records
+
+    async def getone(self):
+        while not self._buffer:
+            for messages in (await self.getmany(timeout_ms=1000)).values():
+                self._buffer.extend(messages)
+        return self._buffer.popleft()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.getone()
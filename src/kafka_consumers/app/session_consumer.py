@@ -1,15 +1,63 @@
 from base_consumer import BaseKafkaConsumer
+import session_metrics
+import user_rollups
+import asyncio
 import logging
-# import statistics
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 class SessionEventConsumer(BaseKafkaConsumer):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, rollup_config=None, **kwargs):
         super().__init__(*args, **kwargs)
         # Cache of active sessions
         self.active_sessions = {}
+
+        # Finalized sessions are added to the per-user hourly/daily rollups by a periodic task
+        self.rollup_config = rollup_config or {}
+        self._rollup_task = None
+
+    async def start(self):
+        if self.rollup_config.get('interval', 60) > 0:
+            self._rollup_task = asyncio.create_task(self._roll_up_sessions())
+        await super().start()
+
+    async def stop(self):
+        if self._rollup_task:
+            self._rollup_task.cancel()
+            self._rollup_task = None
+        await super().stop()
+
+    async def _roll_up_sessions(self):
+        """Background task: add sessions finalized at least `settle_seconds` ago to the user rollups"""
+        params = {
+            'settle_seconds': self.rollup_config.get('settle_seconds', 120),
+            'limit': self.rollup_config.get('batch_size', 100)
+        }
+        while True:
+            await asyncio.sleep(self.rollup_config.get('interval', 60))
+            if self.db is None:
+                continue
+            try:
+                rows = await self.db.execute(user_rollups.ROLLUP_SQL, params)
+                if rows:
+                    logger.info(f"Updated {rows} daily user rollups")
+            except Exception as e:
+                logger.error(f"Error updating user rollups: {e}")
+    
+    def register_tables(self, writer):
+        writer.register(
+            'operation.sessions',
+            ('session_id', 'user_id', 'start_time', 'status'),
+            conflict="""
+                ON CONFLICT (session_id)
+                DO UPDATE SET
+                    user_id = EXCLUDED.user_id,
+                    start_time = EXCLUDED.start_time,
+                    status = EXCLUDED.status
+                """,
+            unique=('session_id',)
+        )
     
     async def process_message(self, message):
         try:
@@ -26,146 +74,54 @@ class SessionEventConsumer(BaseKafkaConsumer):
             end_time = None
             if 'end_time' in session_data and session_data['end_time']:
                 end_time = datetime.fromisoformat(session_data['end_time'])
-            
-            # If this is a new session, store it in the active sessions
-            if status == 'active':
-                self.active_sessions[session_id] = {
-                    'user_id': user_id,
-                    'start_time': start_time,
-                    'status': status
-                }
-                
-                # Store in database
-                with self.db_conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        INSERT INTO operation.sessions 
-                        (session_id, user_id, start_time, status)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (session_id) 
-                        DO UPDATE SET 
-                            user_id = EXCLUDED.user_id,
-                            start_time = EXCLUDED.start_time,
-                            status = EXCLUDED.status
-                        """,
-                        (session_id, user_id, start_time, status)
-                    )
-                
-                logger.info(f"Started new session {session_id} for user {user_id}")
-            
-            # If session is complete or interrupted
-            elif status in ('complete', 'interrupted'):
-                # Update session in database
-                with self.db_conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        UPDATE operation.sessions 
-                        SET end_time = %s, status = %s
-                        WHERE session_id = %s
-                        """,
-                        (end_time or datetime.now(), status, session_id)
-                    )
-                
-                # Calculate session statistics # To be implemented
-                await self._calculate_session_metrics(session_id)
-                
-                # Remove from active sessions
-                if session_id in self.active_sessions:
-                    del self.active_sessions[session_id]
-                
-                logger.info(f"Completed session {session_id} with status {status}")
-        
         except Exception as e:
             logger.error(f"Error at SessionEventConsumer's self.process_message: {e}")
-    
-    
-    async def _calculate_session_metrics(self, session_id):
-        """Calculate and store session metrics"""
-        try:
-            with self.db_conn.cursor() as cursor:
-                cursor.execute(
-                    f"""
-                    SELECT duration, interval
-                    FROM operation.blink_events
-                    WHERE session_id = {session_id}
-                    AND duration IS NOT NULL
-                    ORDER BY start_time
-                    """
-                )
-                blink_data = cursor.fetchall()
-                logger.info(blink_data) # debug
-                if not blink_data:
-                    logger.warning(f"No blink data found for session {session_id}")
-                    return
-        except Exception as e:
-            logger.info(f"Error at SessionEventConsumer's self.calculate_session_metrics:{e}")
-            
-
-    #         # Extract durations and intervals
-    #         durations = [row[0] for row in blink_data if row[0] is not None]
-    #         intervals = [row[1] for row in blink_data if row[1] is not None]
-            
-    #         # Calculate metrics
-    #         metrics = {}
-    #         metrics['total_blinks'] = len(durations)
-            
-    #         if durations:
-    #             metrics['avg_duration'] = sum(durations) / len(durations)
-    #             metrics['max_duration'] = max(durations)
-    #             metrics['min_duration'] = min(durations)
-    #             metrics['duration_variance'] = statistics.variance(durations) if len(durations) > 1 else 0
+            return
+        
+        # Database errors propagate, so the message's offset is never committed and the
+        # event is processed again once the consumer restarts.
+        # If this is a new session, store it in the active sessions
+        if status == 'active':
+            self.active_sessions[session_id] = {
+                'user_id': user_id,
+                'start_time': start_time,
+                'status': status
+            }
             
-    #         if intervals:
-    #             metrics['avg_interval'] = sum(intervals) / len(intervals)
-    #             metrics['max_interval'] = max(intervals)
-    #             metrics['min_interval'] = min(intervals)
-    #             metrics['interval_variance'] = statistics.variance(intervals) if len(intervals) > 1 else 0
+            # Store in database with the next batched upsert
+            await self.writer.add('operation.sessions', (session_id, user_id, start_time, status))
             
-    #         # Calculate blink rate (blinks per minute)
-    #         with self.db_conn.cursor() as cursor:
-    #             cursor.execute(
-    #                 """
-    #                 SELECT EXTRACT(EPOCH FROM (end_time - start_time))/60 as session_minutes
-    #                 FROM sessions
-    #                 WHERE session_id = %s
-    #                 """,
-    #                 (session_id,)
-    #             )
-    #             result = cursor.fetchone()
-                
-    #             if result and result[0]:
-    #                 session_minutes = result[0]
-    #                 metrics['blink_rate'] = metrics['total_blinks'] / session_minutes
+            logger.info(f"Started new session {session_id} for user {user_id}")
+        
+        # If session is complete or interrupted
+        elif status in ('complete', 'interrupted'):
+            # Pending inserts must land before the row is closed
+            await self.writer.flush()
             
-    #         # Calculate fatigue score (a simple example)
-    #         # Low values indicate more fatigue
-    #         if 'interval_variance' in metrics and 'duration_variance' in metrics:
-    #             # Higher variance in both metrics often indicates fatigue
-    #             # This is a simplified model - you'd want to refine this
-    #             metrics['fatigue_score'] = 100 - (
-    #                 (metrics['interval_variance'] * 20) + 
-    #                 (metrics['duration_variance'] * 50)
-    #             )
-    #             # Clamp to 0-100 range
-    #             metrics['fatigue_score'] = max(0, min(100, metrics['fatigue_score']))
+            # The producer stamps every event with its send time in 'start_time'; the
+            # event's own time keeps end_time stable when the topic is replayed
+            if end_time is None:
+                end_time = start_time or datetime.fromtimestamp(message.timestamp / 1000)
+            await self.db.execute(
+                """
+                UPDATE operation.sessions 
+                SET end_time = COALESCE(end_time, %s), status = %s
+                WHERE session_id = %s
+                """,
+                (end_time, status, session_id)
+            )
             
-    #         # Store metrics in database
-    #         placeholders = ", ".join([f"{k} = %s" for k in metrics.keys()])
-    #         values = list(metrics.values())
+            # Finalize session statistics
+            await self._calculate_session_metrics(session_id)
             
-    #         with self.db_conn.cursor() as cursor:
-    #             cursor.execute(
-    #                 f"""
-    #                 INSERT INTO session_metrics 
-    #                 (session_id, {', '.join(metrics.keys())})
-    #                 VALUES (%s, {', '.join(['%s' for _ in metrics])})
-    #                 ON CONFLICT (session_id) 
-    #                 DO UPDATE SET {placeholders}
-    #                 """,
-    #                 [session_id] + values
-    #             )
+            # Remove from active sessions
+            if session_id in self.active_sessions:
+                del self.active_sessions[session_id]
             
-    #         logger.info(f"Calculated metrics for session {session_id}")
-        
-    #     except Exception as e:
-    #         logger.error(f"Error calculating session metrics: {e}")
\ No newline at end of file
+            logger.info(f"Completed session {session_id} with status {status}")
+    
+    
+    async def _calculate_session_metrics(self, session_id):
+        """Finalize session metrics from the running sums maintained by the blink consumer"""
+        await self.db.execute(session_metrics.FINALIZE_SQL, {'session_ids': [session_id]})
+        logger.info(f"Calculated metrics for session {session_id}")
@@ -0,0 +1,187 @@
+"""
+Incrementally maintained operation.session_metrics.
+
+The blink consumer upserts running sums per session as blinks are stored
+(INSERT_BLINKS_SQL, counting only newly inserted blinks so replays are idempotent);
+the session consumer derives averages, variances, blink rate and the fatigue score
+from those sums with a single upsert when the session completes (FINALIZE_SQL).
+Blinks stored after that (still in flight at completion) derive them again. The later
+finalized_at delays the session's rollup (user_rollups.py) until they settle; for a session
+already rolled up, the blinks and the change of its fatigue score go to the rollups directly.
+"""
+from user_rollups import APPLY_LATE_SQL
+
+TABLE = 'operation.session_metrics'
+
+# Running aggregates added by every stored blink
+DELTA_COLUMNS = (
+    'session_id', 'total_blinks', 'sum_duration', 'sumsq_duration', 'min_duration', 'max_duration',
+    'interval_count', 'sum_interval', 'sumsq_interval', 'min_interval', 'max_interval'
+)
+
+DELTA_CONFLICT = """
+    ON CONFLICT (session_id)
+    DO UPDATE SET
+        total_blinks = session_metrics.total_blinks + EXCLUDED.total_blinks,
+        sum_duration = session_metrics.sum_duration + EXCLUDED.sum_duration,
+        sumsq_duration = session_metrics.sumsq_duration + EXCLUDED.sumsq_duration,
+        min_duration = LEAST(session_metrics.min_duration, EXCLUDED.min_duration),
+        max_duration = GREATEST(session_metrics.max_duration, EXCLUDED.max_duration),
+        interval_count = session_metrics.interval_count + EXCLUDED.interval_count,
+        sum_interval = session_metrics.sum_interval + EXCLUDED.sum_interval,
+        sumsq_interval = session_metrics.sumsq_interval + EXCLUDED.sumsq_interval,
+        min_interval = LEAST(session_metrics.min_interval, EXCLUDED.min_interval),
+        max_interval = GREATEST(session_metrics.max_interval, EXCLUDED.max_interval),
+        updated_at = now()
+    """
+
+
+# Derived metrics for the sessions selected by {sessions}, computed from the running sums.
+# Sessions without any blink still get a row (total_blinks = 0).
+_FINALIZE = """
+    WITH base AS (
+        SELECT
+            s.session_id,
+            COALESCE(m.total_blinks, 0) AS n,
+            COALESCE(m.sum_duration, 0) AS sd,
+            COALESCE(m.sumsq_duration, 0) AS sqd,
+            COALESCE(m.interval_count, 0) AS ni,
+            COALESCE(m.sum_interval, 0) AS si,
+            COALESCE(m.sumsq_interval, 0) AS sqi,
+            EXTRACT(EPOCH FROM (s.end_time - s.start_time)) / 60 AS session_minutes
+        FROM operation.sessions s
+        LEFT JOIN operation.session_metrics m ON m.session_id = s.session_id
+        WHERE s.session_id IN ({sessions})
+    ), derived AS (
+        SELECT
+            session_id, n, session_minutes,
+            sd / NULLIF(n, 0) AS avg_duration,
+            CASE WHEN n > 1 THEN GREATEST(0, (sqd - sd * sd / n) / (n - 1)) ELSE 0 END AS duration_variance,
+            si / NULLIF(ni, 0) AS avg_interval,
+            CASE WHEN ni > 1 THEN GREATEST(0, (sqi - si * si / ni) / (ni - 1)) ELSE 0 END AS interval_variance
+        FROM base
+    )
+    INSERT INTO operation.session_metrics AS m
+        (session_id, total_blinks, avg_duration, duration_variance, avg_interval, interval_variance,
+         session_minutes, blink_rate, fatigue_score, finalized_at)
+    SELECT
+        session_id, n, avg_duration, duration_variance, avg_interval, interval_variance,
+        session_minutes,
+        n / NULLIF(session_minutes, 0),
+        -- Higher variance in both durations and intervals indicates fatigue; clamped to 0-100
+        GREATEST(0, LEAST(100, 100 - (interval_variance * 20 + duration_variance * 50))),
+        now()
+    FROM derived
+    ON CONFLICT (session_id)
+    DO UPDATE SET
+        avg_duration = EXCLUDED.avg_duration,
+        duration_variance = EXCLUDED.duration_variance,
+        avg_interval = EXCLUDED.avg_interval,
+        interval_variance = EXCLUDED.interval_variance,
+        session_minutes = EXCLUDED.session_minutes,
+        blink_rate = EXCLUDED.blink_rate,
+        fatigue_score = EXCLUDED.fatigue_score,
+        finalized_at = EXCLUDED.finalized_at
+    """
+
+# Finalize the sessions in %(session_ids)s (session consumer, on completion)
+FINALIZE_SQL = _FINALIZE.replace('{sessions}', 'SELECT unnest(%(session_ids)s::bigint[])')
+
+
+# Batch writer `insert` statement for operation.blink_events: moves the staged blinks
+# ({source}) into blink_events and adds only the rows actually inserted to the running
+# sums, so replaying already-stored blinks leaves session_metrics unchanged.
+INSERT_BLINKS_SQL = """
+    WITH inserted AS (
+        INSERT INTO operation.blink_events ({columns})
+        SELECT {columns} FROM {source}
+        ON CONFLICT (session_id, start_time) DO NOTHING
+        RETURNING session_id, start_time, duration, interval
+    ), sums AS (
+        INSERT INTO operation.session_metrics
+            (session_id, total_blinks, sum_duration, sumsq_duration, min_duration, max_duration,
+             interval_count, sum_interval, sumsq_interval, min_interval, max_interval)
+        SELECT
+            session_id,
+            COUNT(*),
+            SUM(duration), SUM(duration * duration), MIN(duration), MAX(duration),
+            COUNT(interval),
+            COALESCE(SUM(interval), 0), COALESCE(SUM(interval * interval), 0), MIN(interval), MAX(interval)
+        FROM inserted
+        WHERE duration IS NOT NULL
+        GROUP BY session_id
+        ORDER BY session_id  -- consistent row lock order across concurrent flushes
+        """ + DELTA_CONFLICT + """
+        RETURNING session_id, rolled_up
+    ), late AS (
+        -- Blinks of sessions already added to the user rollups
+        SELECT
+            s.user_id, date_trunc('hour', i.start_time) AS hour,
+            1 AS n, i.duration AS sd, i.duration * i.duration AS sqd,
+            (i.interval IS NOT NULL)::int AS ni, COALESCE(i.interval, 0) AS si, COALESCE(i.interval * i.interval, 0) AS sqi,
+            0 AS scored, 0 AS fatigue
+        FROM inserted i
+        JOIN sums m ON m.session_id = i.session_id AND m.rolled_up
+        JOIN operation.sessions s ON s.session_id = i.session_id
+        WHERE s.user_id IS NOT NULL AND i.duration IS NOT NULL
+    )
+    """ + APPLY_LATE_SQL + """;
+    WITH previous AS (
+        -- Late blinks of already finalized sessions: derive the metrics again
+        SELECT m.session_id, m.fatigue_score FROM operation.session_metrics m
+        WHERE m.finalized_at IS NOT NULL AND m.session_id IN (SELECT DISTINCT session_id FROM {source})
+    ), finalized AS (
+    """ + _FINALIZE.replace('{sessions}', 'SELECT session_id FROM previous') + """
+        RETURNING m.session_id, m.fatigue_score, m.rolled_up
+    ), late AS (
+        -- Change of a rolled-up session's fatigue score, split over the hours it spans like
+        -- user_rollups.ROLLUP_SQL does
+        SELECT
+            s.user_id, h AS hour, 0 AS n, 0 AS sd, 0 AS sqd, 0 AS ni, 0 AS si, 0 AS sqi,
+            minutes * ((f.fatigue_score IS NOT NULL)::int - (p.fatigue_score IS NOT NULL)::int) AS scored,
+            minutes * (COALESCE(f.fatigue_score, 0) - COALESCE(p.fatigue_score, 0)) AS fatigue
+        FROM finalized f
+        JOIN previous p ON p.session_id = f.session_id
+        JOIN operation.sessions s ON s.session_id = f.session_id
+        CROSS JOIN LATERAL generate_series(date_trunc('hour', s.start_time), s.end_time, INTERVAL '1 hour') AS h
+        CROSS JOIN LATERAL (
+            SELECT EXTRACT(EPOCH FROM LEAST(s.end_time, h + INTERVAL '1 hour') - GREATEST(s.start_time, h)) / 60 AS minutes
+        ) span
+        WHERE f.rolled_up AND f.fatigue_score IS DISTINCT FROM p.fatigue_score
+        AND s.user_id IS NOT NULL AND s.start_time IS NOT NULL AND s.end_time IS NOT NULL
+        AND (h < s.end_time OR h = date_trunc('hour', s.start_time))
+    )
+    """ + APPLY_LATE_SQL
+
+
+# Rebuild the running sums from operation.blink_events (replaces existing sums).
+# %(session_ids)s = NULL rebuilds every session.
+BACKFILL_SQL = """
+    INSERT INTO operation.session_metrics
+        (session_id, total_blinks, sum_duration, sumsq_duration, min_duration, max_duration,
+         interval_count, sum_interval, sumsq_interval, min_interval, max_interval, updated_at)
+    SELECT
+        session_id,
+        COUNT(*),
+        SUM(duration), SUM(duration * duration), MIN(duration), MAX(duration),
+        COUNT(interval),
+        COALESCE(SUM(interval), 0), COALESCE(SUM(interval * interval), 0), MIN(interval), MAX(interval),
+        now()
+    FROM operation.blink_events
+    WHERE duration IS NOT NULL
+    AND (%(session_ids)s::bigint[] IS NULL OR session_id = ANY(%(session_ids)s::bigint[]))
+    GROUP BY session_id
+    ON CONFLICT (session_id)
+    DO UPDATE SET
+        total_blinks = EXCLUDED.total_blinks,
+        sum_duration = EXCLUDED.sum_duration,
+        sumsq_duration = EXCLUDED.sumsq_duration,
+        min_duration = EXCLUDED.min_duration,
+        max_duration = EXCLUDED.max_duration,
+        interval_count = EXCLUDED.interval_count,
+        sum_interval = EXCLUDED.sum_interval,
+        sumsq_interval = EXCLUDED.sumsq_interval,
+        min_interval = EXCLUDED.min_interval,
+        max_interval = EXCLUDED.max_interval,
+        updated_at = EXCLUDED.updated_at
+    """
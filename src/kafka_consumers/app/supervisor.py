@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from aiokafka import AIOKafkaConsumer
+from main import CONSUMER_TYPES, load_config, run_consumer
+
+logger = logging.getLogger(__name__)
+
+
+def parse_replicas(spec):
+    """
+    Parse a CONSUMER_REPLICAS spec such as "frame=3,blink=auto,session=1".
+    'auto' means one replica per partition of the consumer's topic.
+    Types left out of the spec are not started.
+    """
+    replicas = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        consumer_type, _, count = item.partition('=')
+        consumer_type = consumer_type.strip()
+        if consumer_type not in CONSUMER_TYPES:
+            raise ValueError(f"Unknown consumer type in CONSUMER_REPLICAS: {consumer_type}")
+        count = count.strip() or '1'
+        replicas[consumer_type] = count if count == 'auto' else int(count)
+    return replicas
+
+
+async def _topic_partitions(config, topic):
+    """Look up the partition count of a topic from the broker metadata"""
+    consumer = AIOKafkaConsumer(bootstrap_servers=f"{config['kafka_server']}:{config['kafka_port']}")
+    await consumer.start()
+    try:
+        await consumer.topics()  # refreshes the cluster metadata
+        partitions = consumer.partitions_for_topic(topic)
+        return len(partitions) if partitions else 1
+    finally:
+        await consumer.stop()
+
+
+def _worker(consumer_type, metrics_port=None):
+    # Runs in a child process: one consumer, one SSH tunnel and one database pool per process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor handles Ctrl+C
+
+    async def _run():
+        # SIGTERM cancels the consumer so its stop() flushes pending rows before exit
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        await run_consumer(consumer_type, metrics_port)
+
+    try:
+        asyncio.run(_run())
+    except asyncio.CancelledError:
+        pass
+
+
+class ConsumerSupervisor:
+    """
+    Runs consumer replicas in child processes and restarts them when they exit.
+    A worker that crashes repeatedly is restarted with exponential backoff; the
+    backoff resets once a worker has stayed up for `stable_after` seconds.
+    """
+    def __init__(self, replicas, max_backoff=60.0, stable_after=60.0, metrics_port=0):
+        self.replicas = replicas    # consumer type -> number of processes
+        self.metrics_port = metrics_port  # first worker's /metrics port, the others count up (0 = disabled)
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.ctx = multiprocessing.get_context('spawn')
+        self.workers = {}           # (consumer type, replica) -> worker state
+        self.running = False
+
+    def _spawn(self, key):
+        consumer_type, replica = key
+        state = self.workers.setdefault(key, {'failures': 0})
+        if 'metrics_port' not in state:
+            # A restarted worker keeps its port so scrape targets stay stable
+            state['metrics_port'] = self.metrics_port + len(self.workers) - 1 if self.metrics_port else 0
+        process = self.ctx.Process(
+            target=_worker, args=(consumer_type, state['metrics_port']),
+            name=f"{consumer_type}-consumer-{replica}", daemon=False
+        )
+        process.start()
+        state.update({'process': process, 'started': time.monotonic(), 'restart_at': None})
+        logger.info(f"Started {process.name} (pid {process.pid})")
+
+    def start(self):
+        self.running = True
+        for consumer_type, count in self.replicas.items():
+            for replica in range(count):
+                self._spawn((consumer_type, replica))
+
+    def poll(self):
+        """Restart workers that have exited; called periodically from run()"""
+        now = time.monotonic()
+        for key, state in self.workers.items():
+            process = state['process']
+            if state['restart_at'] is not None:
+                if now >= state['restart_at']:
+                    self._spawn(key)
+                continue
+            if process.is_alive():
+                continue
+
+            uptime = now - state['started']
+            state['failures'] = 1 if uptime >= self.stable_after else state['failures'] + 1
+            delay = min(self.max_backoff, 2 ** (state['failures'] - 1))
+            state['restart_at'] = now + delay
+            logger.warning(
+                f"{process.name} exited with code {process.exitcode} after {uptime:.0f}s, "
+                f"restarting in {delay:.0f}s"
+            )
+
+    def stop(self, timeout=10.0):
+        self.running = False
+        for state in self.workers.values():
+            if state['process'].is_alive():
+                state['process'].terminate()
+        for state in self.workers.values():
+            state['process'].join(timeout)
+            if state['process'].is_alive():
+                state['process'].kill()
+        logger.info("All consumer workers stopped")
+
+    def run(self, poll_interval=1.0):
+        self.start()
+        try:
+            while self.running:
+                self.poll()
+                time.sleep(poll_interval)
+        finally:
+            self.stop()
+
+
+def run_supervisor():
+    config = load_config()
+    replicas = parse_replicas(os.environ.get('CONSUMER_REPLICAS', 'frame=1,blink=1,session=1'))
+    for consumer_type, count in replicas.items():
+        if count == 'auto':
+            topic = CONSUMER_TYPES[consumer_type][1]
+            replicas[consumer_type] = asyncio.run(_topic_partitions(config, topic))
+    logger.info(f"Supervising consumers: {replicas}")
+
+    supervisor = ConsumerSupervisor(replicas, metrics_port=config['metrics_port'])
+
+    def _shutdown(signum, frame):
+        supervisor.running = False
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    supervisor.run()
+
+
+if __name__ == "__main__":
+    run_supervisor()
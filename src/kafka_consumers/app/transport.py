@@ -0,0 +1,19 @@
+"""
+Message transport used by the consumers (and injectable into the app's KafkaService).
+A transport only needs two factories mirroring the aiokafka constructors:
+    producer(**kwargs) -> object with start(), stop(), send(topic, value, key)
+    consumer(*topics, **kwargs) -> object with the AIOKafkaConsumer methods BaseKafkaConsumer uses
+KafkaTransport builds real aiokafka clients; memory_broker.MemoryBroker keeps everything in process.
+"""
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+
+
+class KafkaTransport:
+    def __init__(self, bootstrap_servers):
+        self.bootstrap_servers = bootstrap_servers
+
+    def producer(self, **kwargs):
+        return AIOKafkaProducer(bootstrap_servers=self.bootstrap_servers, **kwargs)
+
+    def consumer(self, *topics, **kwargs):
+        return AIOKafkaConsumer(*topics, bootstrap_servers=self.bootstrap_servers, **kwargs)
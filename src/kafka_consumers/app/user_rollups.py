@@ -0,0 +1,137 @@
+"""
+Per-user hourly and daily fatigue rollups (operation.user_fatigue_hourly / _daily).
+
+Finalized sessions are added to the rollups exactly once: ROLLUP_SQL claims pending sessions
+by setting session_metrics.rolled_up and, in the same statement, adds their blink sums and
+minutes to the buckets they overlap. Blinks go to the hour they started in; session minutes
+and the minute-weighted fatigue score are split over the hours the session spans. Buckets only
+hold sums, so averages, variances and rates are derived when reading (app/services/rollups.py).
+Blinks stored after their session was rolled up, and the change they make to its fatigue score,
+are added to the buckets by the blink consumer's insert (session_metrics.INSERT_BLINKS_SQL,
+through APPLY_LATE_SQL).
+"""
+
+# Additive upsert of both bucket tables, aliased `r`
+_ADD_HOURLY = """
+    ON CONFLICT (user_id, bucket_start) DO UPDATE SET"""
+_ADD_DAILY = """
+    ON CONFLICT (user_id, day) DO UPDATE SET"""
+_ADD_SUMS = """
+        sessions = r.sessions + EXCLUDED.sessions,
+        session_minutes = r.session_minutes + EXCLUDED.session_minutes,
+        total_blinks = r.total_blinks + EXCLUDED.total_blinks,
+        sum_duration = r.sum_duration + EXCLUDED.sum_duration,
+        sumsq_duration = r.sumsq_duration + EXCLUDED.sumsq_duration,
+        interval_count = r.interval_count + EXCLUDED.interval_count,
+        sum_interval = r.sum_interval + EXCLUDED.sum_interval,
+        sumsq_interval = r.sumsq_interval + EXCLUDED.sumsq_interval,
+        scored_minutes = r.scored_minutes + EXCLUDED.scored_minutes,
+        fatigue_minutes = r.fatigue_minutes + EXCLUDED.fatigue_minutes,
+        updated_at = now()
+    """
+
+# Roll up at most %(limit)s sessions finalized at least %(settle_seconds)s seconds ago
+# (blinks of a completed session may still be in flight). SKIP LOCKED lets several
+# session consumers run it concurrently.
+ROLLUP_SQL = """
+    WITH claimed AS (
+        UPDATE operation.session_metrics m
+        SET rolled_up = true
+        WHERE m.session_id IN (
+            SELECT session_id FROM operation.session_metrics
+            WHERE NOT rolled_up
+            AND finalized_at <= now() - make_interval(secs => %(settle_seconds)s)
+            ORDER BY finalized_at
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING m.session_id, m.fatigue_score
+    ), spans AS (
+        -- Minutes of every claimed session in each hour it overlaps
+        SELECT
+            s.user_id, c.session_id, c.fatigue_score, h AS hour,
+            EXTRACT(EPOCH FROM LEAST(s.end_time, h + INTERVAL '1 hour') - GREATEST(s.start_time, h)) / 60 AS minutes
+        FROM claimed c
+        JOIN operation.sessions s ON s.session_id = c.session_id
+        CROSS JOIN LATERAL generate_series(date_trunc('hour', s.start_time), s.end_time, INTERVAL '1 hour') AS h
+        WHERE s.user_id IS NOT NULL AND s.start_time IS NOT NULL AND s.end_time IS NOT NULL
+        AND (h < s.end_time OR h = date_trunc('hour', s.start_time))  -- no empty hour at an exact end
+    ), blinks AS (
+        SELECT
+            s.user_id, b.session_id, date_trunc('hour', b.start_time) AS hour,
+            COUNT(*) AS n,
+            SUM(b.duration) AS sd, SUM(b.duration * b.duration) AS sqd,
+            COUNT(b.interval) AS ni,
+            COALESCE(SUM(b.interval), 0) AS si, COALESCE(SUM(b.interval * b.interval), 0) AS sqi
+        FROM claimed c
+        JOIN operation.sessions s ON s.session_id = c.session_id
+        JOIN operation.blink_events b ON b.session_id = c.session_id
+        WHERE s.user_id IS NOT NULL AND b.duration IS NOT NULL
+        GROUP BY s.user_id, b.session_id, date_trunc('hour', b.start_time)
+    ), per_hour AS (
+        -- One row per session and hour
+        SELECT
+            COALESCE(sp.user_id, bl.user_id) AS user_id,
+            COALESCE(sp.session_id, bl.session_id) AS session_id,
+            COALESCE(sp.hour, bl.hour) AS hour,
+            COALESCE(sp.minutes, 0) AS minutes,
+            sp.fatigue_score,
+            COALESCE(bl.n, 0) AS n, COALESCE(bl.sd, 0) AS sd, COALESCE(bl.sqd, 0) AS sqd,
+            COALESCE(bl.ni, 0) AS ni, COALESCE(bl.si, 0) AS si, COALESCE(bl.sqi, 0) AS sqi
+        FROM spans sp
+        FULL JOIN blinks bl ON bl.session_id = sp.session_id AND bl.hour = sp.hour
+    ), hourly AS (
+        INSERT INTO operation.user_fatigue_hourly AS r
+            (user_id, bucket_start, sessions, session_minutes, total_blinks, sum_duration, sumsq_duration,
+             interval_count, sum_interval, sumsq_interval, scored_minutes, fatigue_minutes)
+        SELECT
+            user_id, hour, COUNT(DISTINCT session_id), SUM(minutes), SUM(n), SUM(sd), SUM(sqd),
+            SUM(ni), SUM(si), SUM(sqi),
+            COALESCE(SUM(minutes) FILTER (WHERE fatigue_score IS NOT NULL), 0),
+            COALESCE(SUM(minutes * fatigue_score), 0)
+        FROM per_hour
+        GROUP BY user_id, hour
+        ORDER BY user_id, hour  -- consistent row lock order across concurrent runs
+        """ + _ADD_HOURLY + _ADD_SUMS + """
+    )
+    INSERT INTO operation.user_fatigue_daily AS r
+        (user_id, day, sessions, session_minutes, total_blinks, sum_duration, sumsq_duration,
+         interval_count, sum_interval, sumsq_interval, scored_minutes, fatigue_minutes)
+    SELECT
+        user_id, hour::date, COUNT(DISTINCT session_id), SUM(minutes), SUM(n), SUM(sd), SUM(sqd),
+        SUM(ni), SUM(si), SUM(sqi),
+        COALESCE(SUM(minutes) FILTER (WHERE fatigue_score IS NOT NULL), 0),
+        COALESCE(SUM(minutes * fatigue_score), 0)
+    FROM per_hour
+    GROUP BY user_id, hour::date
+    ORDER BY user_id, hour::date
+    """ + _ADD_DAILY + _ADD_SUMS
+
+# Tail of a statement whose CTE `late` holds changes to already rolled-up sessions, one row
+# per user and hour: (user_id, hour, n, sd, sqd, ni, si, sqi, scored, fatigue). Adds them to
+# both rollups; session counts and minutes are unchanged.
+APPLY_LATE_SQL = """
+    , late_hourly AS (
+        INSERT INTO operation.user_fatigue_hourly AS r
+            (user_id, bucket_start, total_blinks, sum_duration, sumsq_duration,
+             interval_count, sum_interval, sumsq_interval, scored_minutes, fatigue_minutes)
+        SELECT user_id, hour, SUM(n), SUM(sd), SUM(sqd), SUM(ni), SUM(si), SUM(sqi), SUM(scored), SUM(fatigue)
+        FROM late
+        GROUP BY user_id, hour
+        ORDER BY user_id, hour
+        """ + _ADD_HOURLY + _ADD_SUMS + """
+    )
+    INSERT INTO operation.user_fatigue_daily AS r
+        (user_id, day, total_blinks, sum_duration, sumsq_duration,
+         interval_count, sum_interval, sumsq_interval, scored_minutes, fatigue_minutes)
+    SELECT user_id, hour::date, SUM(n), SUM(sd), SUM(sqd), SUM(ni), SUM(si), SUM(sqi), SUM(scored), SUM(fatigue)
+    FROM late
+    GROUP BY user_id, hour::date
+    ORDER BY user_id, hour::date
+    """ + _ADD_DAILY + _ADD_SUMS
+
+# Start over: empty the rollups and mark every session pending again
+RESET_SQL = """
+    TRUNCATE operation.user_fatigue_hourly, operation.user_fatigue_daily;
+    UPDATE operation.session_metrics SET rolled_up = false WHERE rolled_up;
+    """
@@ -0,0 +1,15 @@
+-- Rolling fatigue metrics emitted by the blink consumer (fatigue_analytics.py)
+CREATE TABLE IF NOT EXISTS operation.blink_window_metrics (
+    session_id      BIGINT           NOT NULL,
+    window_seconds  INTEGER          NOT NULL,
+    window_end      TIMESTAMP        NOT NULL,
+    blink_count     INTEGER          NOT NULL,
+    blink_rate      DOUBLE PRECISION NOT NULL,  -- blinks per minute
+    mean_duration   DOUBLE PRECISION,
+    var_duration    DOUBLE PRECISION,
+    mean_interval   DOUBLE PRECISION,
+    var_interval    DOUBLE PRECISION
+);
+
+CREATE INDEX IF NOT EXISTS blink_window_metrics_session_idx
+    ON operation.blink_window_metrics (session_id, window_seconds, window_end);
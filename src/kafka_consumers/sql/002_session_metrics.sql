@@ -0,0 +1,27 @@
+-- Per-session metrics maintained incrementally (session_metrics.py)
+CREATE TABLE IF NOT EXISTS operation.session_metrics (
+    session_id BIGINT PRIMARY KEY
+);
+
+ALTER TABLE operation.session_metrics
+    -- running sums, updated by the blink consumer
+    ADD COLUMN IF NOT EXISTS total_blinks      INTEGER          NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS sum_duration      DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS sumsq_duration    DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS min_duration      DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS max_duration      DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS interval_count    INTEGER          NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS sum_interval      DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS sumsq_interval    DOUBLE PRECISION NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS min_interval      DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS max_interval      DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS updated_at        TIMESTAMPTZ      NOT NULL DEFAULT now(),
+    -- derived on session completion by the session consumer
+    ADD COLUMN IF NOT EXISTS avg_duration      DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS duration_variance DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS avg_interval      DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS interval_variance DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS session_minutes   DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS blink_rate        DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS fatigue_score     DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS finalized_at      TIMESTAMPTZ;
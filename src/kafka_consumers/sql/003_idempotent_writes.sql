@@ -0,0 +1,30 @@
+-- Natural keys for the consumer tables, so replayed Kafka records are skipped
+-- (INSERT ... ON CONFLICT DO NOTHING) instead of stored twice.
+
+-- Drop duplicates left by earlier replays, keeping one physical row per key
+DELETE FROM operation.raw_frame_data a
+    USING operation.raw_frame_data b
+    WHERE a.session_id = b.session_id AND a.timestamp = b.timestamp AND a.ctid > b.ctid;
+
+DELETE FROM operation.blink_events a
+    USING operation.blink_events b
+    WHERE a.session_id = b.session_id AND a.start_time = b.start_time AND a.ctid > b.ctid;
+
+DELETE FROM operation.blink_window_metrics a
+    USING operation.blink_window_metrics b
+    WHERE a.session_id = b.session_id AND a.window_seconds = b.window_seconds
+    AND a.window_end = b.window_end AND a.ctid > b.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS raw_frame_data_session_timestamp_key
+    ON operation.raw_frame_data (session_id, timestamp);
+
+CREATE UNIQUE INDEX IF NOT EXISTS blink_events_session_start_key
+    ON operation.blink_events (session_id, start_time);
+
+-- Replaces the non-unique index from 001_blink_window_metrics.sql
+CREATE UNIQUE INDEX IF NOT EXISTS blink_window_metrics_session_key
+    ON operation.blink_window_metrics (session_id, window_seconds, window_end);
+DROP INDEX IF EXISTS operation.blink_window_metrics_session_idx;
+
+-- Sums that already counted duplicated blinks are rebuilt from the deduplicated table
+-- by running backfill_session_metrics.py (no arguments) once after this script.
@@ -0,0 +1,14 @@
+-- Compressed frame storage written by the frame consumer with FRAME_STORAGE=chunks|both
+-- (frame_chunks.py): one row per session and grid-aligned chunk instead of one row per frame.
+CREATE TABLE IF NOT EXISTS operation.frame_chunks (
+    session_id   BIGINT    NOT NULL,
+    chunk_start  TIMESTAMP NOT NULL,  -- start of the chunk's grid cell
+    first_ts     TIMESTAMP NOT NULL,
+    last_ts      TIMESTAMP NOT NULL,
+    frame_count  INTEGER   NOT NULL,
+    data         BYTEA     NOT NULL,  -- delta-encoded timestamps + float16/float32 EAR, zlib
+    PRIMARY KEY (session_id, chunk_start, first_ts)
+);
+
+-- The payload is already compressed
+ALTER TABLE operation.frame_chunks ALTER COLUMN data SET STORAGE EXTERNAL;
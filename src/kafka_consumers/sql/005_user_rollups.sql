@@ -0,0 +1,47 @@
+-- Per-user fatigue rollups maintained by the session consumer (user_rollups.py).
+-- Buckets hold sums only; means, variances, rates and the fatigue score are derived on read.
+ALTER TABLE operation.session_metrics
+    ADD COLUMN IF NOT EXISTS rolled_up BOOLEAN NOT NULL DEFAULT false;
+
+-- Finalized sessions not yet added to the rollups
+CREATE INDEX IF NOT EXISTS session_metrics_rollup_pending_idx
+    ON operation.session_metrics (finalized_at)
+    WHERE NOT rolled_up;
+
+CREATE TABLE IF NOT EXISTS operation.user_fatigue_hourly (
+    user_id          INTEGER          NOT NULL,
+    bucket_start     TIMESTAMP        NOT NULL,  -- start of the hour
+    sessions         INTEGER          NOT NULL DEFAULT 0,  -- sessions overlapping the hour
+    session_minutes  DOUBLE PRECISION NOT NULL DEFAULT 0,
+    total_blinks     INTEGER          NOT NULL DEFAULT 0,
+    sum_duration     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sumsq_duration   DOUBLE PRECISION NOT NULL DEFAULT 0,
+    interval_count   INTEGER          NOT NULL DEFAULT 0,
+    sum_interval     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sumsq_interval   DOUBLE PRECISION NOT NULL DEFAULT 0,
+    scored_minutes   DOUBLE PRECISION NOT NULL DEFAULT 0,  -- minutes of sessions with a fatigue score
+    fatigue_minutes  DOUBLE PRECISION NOT NULL DEFAULT 0,  -- sum of fatigue_score * minutes
+    updated_at       TIMESTAMPTZ      NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, bucket_start)
+);
+
+CREATE TABLE IF NOT EXISTS operation.user_fatigue_daily (
+    user_id          INTEGER          NOT NULL,
+    day              DATE             NOT NULL,
+    sessions         INTEGER          NOT NULL DEFAULT 0,
+    session_minutes  DOUBLE PRECISION NOT NULL DEFAULT 0,
+    total_blinks     INTEGER          NOT NULL DEFAULT 0,
+    sum_duration     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sumsq_duration   DOUBLE PRECISION NOT NULL DEFAULT 0,
+    interval_count   INTEGER          NOT NULL DEFAULT 0,
+    sum_interval     DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sumsq_interval   DOUBLE PRECISION NOT NULL DEFAULT 0,
+    scored_minutes   DOUBLE PRECISION NOT NULL DEFAULT 0,
+    fatigue_minutes  DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at       TIMESTAMPTZ      NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, day)
+);
+
+-- Sessions finalized before this script are rolled up by the session consumer's periodic
+-- task like new ones (ROLLUP_BATCH_SIZE per ROLLUP_INTERVAL), or at once by running
+-- backfill_session_metrics.py without arguments.
@@ -0,0 +1,55 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("aiokafka")
+pytest.importorskip("sshtunnel")
+pytest.importorskip("psycopg2")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "kafka_consumers" / "app"))
+from base_consumer import BaseKafkaConsumer  # noqa: E402
+from memory_broker import MemoryBroker, TopicPartition  # noqa: E402
+
+
+class FakeWriter:
+    def __init__(self):
+        self.flushes = 0
+
+    async def flush(self):
+        self.flushes += 1
+
+    def report(self):
+        pass
+
+
+class RecordingConsumer(BaseKafkaConsumer):
+    async def process_message(self, message):
+        pass
+
+
+def test_offsets_are_committed_while_idle():
+    broker = MemoryBroker(partitions=1)
+    consumer = RecordingConsumer(
+        'localhost', 9092, 'frames', 'group', db_config={},
+        batch_config={'commit_interval': 0.05}, transport=broker
+    )
+
+    async def scenario():
+        consumer.consumer = broker.consumer('frames', group_id='group', auto_offset_reset='earliest',
+                                            enable_auto_commit=False)
+        await consumer.consumer.start()
+        consumer.writer = FakeWriter()
+        # First commit is due before the messages arrive; nothing follows them
+        task = asyncio.create_task(consumer._process_messages())
+        await asyncio.sleep(0.08)
+        for i in range(3):
+            await broker.append('frames', None, b'%d' % i)
+        await asyncio.sleep(0.2)
+        committed = await consumer.consumer.committed(TopicPartition('frames', 0))
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return committed
+
+    assert asyncio.run(scenario()) == 3
@@ -0,0 +1,78 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "kafka_consumers" / "app"))
+from batch_writer import BatchWriter  # noqa: E402
+
+BAD = "bad"
+
+
+class FakeDatabase:
+    """Commits a batch unless one of its rows holds BAD; can fail the next calls with a lost connection"""
+    def __init__(self, connection_failures=0):
+        self.rows = []
+        self.calls = 0
+        self.connection_failures = connection_failures
+
+    async def run(self, fn, batch):
+        self.calls += 1
+        if self.connection_failures:
+            self.connection_failures -= 1
+            raise psycopg2.OperationalError("server closed the connection")
+        if any(BAD in row for rows in batch.values() for row in rows):
+            raise psycopg2.DataError("invalid input syntax")
+        for rows in batch.values():
+            self.rows.extend(rows)
+
+
+def _writer(db):
+    writer = BatchWriter(db, max_rows=1000)
+    writer.register('operation.raw_frame_data', ('session_id', 'timestamp', 'ear'))
+    return writer
+
+
+async def _add(writer, rows):
+    for row in rows:
+        await writer.add('operation.raw_frame_data', row)
+
+
+def test_rejected_rows_are_isolated_and_dropped():
+    db = FakeDatabase()
+    writer = _writer(db)
+    rows = [(1, float(i), 0.3) for i in range(20)]
+    rows[5] = (1, 5.0, BAD)
+    rows[13] = (1, 13.0, BAD)
+
+    async def scenario():
+        await _add(writer, rows)
+        await writer.flush()
+        # Later writes are not held back by the dropped rows
+        await _add(writer, [(1, 20.0, 0.3)])
+        await writer.flush()
+
+    asyncio.run(scenario())
+    assert db.rows == [row for row in rows if BAD not in row] + [(1, 20.0, 0.3)]
+    assert writer.pending == 0
+    assert writer.stats['rejected'] == 2
+
+
+def test_lost_connection_keeps_the_batch():
+    db = FakeDatabase(connection_failures=1)
+    writer = _writer(db)
+    rows = [(1, float(i), 0.3) for i in range(5)]
+
+    async def scenario():
+        await _add(writer, rows)
+        with pytest.raises(psycopg2.OperationalError):
+            await writer.flush()
+        assert writer.pending == len(rows)
+        await writer.flush()
+
+    asyncio.run(scenario())
+    assert db.rows == rows
+    assert writer.stats['rejected'] == 0
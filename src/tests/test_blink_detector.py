@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("mediapipe")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app" / "static" / "python" / "client"))
+from blink_detector import BlinkDetector  # noqa: E402
+
+OPEN, CLOSED = 0.35, 0.20
+
+
+def _count_blinks(ears, lean):
+    """Feed one EAR per frame in place of the face mesh inference"""
+    detector = BlinkDetector(lean=lean, encode=False)
+    for ear in ears:
+        detector._detect_ear = lambda frame, ear=ear: ear
+        detector.process_frame(None)
+    return detector.total_blinks
+
+
+@pytest.mark.parametrize("lead", range(6, 12))
+def test_lean_mode_counts_minimum_length_blinks(lead):
+    # Blinks of exactly MIN_CONSECUTIVE_FRAMES closed frames; the varying lead-in puts the
+    # first closed frame on both skipped and inferred frames
+    ears = ([OPEN] * lead + [CLOSED] * 4 + [OPEN] * 10) * 5
+    assert _count_blinks(ears, lean=False) == 5
+    assert _count_blinks(ears, lean=True) == 5
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.services.codec import StructCodec, decode_value  # noqa: E402
+
+codec = StructCodec()
+
+
+def test_frame_round_trip():
+    frame = {"session_id": 7, "timestamp": 1700000000.25, "ear_value": 0.3125}
+    data = codec.encode(frame)
+    assert len(data) == 26
+    assert decode_value(data) == frame
+
+
+def test_frame_without_face_is_packed():
+    frame = {"session_id": 7, "timestamp": 1700000000.25, "ear_value": None}
+    data = codec.encode(frame)
+    assert len(data) == 26
+    assert decode_value(data) == frame
+
+
+@pytest.mark.parametrize("value", [
+    {"session_id": 7, "timestamp": None, "ear_value": 0.3},
+    {"session_id": None, "timestamp": 1700000000.0, "ear_value": 0.3},
+    {"session_id": 7, "timestamp": 1700000000.0, "ear_value": "0.3"},
+    {"session_id": 7, "start_timestamp": 1700000000.0, "end_timestamp": None},
+])
+def test_invalid_record_falls_back_to_json(value):
+    data = codec.encode(value)
+    assert data[:1] == b"{"
+    assert decode_value(data) == value
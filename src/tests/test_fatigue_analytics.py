@@ -0,0 +1,54 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "kafka_consumers" / "app"))
+import fatigue_analytics  # noqa: E402
+from fatigue_analytics import FatigueAnalytics  # noqa: E402
+
+
+class FakeMonotonic:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _blinks(analytics, session_id, start, count, every=3.0):
+    for i in range(count):
+        end = start + i * every
+        analytics.add_blink(session_id, datetime.fromtimestamp(end), 0.2, every - 0.2 if i else None)
+
+
+def test_skewed_client_clocks_do_not_move_other_sessions(monkeypatch):
+    clock = FakeMonotonic()
+    monkeypatch.setattr(fatigue_analytics.time, "monotonic", clock)
+    analytics = FatigueAnalytics(windows=(60,), emit_interval=10)
+    base = 1_700_000_000.0
+    _blinks(analytics, 1, base, 3)
+    _blinks(analytics, 2, base + 3600, 3)  # client clock an hour ahead
+
+    # Neither session is due yet on its own clock
+    clock.now += 2
+    assert analytics.tick() == []
+
+    clock.now += 10
+    rows = {row[0]: row for row in analytics.tick()}
+    assert set(rows) == {1, 2}
+    # Each session is emitted at its own time with its blinks still in the window
+    assert rows[1][2] == datetime.fromtimestamp(base + 6 + 12)
+    assert rows[2][2] == datetime.fromtimestamp(base + 3600 + 6 + 12)
+    assert rows[1][3] == rows[2][3] == 3
+
+
+def test_tick_emits_decaying_rate_without_new_blinks(monkeypatch):
+    clock = FakeMonotonic()
+    monkeypatch.setattr(fatigue_analytics.time, "monotonic", clock)
+    analytics = FatigueAnalytics(windows=(60,), emit_interval=10)
+    _blinks(analytics, 1, 1_700_000_000.0, 5)
+
+    clock.now += 70
+    rows = analytics.tick()
+    assert len(rows) == 1
+    assert rows[0][3] == 0  # all blinks left the 60 s window
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from app.services.live_metrics import LiveMetrics  # noqa: E402
+
+OPEN, CLOSED = 0.32, 0.20
+
+
+def _feed(metrics, ears, start=1000.0, fps=30.0):
+    for i, ear in enumerate(ears):
+        metrics.add_frame(start + i / fps, ear)
+
+
+def test_blinks_and_percentiles():
+    metrics = LiveMetrics(windows=(60,))
+    _feed(metrics, ([OPEN] * 20 + [CLOSED] * 5) * 4 + [OPEN] * 20)
+    message = metrics.snapshot()
+    window = message["windows"]["60"]
+    assert message["total_blinks"] == 4
+    assert window["blinks"] == 4
+    assert window["mean_closure_ms"] == round(5 / 30 * 1000, 1)
+    assert abs(window["ear_p10"] - CLOSED) < 0.0025
+    assert abs(window["ear_p90"] - OPEN) < 0.0025
+
+
+def test_non_numeric_fields_are_dropped():
+    metrics = LiveMetrics(windows=(60,))
+    metrics.add_frame(1000.0, OPEN)
+    metrics.add_frame("not a time", OPEN)
+    metrics.add_frame(1000.1, "abc")
+    metrics.add_frame(1000.2, [0.3])
+    metrics.add_frame("1000.3", "0.25")  # numeric strings are coerced
+    message = metrics.snapshot()
+    assert metrics.invalid_frames == 3
+    assert message["count"] == 2
+    assert message["timestamp"] == 1000.3
@@ -0,0 +1,71 @@
+"""
+Run the FastAPI app and the frame, blink and session consumers in one process,
+connected through the in-memory broker (kafka_consumers/app/memory_broker.py)
+instead of Kafka. Meant for single-node pilots and pipeline benchmarks; the
+database settings still apply (core/.env for the app, environment variables for
+the consumers as in kafka_consumers/app/main.py).
+
+Usage (from src/):
+    python tools/run_local.py [--port 8000] [--partitions 3] [--consumers frame,blink,session]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+import uvicorn
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR))
+sys.path.insert(0, str(SRC_DIR / "kafka_consumers" / "app"))
+
+from main import CONSUMER_TYPES, build_consumer, load_config  # noqa: E402
+from memory_broker import MemoryBroker  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+async def run(args):
+    broker = MemoryBroker(partitions=args.partitions, retention=args.retention)
+
+    config = load_config()
+    base_port = config['metrics_port']
+    consumers = []
+    for i, consumer_type in enumerate(args.consumers):
+        config['metrics_port'] = base_port + i if base_port else 0  # one /metrics listener per consumer
+        consumers.append(build_consumer(consumer_type, config, transport=broker))
+    tasks = [asyncio.create_task(consumer.start()) for consumer in consumers]
+    logger.info(f"Started {', '.join(args.consumers)} consumers on the in-memory broker")
+
+    from app.main import app
+    app.state.kafka_transport = broker
+    server = uvicorn.Server(uvicorn.Config(app, host=args.host, port=args.port, log_level=args.log_level))
+    try:
+        await server.serve()
+    finally:
+        # Cancelling runs each consumer's stop(), which flushes its pending rows
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--partitions", type=int, default=3, help="partitions per topic")
+    parser.add_argument("--retention", type=int, default=1_000_000, help="records kept per partition")
+    parser.add_argument("--consumers", default=','.join(CONSUMER_TYPES), help="consumer types to run")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    args.consumers = [c.strip() for c in args.consumers.split(',') if c.strip()]
+    unknown = [c for c in args.consumers if c not in CONSUMER_TYPES]
+    if unknown:
+        parser.error(f"Unknown consumer types: {', '.join(unknown)}")
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Score recorded webcam videos offline with BlinkDetector.
+
+Each video is split into frame ranges that are processed across a process pool
+(one FaceMesh per worker). The per-chunk EAR series are stitched back in order and
+blinks are detected over the whole series with the same rules as the live pipeline,
+so blinks spanning a chunk boundary are found once. One compressed .npz is written
+per video with `timestamps`, `ear` (NaN without a face), `blinks` (start, end, duration)
+and `fps`. Videos found in a directory keep their path relative to it under --output-dir;
+inputs that would write the same file are refused.
+
+Usage (from src/):
+    python tools/score_videos.py recordings/ other.mp4 --output-dir scores/ --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SRC_DIR / "app" / "static" / "python" / "client"))
+sys.path.insert(0, str(SRC_DIR / "kafka_consumers" / "app"))
+
+from blink_detector import BlinkDetector  # noqa: E402
+from blink_detection import detect_blinks  # noqa: E402
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.webm'}
+READ_BATCH = 32  # frames held in memory per process_batch call
+MAX_PLAUSIBLE_HOURS = 24  # longer reported lengths are treated as a bogus frame count
+
+_detector = None
+
+
+def _init_worker():
+    global _detector
+    _detector = BlinkDetector(annotate=False)
+
+
+def _score_chunk(task):
+    """Worker: EAR for frames [start, end) of one video"""
+    path, start, end = task
+    ears = np.full(end - start, np.nan, dtype=np.float32)
+    cap = _open_at(path, start)
+    try:
+        position = 0
+        while position < len(ears):
+            frames = []
+            while len(frames) < READ_BATCH and position + len(frames) < len(ears):
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                frames.append(frame)
+            if not frames:
+                break
+            ears[position:position + len(frames)] = _detector.process_batch(frames)
+            position += len(frames)
+    finally:
+        cap.release()
+    return path, start, ears
+
+
+def _open_at(path, start):
+    """
+    Capture positioned exactly on frame `start`. Seeking in inter-frame codecs lands on a
+    nearby keyframe, so the reported position is checked and the rest decoded forward;
+    after an overshoot the video is decoded from the beginning.
+    """
+    cap = cv2.VideoCapture(path)
+    if start <= 0:
+        return cap
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    position = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+    if not 0 <= position <= start:
+        cap.release()
+        cap = cv2.VideoCapture(path)
+        position = 0
+    while position < start and cap.grab():
+        position += 1
+    return cap
+
+
+def count_frames(path):
+    """Frame count by decoding the whole video, for containers that don't report it"""
+    cap = cv2.VideoCapture(str(path))
+    count = 0
+    try:
+        while cap.grab():
+            count += 1
+    finally:
+        cap.release()
+    return count
+
+
+def find_videos(paths):
+    """
+    Returns:
+        list of (video path, output name): the path relative to the input directory
+        it was found in, or the file name for videos given directly, with a .npz suffix
+    """
+    videos = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            videos.extend(
+                (p, p.relative_to(path).with_suffix('.npz'))
+                for p in sorted(path.rglob('*')) if p.suffix.lower() in VIDEO_EXTENSIONS
+            )
+        elif path.is_file():
+            videos.append((path, Path(path.name).with_suffix('.npz')))
+        else:
+            print(f"Skipping missing path: {path}", file=sys.stderr)
+    return videos
+
+
+def find_duplicates(videos):
+    """Output names claimed by more than one video, with the videos claiming them"""
+    claims = {}
+    for path, name in videos:
+        claims.setdefault(name, []).append(path)
+    return {name: paths for name, paths in claims.items() if len(paths) > 1}
+
+
+def probe(path):
+    """
+    Returns:
+        (frame_count, fps, seekable) or None when the video can't be opened. A missing or
+        implausible reported count (common for .webm) is replaced by counting decoded frames,
+        and such videos are marked not seekable so they are scored as a single chunk.
+    """
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if not cap.isOpened():
+            return None
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        cap.release()
+    if 0 < frame_count <= fps * 3600 * MAX_PLAUSIBLE_HOURS:
+        return frame_count, fps, True
+    return count_frames(path), fps, False
+
+
+def write_scores(path, name, ears, fps, output_dir, args):
+    timestamps = np.arange(len(ears), dtype=np.float64) / fps
+    blinks, _ = detect_blinks(timestamps, ears, threshold=args.threshold, min_frames=args.min_frames)
+    out = Path(output_dir) / name
+    out.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(out, timestamps=timestamps, ear=ears, blinks=blinks, fps=fps, source=str(path))
+    return out, len(blinks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs='+', help="video files or directories")
+    parser.add_argument("--output-dir", default=".", help="where to write the .npz files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-frames", type=int, default=900, help="frames per task (default: 30 s at 30 fps)")
+    parser.add_argument("--threshold", type=float, default=0.28, help="EAR threshold for a closed eye")
+    parser.add_argument("--min-frames", type=int, default=4, help="minimum closed frames for a blink")
+    args = parser.parse_args()
+
+    found = find_videos(args.paths)
+    duplicates = find_duplicates(found)
+    if duplicates:
+        for name, paths in duplicates.items():
+            print(f"{', '.join(map(str, paths))} would all be written to {name}", file=sys.stderr)
+        print("Refusing to overwrite scores; pass the videos in separate runs or --output-dir values", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    videos = {}  # path -> {'name', 'ears', 'fps', 'remaining'}
+    tasks = []
+    for path, name in found:
+        info = probe(path)
+        if info is None or info[0] <= 0:
+            print(f"Cannot read {path}, skipping", file=sys.stderr)
+            continue
+        frame_count, fps, seekable = info
+        chunk_frames = args.chunk_frames if seekable else frame_count
+        starts = range(0, frame_count, chunk_frames)
+        videos[str(path)] = {
+            'name': name, 'ears': np.full(frame_count, np.nan, dtype=np.float32), 'fps': fps, 'remaining': len(starts)
+        }
+        tasks.extend((str(path), s, min(s + chunk_frames, frame_count)) for s in starts)
+    if not tasks:
+        print("No videos to process", file=sys.stderr)
+        return 1
+
+    total_frames = sum(len(v['ears']) for v in videos.values())
+    done_frames = 0
+    started = time.monotonic()
+    with multiprocessing.get_context('spawn').Pool(args.workers, initializer=_init_worker) as pool:
+        for path, start, ears in pool.imap_unordered(_score_chunk, tasks):
+            video = videos[path]
+            video['ears'][start:start + len(ears)] = ears
+            video['remaining'] -= 1
+            done_frames += len(ears)
+            elapsed = time.monotonic() - started
+            print(f"\r{done_frames}/{total_frames} frames ({done_frames / elapsed:.1f} frames/sec)", end='', flush=True)
+
+            if video['remaining'] == 0:
+                out, n_blinks = write_scores(path, video['name'], video['ears'], video['fps'], args.output_dir, args)
+                print(f"\n{path}: {n_blinks} blinks -> {out}")
+                del videos[path]
+
+    elapsed = time.monotonic() - started
+    print(f"Processed {total_frames} frames in {elapsed:.1f}s ({total_frames / elapsed:.1f} frames/sec)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())